@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+from PIL import Image
+from benchmark_query_views import synthetic_visitor_photo
+from clip_encoder import DEFAULT_ENCODER_DIR, ENCODERS, MODEL_NAME, ONNX_FILES, load_encoder
+from gallery_index import FlatIndex, normalize
+from gallery_store import load_gallery_store
+
+# ---------------------
+# ✅ parity against the fp32 gallery
+# ---------------------
+def encode_paths(encoder, image_paths, batch_size):
+    embeddings = []
+    for i in range(0, len(image_paths), batch_size):
+        images = [Image.open(path).convert("RGB") for path in image_paths[i:i + batch_size]]
+        embeddings.append(encoder(encoder.preprocess(images)))
+    return np.vstack(embeddings)
+
+def check_parity(encoder_name, gallery_dir, encoder_dir, queries=50, batch_size=32, seed=0):
+    """
+    Compare an encoder backend with the fp32 PyTorch gallery:
+    - gallery images re-encoded by the backend vs their stored rows
+      (cosine, and whether each still finds its own row first)
+    - synthetic visitor photos encoded by both (cosine, and whether both
+      pick the same top-1 artwork)
+    """
+    embeddings, rows, header = load_gallery_store(gallery_dir, mmap=False)
+    if header.get("encoder", "torch") != "torch" or header["model_name"] != MODEL_NAME:
+        print(f"⚠️ {gallery_dir} was not built by the fp32 torch encoder of {MODEL_NAME}, parity is relative to it anyway")
+    reference = normalize(embeddings)
+    index = FlatIndex().build(reference, normalized=True)
+    # ▶️ compared by image path: a gallery can list the same image in several rows
+    paths = np.array([row["image_path"] for row in rows])
+    present = [i for i, row in enumerate(rows) if os.path.exists(row["image_path"])]
+    candidate = load_encoder(encoder_name, encoder_dir, MODEL_NAME)
+
+    start = time.perf_counter()
+    gallery_embs = encode_paths(candidate, [rows[i]["image_path"] for i in present], batch_size)
+    print(f"🧠 Re-encoded {len(present)} gallery images with {encoder_name} in {time.perf_counter() - start:.1f}s")
+    gallery_cos = np.sum(gallery_embs * reference[present], axis=1)
+    _, ids = index.search(gallery_embs, k=1)
+    gallery_top1 = np.mean(paths[ids[:, 0]] == paths[present])
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(present, size=min(queries, len(present)), replace=False)
+    photos = [synthetic_visitor_photo(Image.open(rows[i]["image_path"]).convert("RGB"), seed=seed + n) for n, i in enumerate(picks)]
+    fp32 = load_encoder("torch", model_name=MODEL_NAME)
+    query_ref = np.vstack([fp32(fp32.preprocess(photos[i:i + batch_size])) for i in range(0, len(photos), batch_size)])
+    query_cand = np.vstack([candidate(candidate.preprocess(photos[i:i + batch_size])) for i in range(0, len(photos), batch_size)])
+    query_cos = np.sum(query_ref * query_cand, axis=1)
+    _, ref_ids = index.search(query_ref, k=1)
+    _, cand_ids = index.search(query_cand, k=1)
+
+    return {
+        "gallery_cos_mean": float(gallery_cos.mean()),
+        "gallery_cos_min": float(gallery_cos.min()),
+        "gallery_top1_self": float(gallery_top1),
+        "query_cos_mean": float(query_cos.mean()),
+        "query_cos_min": float(query_cos.min()),
+        "query_top1_agreement": float(np.mean(paths[ref_ids[:, 0]] == paths[cand_ids[:, 0]])),
+        "query_top1_correct_fp32": float(np.mean(paths[ref_ids[:, 0]] == paths[picks])),
+        "query_top1_correct": float(np.mean(paths[cand_ids[:, 0]] == paths[picks])),
+    }
+
+# ---------------------
+# ⏱️ latency + memory, one process per encoder
+# ---------------------
+def rss_mb(field):
+    # VmRSS now, VmHWM peak; both belong to this process image only
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def measure_speed(encoder_name, encoder_dir, batch_size, repeats, num_threads):
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    rng = np.random.default_rng(0)
+    images = [Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)) for _ in range(batch_size)]
+    rss_before = rss_mb("VmRSS")
+
+    start = time.perf_counter()
+    encoder = load_encoder(encoder_name, encoder_dir, MODEL_NAME, num_threads)
+    load_s = time.perf_counter() - start
+    rss_loaded = rss_mb("VmRSS")
+
+    single, batch = encoder.preprocess(images[:1]), encoder.preprocess(images)
+    encoder(single), encoder(batch)  # warm up
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encoder(single)
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(max(1, repeats // 4)):
+        encoder(batch)
+    batch_s = (time.perf_counter() - start) / max(1, repeats // 4)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "encoder": encoder_name,
+        "load_s": load_s,
+        "model_mb": rss_loaded - rss_before,
+        "peak_rss_mb": rss_mb("VmHWM"),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "batch_images_per_s": batch_size / batch_s,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="CLIP image encoder backends: parity with the fp32 gallery, latency and memory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parity_parser = subparsers.add_parser("parity", help="Cosine and top-1 agreement with the fp32 gallery")
+    parity_parser.add_argument("--encoder", default="onnx-int8", choices=ENCODERS)
+    parity_parser.add_argument("--gallery-dir", default="clip_gallery")
+    parity_parser.add_argument("--queries", type=int, default=50, help="Synthetic visitor photos for top-1 agreement")
+    parity_parser.add_argument("--min-cosine", type=float, default=0.99, help="Fail below this mean cosine")
+    parity_parser.add_argument("--min-agreement", type=float, default=0.95, help="Fail below this top-1 agreement")
+    speed_parser = subparsers.add_parser("speed", help="Per-image latency, batch throughput and memory per encoder")
+    speed_parser.add_argument("--encoders", nargs="+", default=list(ENCODERS), choices=ENCODERS)
+    speed_parser.add_argument("--batch-size", type=int, default=16)
+    speed_parser.add_argument("--repeats", type=int, default=20)
+    speed_parser.add_argument("--num-threads", type=int, default=None)
+    speed_parser.add_argument("--worker", choices=ENCODERS, help=argparse.SUPPRESS)
+    for sub in (parity_parser, speed_parser):
+        sub.add_argument("--encoder-dir", default=DEFAULT_ENCODER_DIR)
+    args = parser.parse_args()
+
+    if args.command == "parity":
+        r = check_parity(args.encoder, args.gallery_dir, args.encoder_dir, queries=args.queries)
+        print(f"🖼️ gallery images  cosine mean {r['gallery_cos_mean']:.5f}  min {r['gallery_cos_min']:.5f}  "
+              f"own row first {r['gallery_top1_self']:.3f}")
+        print(f"📸 visitor photos  cosine mean {r['query_cos_mean']:.5f}  min {r['query_cos_min']:.5f}  "
+              f"top-1 agreement {r['query_top1_agreement']:.3f}  "
+              f"(correct: fp32 {r['query_top1_correct_fp32']:.3f}, {args.encoder} {r['query_top1_correct']:.3f})")
+        ok = (r["gallery_cos_mean"] >= args.min_cosine and r["query_cos_mean"] >= args.min_cosine
+              and min(r["gallery_top1_self"], r["query_top1_agreement"]) >= args.min_agreement)
+        print(f"✅ {args.encoder} matches the fp32 gallery" if ok else f"⚠️ {args.encoder} is below the parity thresholds")
+        sys.exit(0 if ok else 1)
+
+    if args.worker:
+        print(json.dumps(measure_speed(args.worker, args.encoder_dir, args.batch_size, args.repeats, args.num_threads)))
+        return
+
+    print(f"{os.cpu_count()} CPUs, batch {args.batch_size}, {args.repeats} single-image runs per encoder")
+    baseline = None
+    for name in args.encoders:
+        command = [sys.executable, os.path.abspath(__file__), "speed", "--worker", name, "--encoder-dir", args.encoder_dir,
+                   "--batch-size", str(args.batch_size), "--repeats", str(args.repeats)]
+        if args.num_threads:
+            command += ["--num-threads", str(args.num_threads)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{name:<10} ⚠️ failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}")
+            continue
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        baseline = baseline or r["p50_ms"]
+        file_size = f"{os.path.getsize(os.path.join(args.encoder_dir, ONNX_FILES[name])) / 1e6:5.0f}MB" if name in ONNX_FILES else "    -"
+        print(f"{name:<10} p50 {r['p50_ms']:7.1f}ms  p95 {r['p95_ms']:7.1f}ms  ({baseline / r['p50_ms']:4.2f}x)  "
+              f"batch {r['batch_images_per_s']:6.1f} img/s  load {r['load_s']:5.1f}s  "
+              f"model +{r['model_mb']:5.0f}MB RSS  peak RSS {r['peak_rss_mb']:6.0f}MB  file {file_size}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import time
+import numpy as np
+from gallery_index import FlatIndex, build_index, normalize
+from gallery_store import load_gallery_store
+
+# ---------------------
+# 🧪 gallery / query generation
+# ---------------------
+def synthetic_gallery(n, dim, n_clusters=256, spread=1.5, seed=0):
+    """
+    Clustered unit vectors, closer to real CLIP galleries than uniform noise
+    (artworks of one school / technique sit near each other).
+    """
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((n_clusters, dim)))
+    assign = rng.integers(0, n_clusters, n)
+    return normalize(centers[assign] + spread * rng.standard_normal((n, dim)) / np.sqrt(dim))
+
+def load_real_gallery(gallery_dir):
+    embeddings, _, _ = load_gallery_store(gallery_dir, mmap=False)
+    return normalize(embeddings)
+
+def make_queries(gallery, n_queries, noise=0.5, seed=1):
+    """
+    Perturbed gallery vectors, standing in for visitor photos of known works.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(gallery), n_queries)
+    dim = gallery.shape[1]
+    return normalize(gallery[picks] + noise * rng.standard_normal((n_queries, dim)) / np.sqrt(dim))
+
+# ---------------------
+# ⏱️ measurement
+# ---------------------
+def time_queries(search, queries, k):
+    """
+    Search one query at a time (the per-upload pattern) and collect ids + latencies.
+    """
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, row_ids = search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        ids.append(row_ids[0])
+    return np.vstack(ids), np.array(latencies) * 1000
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def report(name, build_s, recall, latencies_ms):
+    print(f"{name:<28} build {build_s:7.2f}s  recall {recall:6.3f}  "
+          f"mean {latencies_ms.mean():7.3f}ms  p50 {np.percentile(latencies_ms, 50):7.3f}ms  "
+          f"p95 {np.percentile(latencies_ms, 95):7.3f}ms")
+
+# ---------------------
+# 🎯 main entry
+# ---------------------
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of gallery index backends against exact search")
+    parser.add_argument("--gallery-dir", help="Benchmark a real gallery store instead of synthetic vectors")
+    parser.add_argument("--synthetic", type=int, default=200_000, help="Synthetic gallery size")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, nargs="*", default=[None], help="IVF cell counts (default: 4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    if args.gallery_dir:
+        gallery = load_real_gallery(args.gallery_dir)
+    else:
+        gallery = synthetic_gallery(args.synthetic, args.dim)
+    queries = make_queries(gallery, args.queries)
+    print(f"📚 Gallery: {gallery.shape[0]} x {gallery.shape[1]}, {len(queries)} queries, k={args.k}\n")
+
+    start = time.perf_counter()
+    flat = FlatIndex().build(gallery)
+    flat_build = time.perf_counter() - start
+    truth, flat_ms = time_queries(flat.search, queries, args.k)
+    report("flat (exact)", flat_build, 1.0, flat_ms)
+
+    for nlist in args.nlist:
+        start = time.perf_counter()
+        ivf = build_index(gallery, kind="ivf", nlist=nlist)
+        ivf_build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            if nprobe > ivf.nlist:
+                continue
+            found, ivf_ms = time_queries(lambda q, k: ivf.search(q, k, nprobe=nprobe), queries, args.k)
+            report(f"ivf nlist={ivf.nlist} nprobe={nprobe}", ivf_build, recall_at_k(found, truth), ivf_ms)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from museum_sites import HAVE_LXML, get_site, parse_page
+
+# ---------------------
+# 🧪 fixture pages
+# ---------------------
+# Saved full pages (site chrome, menus, scripts and all), not the small
+# stub server templates, so parse cost is close to the real site's.
+SAVED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawler_fixtures", "saved")
+PAGES = {
+    "listing": ("ambrosiana_listing.html", "https://ambrosiana.it/en/discover/collection/page/2/"),
+    "details": ("ambrosiana_detail.html", None),
+}
+
+def load_page(kind):
+    filename, page_url = PAGES[kind]
+    with open(os.path.join(SAVED_DIR, filename), encoding="utf-8") as f:
+        return f.read(), page_url
+
+# ---------------------
+# ⏱️ measurement
+# ---------------------
+def pages_per_second(site, kind, html, page_url, seconds):
+    """
+    Parse the same page repeatedly for about `seconds`, one at a time.
+    """
+    parse_page(site, kind, html, page_url)  # warm up
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        parse_page(site, kind, html, page_url)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def pool_pages_per_second(site, kind, html, page_url, workers, pages):
+    """
+    Throughput of `pages` parses spread over a process pool, including the
+    cost of shipping each page to a worker and the result back.
+    """
+    with ProcessPoolExecutor(workers) as pool:
+        list(pool.map(parse_page, [site] * workers, [kind] * workers, [html] * workers, [page_url] * workers))  # start workers
+        start = time.perf_counter()
+        list(pool.map(parse_page, [site] * pages, [kind] * pages, [html] * pages, [page_url] * pages, chunksize=4))
+        return pages / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawler page parsing throughput: html.parser vs lxml, inline vs process pool")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time per single-process measurement")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Process pool sizes to measure (lxml)")
+    parser.add_argument("--pool-pages", type=int, default=400)
+    args = parser.parse_args()
+
+    parsers = ["html.parser"] + (["lxml"] if HAVE_LXML else [])
+    print(f"{os.cpu_count()} CPUs, saved pages in {SAVED_DIR}")
+    for kind in PAGES:
+        html, page_url = load_page(kind)
+        results = {name: parse_page(get_site("ambrosiana", parser=name), kind, html, page_url) for name in parsers}
+        agree = all(result == results["html.parser"] for result in results.values())
+        print(f"\n📄 {kind} page, {len(html) / 1024:.0f}KB, parsers agree: {agree}")
+
+        baseline = None
+        for name in parsers:
+            rate = pages_per_second(get_site("ambrosiana", parser=name), kind, html, page_url, args.seconds)
+            baseline = baseline or rate
+            print(f"  {name:<12} inline      {rate:8.1f} pages/s  ({rate / baseline:4.1f}x)")
+        if HAVE_LXML:
+            for workers in args.workers:
+                rate = pool_pages_per_second(get_site("ambrosiana", parser="lxml"), kind, html, page_url, workers, args.pool_pages)
+                print(f"  {'lxml':<12} {workers} proc{'s' if workers > 1 else ' '}     {rate:8.1f} pages/s  ({rate / baseline:4.1f}x)")
+
+if __name__ == "__main__":
+    main()
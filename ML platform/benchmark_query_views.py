@@ -0,0 +1,132 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFilter
+from clip_match_user_upload import encode_images, find_multiview_matches, load_gallery
+from query_views import HAVE_CV2, VIEW_NAMES, make_views
+
+# ---------------------
+# 📸 visitor photo queries
+# ---------------------
+def perspective_coeffs(quad, size):
+    """
+    PIL PERSPECTIVE coefficients mapping photo pixels back into a source
+    image of `size`, whose corners land on `quad` (tl, tr, br, bl).
+    """
+    width, height = size
+    source = [(0, 0), (width, 0), (width, height), (0, height)]
+    rows, rhs = [], []
+    for (x, y), (u, v) in zip(quad, source):
+        rows.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        rows.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+        rhs.extend([u, v])
+    return np.linalg.solve(np.array(rows, dtype=np.float64), np.array(rhs, dtype=np.float64))
+
+def synthetic_visitor_photo(art, size=(1200, 900), seed=0):
+    """
+    A gallery image as a visitor would photograph it: framed, hung off
+    centre on a wall, seen at an angle, with a glare spot.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    border = max(art.size) // 20
+    framed = Image.new("RGB", (art.width + 2 * border, art.height + 2 * border), (90, 60, 20))
+    framed.paste(art, (border, border))
+
+    h = height * rng.uniform(0.55, 0.75)
+    w = h * framed.width / framed.height
+    if w > width * 0.6:
+        w = width * 0.6
+        h = w * framed.height / framed.width
+    x0, y0 = rng.uniform(0.05, 0.35) * width, rng.uniform(0.05, 0.2) * height
+    skew = rng.uniform(0.04, 0.12)
+    quad = [(x0, y0), (x0 + w * (1 - skew), y0 + h * skew), (x0 + w * (1 - skew), y0 + h * (1 - skew)), (x0, y0 + h)]
+
+    coeffs = perspective_coeffs(quad, framed.size)
+    warped = framed.transform(size, Image.PERSPECTIVE, tuple(coeffs), Image.BILINEAR)
+    mask = Image.new("L", framed.size, 255).transform(size, Image.PERSPECTIVE, tuple(coeffs), Image.NEAREST)
+    photo = Image.composite(warped, Image.new("RGB", size, (196, 184, 160)), mask)
+
+    gx, gy = x0 + w * rng.uniform(0.3, 0.6), y0 + h * rng.uniform(0.1, 0.5)
+    glare = Image.new("L", size, 0)
+    ImageDraw.Draw(glare).ellipse((gx, gy, gx + w * 0.25, gy + h * 0.2), fill=200)
+    glare = glare.filter(ImageFilter.GaussianBlur(30))
+    return Image.composite(Image.new("RGB", size, (255, 255, 255)), photo, glare)
+
+def load_queries(args, metadata):
+    """
+    :return: list of (photo, expected gallery image_path)
+    """
+    if args.queries:
+        # Real visitor photos: a CSV with photo_path and the matching gallery image_path
+        df = pd.read_csv(args.queries)
+        return [(Image.open(row.photo_path).convert("RGB"), row.image_path) for row in df.itertuples()]
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(metadata), size=min(args.synthetic, len(metadata)), replace=False)
+    queries = []
+    for n, i in enumerate(picks):
+        image_path = metadata[i][2]
+        if not os.path.exists(image_path):
+            continue
+        art = Image.open(image_path).convert("RGB")
+        queries.append((synthetic_visitor_photo(art, seed=args.seed + n), image_path))
+    return queries
+
+# ---------------------
+# ⏱️ measurement
+# ---------------------
+def evaluate(queries, index, metadata, views, aggregate, threshold):
+    correct = confident = wrong_confident = 0
+    latencies, view_counts = [], []
+    for photo, expected in queries:
+        start = time.perf_counter()
+        images, names = make_views(photo, views)
+        matches = find_multiview_matches(encode_images(images), index, metadata, k=1, aggregate=aggregate)
+        latencies.append(time.perf_counter() - start)
+        view_counts.append(len(names))
+        if not matches:
+            continue
+        _, _, image_path, score = matches[0]
+        correct += image_path == expected
+        if score >= threshold:
+            confident += image_path == expected
+            wrong_confident += image_path != expected
+    n = len(queries)
+    latencies = np.array(latencies) * 1000
+    return {
+        "views": np.mean(view_counts),
+        "top1": correct / n,
+        "confident": confident / n,
+        "wrong_confident": wrong_confident / n,
+        "mean_ms": latencies.mean(),
+        "p95_ms": np.percentile(latencies, 95),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Single centre-crop vs multi-view query matching: match rate and latency")
+    parser.add_argument("--gallery-dir", default="clip_gallery")
+    parser.add_argument("--queries", help="CSV of real visitor photos (photo_path, image_path); default: synthetic photos of gallery images")
+    parser.add_argument("--synthetic", type=int, default=50, help="Synthetic visitor photos when --queries is not given")
+    parser.add_argument("--threshold", type=float, default=0.85, help="Score needed to answer without the LLM (rubico CLIP_MATCH_THRESHOLD)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index, metadata = load_gallery(args.gallery_dir)
+    queries = load_queries(args, metadata)
+    print(f"🔍 {len(queries)} queries against {len(metadata)} artworks, threshold {args.threshold}"
+          f"{'' if HAVE_CV2 else ' (opencv not installed: no perspective view)'}")
+
+    modes = [
+        ("single (center)", ("center",), "max"),
+        ("multi-view, max", VIEW_NAMES, "max"),
+        ("multi-view, mean", VIEW_NAMES, "mean"),
+    ]
+    for name, views, aggregate in modes:
+        r = evaluate(queries, index, metadata, views, aggregate, args.threshold)
+        print(f"{name:<18} views {r['views']:4.1f}  top-1 {r['top1']:6.3f}  confident {r['confident']:6.3f}  "
+              f"wrong+confident {r['wrong_confident']:6.3f}  mean {r['mean_ms']:7.1f}ms  p95 {r['p95_ms']:7.1f}ms")
+
+if __name__ == "__main__":
+    main()
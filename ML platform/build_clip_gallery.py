@@ -1,26 +1,34 @@
 import os
+import time
+import argparse
+import hashlib
 import torch
-import pickle
+import numpy as np
 from PIL import Image
 from tqdm import tqdm
-from transformers import CLIPProcessor, CLIPModel
 import pandas as pd
 from torch.utils.data import Dataset, DataLoader
+from clip_encoder import DEFAULT_ENCODER_DIR, ENCODERS, load_encoder
+from gallery_store import SUPPORTED_DTYPES, load_gallery_store, save_gallery_store
+from metadata_store import DEFAULT_METADATA_DB, load_metadata
 
 # ---------------------
 # 🧠 model and device configuration
 # ---------------------
+MODEL_NAME = "openai/clip-vit-base-patch32"
+DEFAULT_MUSEUM_NAME = "Pinacoteca Ambrosiana"
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32",use_fast=True)
 
 # ---------------------
 # 🖼️ custom Dataset class
 # ---------------------
 class ImageDataset(Dataset):
-    def __init__(self, df, processor):
+    """
+    Decodes one image per item; CLIP preprocessing happens per batch in
+    BatchCollator, so both run inside the DataLoader workers.
+    """
+    def __init__(self, df):
         self.df = df
-        self.processor = processor
         
     def __len__(self):
         return len(self.df)
@@ -30,9 +38,8 @@ class ImageDataset(Dataset):
         image_path = row["image_path"]
         try:
             image = Image.open(image_path).convert("RGB")
-            inputs = self.processor(images=image, return_tensors="pt")
             return {
-                "inputs": inputs,
+                "image": image,
                 "title": row["title"],
                 "artist": row["artist"],
                 "image_path": image_path
@@ -42,76 +49,232 @@ class ImageDataset(Dataset):
             return None
 
 # ---------------------
-# 🔗 custom collate_fn to merge batch
+# 🔗 collate: drop failed images and preprocess the batch in one processor call
 # ---------------------
-def collate_fn(batch):
-    batch = [b for b in batch if b is not None]
-    if not batch:
-        return None
-    pixel_values = torch.cat([item["inputs"]["pixel_values"] for item in batch], dim=0)
-    return {
-        "inputs": {"pixel_values": pixel_values},
-        "title": [item["title"] for item in batch],
-        "artist": [item["artist"] for item in batch],
-        "image_path": [item["image_path"] for item in batch],
-    }
+class BatchCollator:
+    def __init__(self, processor):
+        self.processor = processor
+
+    def preprocess(self, items):
+        try:
+            return items, self.processor(images=[item["image"] for item in items], return_tensors="pt")["pixel_values"]
+        except Exception:
+            # ▶️ one bad image must not sink the whole batch: retry item by item
+            kept, pixel_values = [], []
+            for item in items:
+                try:
+                    pixel_values.append(self.processor(images=item["image"], return_tensors="pt")["pixel_values"])
+                    kept.append(item)
+                except Exception as e:
+                    print(f"⚠️ Error processing {item['image_path']}: {e}")
+            return kept, torch.cat(pixel_values, dim=0) if pixel_values else None
+
+    def __call__(self, batch):
+        batch = [b for b in batch if b is not None]
+        if not batch:
+            return None
+        batch, pixel_values = self.preprocess(batch)
+        if not batch:
+            return None
+        return {
+            "inputs": {"pixel_values": pixel_values},
+            "title": [item["title"] for item in batch],
+            "artist": [item["artist"] for item in batch],
+            "image_path": [item["image_path"] for item in batch],
+        }
 
 # ---------------------
 # 🧠 process batch，generate embeddings
 # ---------------------
-def process_batch(batch, model):
-    inputs = {k: v.to(device) for k, v in batch["inputs"].items()}
-    with torch.no_grad():
-        embeddings = model.get_image_features(**inputs)
-        embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
-    return embeddings
+def process_batch(batch, encoder):
+    # ▶️ torch, onnx-fp32 or onnx-int8 (clip_encoder.py); all return normalized numpy rows
+    return encoder(batch["inputs"]["pixel_values"])
+
+def cell_text(value):
+    return "" if value is None or pd.isna(value) else str(value).strip()
+
+# ---------------------
+# 🧾 file fingerprints for incremental builds
+# ---------------------
+def file_stat(image_path):
+    stat = os.stat(image_path)
+    return stat.st_size, stat.st_mtime_ns
+
+def file_hash(image_path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_previous_gallery(gallery_dir, dtype, encoder="torch"):
+    """
+    Return {image_path: (row, embedding)} from an existing gallery store, or
+    {} when there is none or it was built with another model / dtype / encoder.
+    """
+    try:
+        embeddings, rows, header = load_gallery_store(gallery_dir)
+    except FileNotFoundError:
+        return {}
+    if (header["model_name"] != MODEL_NAME or header["dtype"] != dtype or header.get("encoder", "torch") != encoder
+            or "content_hash" not in header["metadata_columns"]):
+        print(f"♻️ Existing gallery in {gallery_dir} is incompatible, rebuilding from scratch")
+        return {}
+    return {row["image_path"]: (row, embeddings[i]) for i, row in enumerate(rows)}
+
+def encode_images(df, batch_size, num_workers=0, prefetch_factor=2, encoder="torch", encoder_dir=DEFAULT_ENCODER_DIR):
+    """
+    Encode the images in df and return {image_path: embedding}.
+    Images that fail to load or preprocess are skipped and logged.
+
+    With num_workers > 0, decoding and preprocessing run in that many worker
+    processes, each keeping `prefetch_factor` batches ready ahead of inference.
+    The model is loaded here, in the main process only; workers get the
+    preprocessor alone.
+
+    :param encoder: "torch", "onnx-fp32" or "onnx-int8" (see clip_encoder.py)
+    """
+    image_encoder = load_encoder(encoder, encoder_dir, MODEL_NAME, torch.get_num_threads())
+    dataset = ImageDataset(df)
+    loader_kwargs = {"num_workers": num_workers, "pin_memory": device.type == "cuda"}
+    if num_workers > 0:
+        loader_kwargs["prefetch_factor"] = prefetch_factor
+    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=False, collate_fn=BatchCollator(image_encoder.processor), **loader_kwargs)
+
+    encoded = {}
+    start = time.perf_counter()
+    for batch in tqdm(dataloader):
+        if batch is None:
+            continue
+        batch_embeddings = process_batch(batch, image_encoder)
+        encoded.update(zip(batch["image_path"], batch_embeddings))
+    elapsed = time.perf_counter() - start
+
+    skipped = len(df) - len(encoded)
+    print(f"⚡ Encoded {len(encoded)} images in {elapsed:.1f}s "
+          f"({len(encoded) / max(elapsed, 1e-9):.1f} images/sec, {encoder} encoder, {num_workers} workers, "
+          f"{torch.get_num_threads()} threads), skipped {skipped}")
+    return encoded
 
 # ---------------------
 # 📦 build gallery embeddings and save
 # ---------------------
-def build_gallery(metadata_csv, embedding_file, batch_size=32):
-    if not os.path.exists(metadata_csv):
-        raise FileNotFoundError(f"Metadata file not found: {metadata_csv}")
-    
-    df = pd.read_csv(metadata_csv)
-    df.columns = df.columns.str.strip()
-    
+def build_gallery(metadata_path, gallery_dir, batch_size=32, dtype="float32", full=False, num_workers=0, prefetch_factor=2,
+                  museum_name=DEFAULT_MUSEUM_NAME, sites=None, encoder="torch", encoder_dir=DEFAULT_ENCODER_DIR):
+    """
+    Build or update the gallery store from the crawler's metadata store
+    (every museum in it, or only `sites`) or a legacy metadata CSV.
+
+    Unless `full` is set, entries are keyed by image path + file size/mtime
+    (falling back to a sha256 content hash when the stat changed), so only
+    new or modified images go through CLIP, unchanged embeddings are reused
+    and rows removed from the CSV are dropped.
+
+    `encoder` picks the CLIP backend (clip_encoder.py) and is recorded in
+    the store header; switching it re-encodes every image.
+
+    Rows keep the description and museum name (falling back to
+    `museum_name` when a legacy CSV has none) so the API can answer strong
+    matches straight from the gallery.
+    """
+    df = load_metadata(metadata_path, sites)
+
     # filter out rows with no image
     df = df[df["image_path"].apply(os.path.exists)]
     print(f"🖼️ Total valid images: {len(df)}")
 
-    dataset = ImageDataset(df, processor)
-    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=False, collate_fn=collate_fn)
-    
+    previous = {} if full else load_previous_gallery(gallery_dir, dtype, encoder)
+    fingerprints = {}
+    reused = {}
+    for image_path in df["image_path"]:
+        size, mtime_ns = file_stat(image_path)
+        old = previous.get(image_path)
+        if old is not None and (int(old[0]["file_size"]), int(old[0]["file_mtime_ns"])) == (size, mtime_ns):
+            fingerprints[image_path] = (size, mtime_ns, old[0]["content_hash"])
+            reused[image_path] = old[1]
+            continue
+        content_hash = file_hash(image_path)
+        fingerprints[image_path] = (size, mtime_ns, content_hash)
+        # ▶️ touched but identical files (same hash) keep their embedding
+        if old is not None and old[0]["content_hash"] == content_hash:
+            reused[image_path] = old[1]
+
+    to_encode = df[~df["image_path"].isin(reused)].drop_duplicates("image_path")
+    removed = set(previous) - set(df["image_path"])
+    print(f"♻️ Reusing {len(reused)} embeddings, encoding {len(to_encode)}, dropping {len(removed)}")
+
+    encoded = {}
+    if len(to_encode):
+        print("🧠 Encoding gallery images with CLIP...")
+        encoded = encode_images(to_encode, batch_size, num_workers=num_workers, prefetch_factor=prefetch_factor,
+                                encoder=encoder, encoder_dir=encoder_dir)
+
     embeddings = []
-    print("🧠 Encoding gallery images with CLIP...")
-    
-    for batch in tqdm(dataloader):
-        if batch is None:
+    metadata = []
+    for _, row in df.iterrows():
+        image_path = row["image_path"]
+        embedding = reused.get(image_path, encoded.get(image_path))
+        if embedding is None:
             continue
-        batch_embeddings = process_batch(batch, model)
-        for i in range(len(batch_embeddings)):
-            embeddings.append((
-                batch_embeddings[i].cpu(),
-                batch["title"][i],
-                batch["artist"][i],
-                batch["image_path"][i]
-            ))
+        size, mtime_ns, content_hash = fingerprints[image_path]
+        embeddings.append(np.asarray(embedding, dtype=np.float32))
+        metadata.append({
+            "title": row["title"],
+            "artist": row["artist"],
+            "museum_name": cell_text(row.get("museum_name")) or museum_name,
+            "description": cell_text(row.get("description")),
+            "image_path": image_path,
+            "file_size": size,
+            "file_mtime_ns": mtime_ns,
+            "content_hash": content_hash,
+        })
+
+    if not embeddings:
+        raise ValueError(f"No images could be encoded from {metadata_path}")
 
     # save embeddings
-    with open(embedding_file, "wb") as f:
-        pickle.dump(embeddings, f)
+    save_gallery_store(gallery_dir, np.stack(embeddings), metadata, MODEL_NAME, dtype=dtype, normalized=True, encoder=encoder)
     
-    print(f"\n✅ Done! Saved {len(embeddings)} image embeddings to {embedding_file}")
+    print(f"\n✅ Done! Saved {len(metadata)} image embeddings to {gallery_dir}/")
 
 # ---------------------
 # 🎯 main entry
 # ---------------------
 def main():
-    METADATA_CSV = "ambrosiana_metadata.csv"
-    EMBEDDING_FILE = "clip_gallery_embeddings.pkl"
-    
-    build_gallery(METADATA_CSV, EMBEDDING_FILE)
+    parser = argparse.ArgumentParser(description="Build or incrementally update the CLIP gallery store")
+    parser.add_argument("--metadata", default=None,
+                        help=f"Crawler metadata store or legacy CSV (default: {DEFAULT_METADATA_DB} if it exists, else ambrosiana_metadata.csv)")
+    parser.add_argument("--metadata-csv", dest="metadata", help=argparse.SUPPRESS)
+    parser.add_argument("--site", action="append", help="Only these sites of the metadata store (repeatable)")
+    parser.add_argument("--gallery-dir", default="clip_gallery")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--dtype", default="float32", choices=SUPPORTED_DTYPES)
+    parser.add_argument("--museum-name", default=DEFAULT_MUSEUM_NAME, help="Museum for legacy CSV rows without museum_name")
+    parser.add_argument("--full", action="store_true", help="Re-encode every image instead of reusing unchanged embeddings")
+    parser.add_argument("--num-workers", type=int, default=min(4, os.cpu_count() or 1), help="Decode/preprocess worker processes (0 = in the main process)")
+    parser.add_argument("--prefetch-factor", type=int, default=2, help="Batches each worker prepares ahead")
+    parser.add_argument("--num-threads", type=int, default=None, help="Intra-op threads for inference")
+    parser.add_argument("--encoder", default="torch", choices=ENCODERS, help="CLIP image encoder backend (onnx-* need: python clip_encoder.py)")
+    parser.add_argument("--encoder-dir", default=DEFAULT_ENCODER_DIR, help="Exported ONNX encoders")
+    args = parser.parse_args()
+
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
+
+    metadata = args.metadata or (DEFAULT_METADATA_DB if os.path.exists(DEFAULT_METADATA_DB) else "ambrosiana_metadata.csv")
+    build_gallery(
+        metadata,
+        args.gallery_dir,
+        batch_size=args.batch_size,
+        dtype=args.dtype,
+        full=args.full,
+        num_workers=args.num_workers,
+        prefetch_factor=args.prefetch_factor,
+        museum_name=args.museum_name,
+        sites=args.site,
+        encoder=args.encoder,
+        encoder_dir=args.encoder_dir,
+    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import inspect
+import argparse
+import functools
+import numpy as np
+import torch
+
+try:
+    import onnxruntime
+    HAVE_ONNXRUNTIME = True
+except ImportError:
+    HAVE_ONNXRUNTIME = False
+
+# ---------------------
+# 🧠 CLIP image encoder backends
+# ---------------------
+# The gallery builder and the matcher only use CLIP's image tower. Besides
+# the full PyTorch model ("torch"), the tower can be exported once to ONNX
+# and run with onnxruntime, in fp32 ("onnx-fp32") or with dynamically
+# quantized int8 weights ("onnx-int8"), which is much lighter on CPU-only
+# servers:
+#   python clip_encoder.py --out-dir clip_encoder
+#   python benchmark_encoder.py parity --encoder onnx-int8 --gallery-dir clip_gallery
+# An encoder dir holds:
+#   image_encoder.fp32.onnx    exported graph: pixel_values -> normalized embeddings
+#   image_encoder.int8.onnx    the same with int8 MatMul / Gemm weights
+#   preprocessor_config.json   CLIP image preprocessing, so the ONNX backends
+#                              never download the PyTorch checkpoint
+#   header.json                model name, opset, embedding dim, export time
+# Every backend maps preprocess(images) to L2-normalized float32 [B, D]
+# numpy embeddings, so callers do not care which one runs.
+
+MODEL_NAME = "openai/clip-vit-base-patch32"
+ENCODERS = ("torch", "onnx-fp32", "onnx-int8")
+DEFAULT_ENCODER_DIR = "clip_encoder"
+ONNX_FILES = {"onnx-fp32": "image_encoder.fp32.onnx", "onnx-int8": "image_encoder.int8.onnx"}
+HEADER_FILE = "header.json"
+
+class ImageTower(torch.nn.Module):
+    """
+    Vision transformer + projection + L2 normalization, the part of CLIP
+    that is exported.
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.vision_model = model.vision_model
+        self.visual_projection = model.visual_projection
+
+    def forward(self, pixel_values):
+        embeddings = self.visual_projection(self.vision_model(pixel_values=pixel_values).pooler_output)
+        return embeddings / embeddings.norm(dim=-1, keepdim=True)
+
+class TorchImageEncoder:
+    name = "torch"
+
+    def __init__(self, model_name=MODEL_NAME, device=None):
+        from transformers import CLIPModel, CLIPProcessor
+
+        self.model_name = model_name
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = CLIPModel.from_pretrained(model_name).to(self.device).eval()
+        self.processor = CLIPProcessor.from_pretrained(model_name, use_fast=True)
+
+    def preprocess(self, images):
+        return self.processor(images=images, return_tensors="pt")["pixel_values"]
+
+    def __call__(self, pixel_values):
+        with torch.inference_mode():
+            embeddings = self.model.get_image_features(pixel_values=pixel_values.to(self.device, non_blocking=True))
+            embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+        return embeddings.float().cpu().numpy()
+
+class OnnxImageEncoder:
+    def __init__(self, name, encoder_dir=DEFAULT_ENCODER_DIR, num_threads=None):
+        from transformers import CLIPImageProcessor
+
+        if not HAVE_ONNXRUNTIME:
+            raise ImportError(f"Encoder '{name}' needs the onnxruntime package")
+        header = load_encoder_header(encoder_dir)
+        self.name = name
+        self.model_name = header["model_name"]
+        self.path = os.path.join(encoder_dir, ONNX_FILES[name])
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.processor = CLIPImageProcessor.from_pretrained(encoder_dir)
+
+    def preprocess(self, images):
+        return self.processor(images=images, return_tensors="np")["pixel_values"]
+
+    def __call__(self, pixel_values):
+        if isinstance(pixel_values, torch.Tensor):
+            pixel_values = pixel_values.numpy()
+        return self.session.run(None, {self.input_name: np.asarray(pixel_values, dtype=np.float32)})[0]
+
+def load_encoder_header(encoder_dir):
+    header_path = os.path.join(encoder_dir, HEADER_FILE)
+    if not os.path.exists(header_path):
+        raise FileNotFoundError(f"No exported encoder in {encoder_dir}, run: python clip_encoder.py --out-dir {encoder_dir}")
+    with open(header_path, encoding="utf-8") as f:
+        return json.load(f)
+
+@functools.lru_cache(maxsize=None)
+def load_encoder(encoder="torch", encoder_dir=DEFAULT_ENCODER_DIR, model_name=MODEL_NAME, num_threads=None):
+    """
+    Load an image encoder once per process.
+
+    :param encoder: one of ENCODERS
+    :param model_name: checkpoint the caller's gallery was built with; an
+                       exported encoder of another checkpoint is refused
+    """
+    if encoder == "torch":
+        return TorchImageEncoder(model_name)
+    if encoder not in ONNX_FILES:
+        raise ValueError(f"Unknown encoder '{encoder}'. Use one of: {', '.join(ENCODERS)}")
+    loaded = OnnxImageEncoder(encoder, encoder_dir, num_threads)
+    if loaded.model_name != model_name:
+        raise ValueError(f"Encoder in {encoder_dir} was exported from {loaded.model_name}, expected {model_name}")
+    return loaded
+
+# ---------------------
+# 📦 export + quantization
+# ---------------------
+def export_encoder(out_dir=DEFAULT_ENCODER_DIR, model_name=MODEL_NAME, opset=17, quantize=True):
+    """
+    Export CLIP's image tower to ONNX (dynamic batch size) and, unless
+    `quantize` is off, write an int8 copy with dynamically quantized weights.
+
+    :return: the header written to out_dir
+    """
+    from transformers import CLIPImageProcessor, CLIPModel
+
+    os.makedirs(out_dir, exist_ok=True)
+    processor = CLIPImageProcessor.from_pretrained(model_name)
+    tower = ImageTower(CLIPModel.from_pretrained(model_name).eval())
+    size = processor.crop_size["height"]
+    dummy = torch.zeros(1, 3, size, size)
+
+    fp32_path = os.path.join(out_dir, ONNX_FILES["onnx-fp32"])
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # ▶️ the TorchScript-based exporter writes one self-contained file
+        export_kwargs["dynamo"] = False
+    start = time.perf_counter()
+    torch.onnx.export(
+        tower, (dummy,), fp32_path,
+        input_names=["pixel_values"], output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=opset, **export_kwargs,
+    )
+    print(f"📦 Exported {fp32_path} ({os.path.getsize(fp32_path) / 1e6:.0f}MB) in {time.perf_counter() - start:.1f}s")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(out_dir, ONNX_FILES["onnx-int8"])
+        # ▶️ weights are int8 on disk; activations are quantized per batch at run time
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"🗜️ Quantized {int8_path} ({os.path.getsize(int8_path) / 1e6:.0f}MB)")
+
+    processor.save_pretrained(out_dir)
+    with torch.inference_mode():
+        dim = int(tower(dummy).shape[1])
+    header = {
+        "model_name": model_name,
+        "opset": opset,
+        "dim": dim,
+        "image_size": size,
+        "encoders": [name for name, filename in ONNX_FILES.items() if os.path.exists(os.path.join(out_dir, filename))],
+        "exported_at": time.time(),
+    }
+    with open(os.path.join(out_dir, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+    return header
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the CLIP image encoder to ONNX, with an int8 quantized copy")
+    parser.add_argument("--out-dir", default=DEFAULT_ENCODER_DIR)
+    parser.add_argument("--model-name", default=MODEL_NAME)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-quantize", action="store_true", help="Only write the fp32 graph")
+    args = parser.parse_args()
+
+    header = export_encoder(args.out_dir, args.model_name, args.opset, quantize=not args.no_quantize)
+    print(f"✅ {', '.join(header['encoders'])} encoders for {header['model_name']} in {args.out_dir}/")
+    print(f"   Check them against the fp32 gallery: python benchmark_encoder.py parity --encoder-dir {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
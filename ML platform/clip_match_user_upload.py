@@ -1,62 +1,151 @@
 import torch
-import pickle
 import os
+import argparse
+import numpy as np
 from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
+from clip_encoder import DEFAULT_ENCODER_DIR, ENCODERS, load_encoder
+from gallery_index import build_index, load_index
+from gallery_store import gallery_fingerprint, load_gallery_store
+from query_views import VIEW_NAMES, make_views
 
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32",use_fast=True)
+MODEL_NAME = "openai/clip-vit-base-patch32"
 
-def load_gallery_embeddings(embedding_file="clip_gallery_embeddings.pkl"):
-    if not os.path.exists(embedding_file):
-        raise FileNotFoundError(f"Gallery embeddings file not found: {embedding_file}")
-    with open(embedding_file, "rb") as f:
-        return pickle.load(f)
+def load_gallery(gallery_dir="clip_gallery", index_type="flat", index_file=None, **index_kwargs):
+    """
+    Memory-map the gallery store and put it behind a search index.
 
-def process_user_image(image_path):
+    A prebuilt index is reused when `index_file` exists and was built from the
+    current version of the gallery; otherwise one of type `index_type` ("flat"
+    or "ivf", or the stale file's type) is built in memory.
+    :return: (index, metadata) with metadata rows as (title, artist, img_path)
+    """
+    embeddings, rows, header = load_gallery_store(gallery_dir)
+    if header["model_name"] != MODEL_NAME:
+        raise ValueError(f"Gallery {gallery_dir} was built with {header['model_name']}, matcher uses {MODEL_NAME}")
+    metadata = [(row["title"], row["artist"], row["image_path"]) for row in rows]
+
+    if index_file and os.path.exists(index_file):
+        index = load_index(index_file)
+        # ▶️ a row count can survive a rebuild that replaced or reordered rows; the fingerprint cannot
+        if index.gallery_fingerprint == gallery_fingerprint(gallery_dir, header) and len(index) == len(metadata):
+            return index, metadata
+        print(f"⚠️ {index_file} was built from another version of {gallery_dir}, rebuilding its {index.kind} index in memory "
+              f"(rebuild it with: python gallery_index.py --gallery-dir {gallery_dir} --index-file {index_file})")
+        index_type = index.kind
+    index = build_index(embeddings, kind=index_type, normalized=header["normalized"], **index_kwargs)
+    return index, metadata
+
+def load_user_image(image_path):
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"User image not found: {image_path}")
-    image = Image.open(image_path).convert("RGB")
-    inputs = processor(images=image, return_tensors="pt")
-    # ▶️ 把 tensor 单独放到 device 上
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    return Image.open(image_path).convert("RGB")
+
+def encode_images(images, encoder="torch", encoder_dir=DEFAULT_ENCODER_DIR):
+    """
+    Encode a list of images in one batched forward pass.
+
+    :param encoder: "torch", "onnx-fp32" or "onnx-int8" (see clip_encoder.py)
+    :return: normalized [B, D] float32 embeddings
+    """
+    image_encoder = load_encoder(encoder, encoder_dir, MODEL_NAME)
+    return image_encoder(image_encoder.preprocess(images))
+
+def process_user_image(image_path, encoder="torch", encoder_dir=DEFAULT_ENCODER_DIR):
+    return encode_images([load_user_image(image_path)], encoder, encoder_dir)[0]
+
+def process_user_image_views(image_path, views=VIEW_NAMES, encoder="torch", encoder_dir=DEFAULT_ENCODER_DIR):
+    """
+    Encode several views of one visitor photo (see query_views.py) in a
+    single batch.
+
+    :return: (normalized [V, D] embeddings, view names)
+    """
+    images, names = make_views(load_user_image(image_path), views)
+    return encode_images(images, encoder, encoder_dir), names
 
-    with torch.no_grad():
-        user_emb = model.get_image_features(**inputs).squeeze(0)
-        user_emb = user_emb / user_emb.norm(dim=-1, keepdim=True)
-    return user_emb
+def find_top_matches(user_embs, index, metadata, k=5):
+    """
+    Look up one [D] or a batch of [B, D] query embeddings in the gallery index
+    and keep the k best rows per query.
 
-def find_best_match(user_emb, gallery_embeddings):
-    best_score = -1.0
-    best_match = None
+    :return: one list per query of (title, artist, img_path, score), best first
+    """
+    if isinstance(user_embs, torch.Tensor):
+        user_embs = user_embs.detach().float().cpu().numpy()
 
-    for emb, title, artist, img_path in gallery_embeddings:
-        # ▶️ 确保图库向量也在同一个 device 上并已归一化
-        emb = emb.to(device)
-        emb = emb / emb.norm(dim=-1, keepdim=True)
+    scores, ids = index.search(user_embs, k=k)
+    return [
+        [(*metadata[i], float(score)) for i, score in zip(row_ids, row_scores) if i >= 0]
+        for row_ids, row_scores in zip(ids, scores)
+    ]
 
-        score = torch.nn.functional.cosine_similarity(user_emb, emb, dim=0).item()
-        if score > best_score:
-            best_score = score
-            best_match = (title, artist, img_path, score)
+def find_best_match(user_emb, index, metadata):
+    matches = find_top_matches(user_emb, index, metadata, k=1)[0]
+    return matches[0] if matches else None
 
-    return best_match
+def find_multiview_matches(view_embs, index, metadata, k=5, aggregate="max"):
+    """
+    Score the gallery against every view of one photo and keep the k best rows.
+
+    :param view_embs: normalized [V, D] view embeddings from process_user_image_views
+    :param aggregate: "max" (a row's best view; exact top-k from k per view)
+                      or "mean" (mean cosine over views, searched as the mean vector)
+    :return: list of (title, artist, img_path, score), best first
+    """
+    if isinstance(view_embs, torch.Tensor):
+        view_embs = view_embs.detach().float().cpu().numpy()
+
+    if aggregate == "mean":
+        mean = view_embs.mean(axis=0)
+        scores, ids = index.search(mean, k=k)
+        # ▶️ search normalizes the query; scale back so scores are mean cosines
+        norm = float(np.linalg.norm(mean))
+        return [(*metadata[i], float(score) * norm) for i, score in zip(ids[0], scores[0]) if i >= 0]
+    if aggregate != "max":
+        raise ValueError(f"Unknown aggregate '{aggregate}', use 'max' or 'mean'")
+
+    scores, ids = index.search(view_embs, k=k)
+    best = {}
+    for row_ids, row_scores in zip(ids, scores):
+        for i, score in zip(row_ids, row_scores):
+            if i >= 0 and score > best.get(i, -np.inf):
+                best[i] = score
+    top = sorted(best.items(), key=lambda item: -item[1])[:k]
+    return [(*metadata[i], float(score)) for i, score in top]
 
 def main():
-    gallery = load_gallery_embeddings()
-    user_path = "test.jpg"
-    user_emb = process_user_image(user_path)
-    match = find_best_match(user_emb, gallery)
+    parser = argparse.ArgumentParser(description="Match a visitor photo against the CLIP gallery")
+    parser.add_argument("image_path", nargs="?", default="test.jpg")
+    parser.add_argument("--gallery-dir", default="clip_gallery")
+    parser.add_argument("--multi-view", action="store_true", help="Match several views of the photo (full, tiles, perspective) instead of one centre crop")
+    parser.add_argument("--views", nargs="+", choices=VIEW_NAMES, default=list(VIEW_NAMES), help="Views used with --multi-view")
+    parser.add_argument("--aggregate", choices=["max", "mean"], default="max", help="How view scores combine per artwork")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--encoder", default="torch", choices=ENCODERS, help="CLIP image encoder backend (onnx-* need: python clip_encoder.py)")
+    parser.add_argument("--encoder-dir", default=DEFAULT_ENCODER_DIR)
+    args = parser.parse_args()
 
-    if match:
-        title, artist, img_path, score = match
+    index, metadata = load_gallery(args.gallery_dir)
+    if args.multi_view:
+        view_embs, names = process_user_image_views(args.image_path, args.views, args.encoder, args.encoder_dir)
+        print(f"🔍 Matching {len(names)} views: {', '.join(names)}")
+        matches = find_multiview_matches(view_embs, index, metadata, k=args.k, aggregate=args.aggregate)
+    else:
+        user_emb = process_user_image(args.image_path, args.encoder, args.encoder_dir)
+        matches = find_top_matches(user_emb, index, metadata, k=args.k)[0]
+
+    if matches:
+        title, artist, img_path, score = matches[0]
         print("\n🎯 Best match:")
         print(f"📘 Title : {title}")
         print(f"👨‍🎨 Artist: {artist}")
         print(f"🖼️ Image : {img_path}")
         print(f"🔢 Score : {score:.4f}")
+
+        print("\n🏅 Top matches:")
+        for rank, (title, artist, _, score) in enumerate(matches, start=1):
+            print(f"{rank}. {title} — {artist} ({score:.4f})")
     else:
         print("No match found.")
 
@@ -1,135 +1,343 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import argparse
+import aiohttp
 import os
-import csv
-from urllib.parse import urljoin
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 import time
+from image_store import ImageStore, fetch_image
+from metadata_store import DEFAULT_METADATA_DB, MetadataStore
+from museum_sites import available_sites, get_site, load_site_plugins, parse_page
 
-BASE_URL = "https://ambrosiana.it/en/discover/collection/page/{}/"
-OUTPUT_DIR = "ambrosiana_images"
-CSV_FILE = "ambrosiana_metadata.csv"
+# ---------------------
+# 🕷️ shared crawl engine for every museum site plugin
+# ---------------------
+# Sites (museum_sites.py) only parse pages; this module fetches them. All
+# sites of a crawl share one connection pool, one content-addressed image
+# store and one metadata store, and run in parallel, each host limited to
+# its own concurrency cap and request rate.
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-csv_headers = [
-    "title", "artist", "image_url", "image_path", 
-    "inventory", "date", "type", "technique", 
-    "dimensions", "subject", "school", "room",
-    "description"
-]
+IMAGE_DIR = "museum_images"
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
 
-def get_soup(url):
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
-    return BeautifulSoup(resp.text, "html.parser")
+# ---------------------
+# 📌 checkpoint: finished artworks and pages, so an interrupted crawl resumes
+# ---------------------
+class CrawlCheckpoint:
+    """
+    Append-only JSON lines per site, next to the metadata store:
+    {"artwork": url} once its row is written, {"page": n} once every artwork
+    of page n is. Removed when the site's crawl completes.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.artworks = set()
+        self.pages = set()
+        if resume and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "artwork" in record:
+                        self.artworks.add(record["artwork"])
+                    elif "page" in record:
+                        self.pages.add(record["page"])
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
 
-def get_artwork_details(url):
-    soup = get_soup(url)
-    details = {}
+    def _append(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
 
-    # Get description
-    description_tag = soup.select_one("div#opera_content p")
-    details["description"] = description_tag.text.strip() if description_tag else ""
+    def artwork_done(self, artwork_url):
+        self.artworks.add(artwork_url)
+        self._append({"artwork": artwork_url})
 
-    # Metadata section
-    metadata_items = soup.select("div#opera_sidebar ul li")
+    def page_done(self, page):
+        self.pages.add(page)
+        self._append({"page": page})
 
-    for item in metadata_items:
+    def close(self, completed=False):
+        self._file.close()
+        if completed:
+            os.remove(self.path)
+
+# ---------------------
+# 🚦 politeness: per-host concurrency cap + token bucket
+# ---------------------
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to
+    `burst` requests. Waiters are served in arrival order.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostLimiter:
+    """
+    One concurrency cap and one token bucket per host, created on first use.
+    """
+    def __init__(self, max_concurrency=4, rate=2.0, burst=4):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self._hosts = {}
+
+    def _for(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = (asyncio.Semaphore(self.max_concurrency), TokenBucket(self.rate, self.burst))
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, url):
+        semaphore, bucket = self._for(url)
+        async with semaphore:
+            await bucket.acquire()
+            yield
+
+# ---------------------
+# 🌐 pooled async fetcher
+# ---------------------
+class AsyncFetcher:
+    """
+    Every request of a crawl goes through one pooled aiohttp session and the
+    host limiter. Counts requests and bytes for the summary line.
+    """
+    def __init__(self, session, limiter):
+        self.session = session
+        self.limiter = limiter
+        self.requests = 0
+        self.bytes = 0
+
+    @asynccontextmanager
+    async def get(self, url, headers=None):
+        async with self.limiter.slot(url):
+            async with self.session.get(url, headers=headers) as resp:
+                self.requests += 1
+                resp.raise_for_status()
+                yield resp
+
+    async def text(self, url):
+        async with self.get(url) as resp:
+            body = await resp.read()
+            self.bytes += len(body)
+            return body.decode(resp.get_encoding(), errors="replace")
+
+def open_session(max_connections, timeout_seconds=30):
+    connector = aiohttp.TCPConnector(limit=max_connections, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"User-Agent": "artico-crawler/1.0"})
+
+# ---------------------
+# ⚡ crawling one site
+# ---------------------
+class SiteCrawl:
+    def __init__(self, site, fetcher, images, metadata, checkpoint, parse_pool=None):
+        self.site = site
+        self.fetcher = fetcher
+        self.images = images
+        self.metadata = metadata
+        self.checkpoint = checkpoint
+        self.parse_pool = parse_pool
+        self.rows = 0
+
+    async def parse(self, kind, html, page_url=None):
+        # Parsing is CPU-bound; in the pool it no longer stalls every other fetch
+        if self.parse_pool is None:
+            return parse_page(self.site, kind, html, page_url)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.parse_pool, parse_page, self.site, kind, html, page_url
+        )
+
+    async def crawl_artwork(self, item):
         try:
-            key = item.select_one("h3").text.strip().lower()
-            value = item.select_one("span").text.strip()
-
-            if "inventory" in key:
-                details["inventory"] = value
-            elif "date" in key:
-                details["date"] = value
-            elif "type" in key:
-                details["type"] = value
-            elif "technique" in key:
-                details["technique"] = value
-            elif "dimension" in key:
-                details["dimensions"] = value
-            elif "subject" in key:
-                details["subject"] = value
-            elif "school" in key:
-                details["school"] = value
-            elif "room" in key:
-                details["room"] = value
+            # Image and detail page are fetched in parallel
+            image_path, details_html = await asyncio.gather(
+                fetch_image(self.images, self.fetcher, item["image_url"]),
+                self.fetcher.text(item["artwork_url"]),
+            )
+            details = await self.parse("details", details_html)
+            self.metadata.upsert(self.site, item, image_path, details)
+            self.checkpoint.artwork_done(item["artwork_url"])
+            self.rows += 1
+            print(f"📖 [{self.site.name}] {item['title']}")
+            return True
         except Exception as e:
-            print(f"⚠️ Error parsing metadata item: {e}")
-            continue
-
-    return details
-
-def scrape(max_pages=3):
-    all_data = []
-    for page in range(1, max_pages + 1):
-        print(f"🔍 Scraping page {page}")
-        soup = get_soup(BASE_URL.format(page))
-        artworks = soup.select(".grid-item")
-
-        if not artworks:
-            print("No artworks found.")
-            break
-
-        for art in artworks:
-            try:
-                img_tag = art.select_one("img")
-                title_tag = art.select_one("h2.italic")
-                artist_tag = art.select("h2")[1] if len(art.select("h2")) > 1 else None
-                link_tag = art.select_one("a")
-
-                if not img_tag or not title_tag or not artist_tag or not link_tag:
+            print(f"⚠️ [{self.site.name}] Error on {item['artwork_url']}: {e}")
+            return False
+
+    async def crawl_page(self, page, artworks):
+        results = await asyncio.gather(*(
+            self.crawl_artwork(item) for item in artworks if item["artwork_url"] not in self.checkpoint.artworks
+        ))
+        if all(results):
+            self.checkpoint.page_done(page)
+        return all(results)
+
+    async def run(self, max_pages):
+        """
+        Listing pages are read in order (the first empty page ends the site)
+        while the artworks of earlier pages are still being fetched.
+
+        :return: True when every page and artwork succeeded
+        """
+        tasks = []
+        listing_failed = False
+        try:
+            for page in range(1, max_pages + 1):
+                if page in self.checkpoint.pages:
                     continue
+                print(f"🔍 [{self.site.name}] Scraping page {page}")
+                page_url = self.site.listing_url(page)
+                try:
+                    artworks = await self.parse("listing", await self.fetcher.text(page_url), page_url)
+                except Exception as e:
+                    print(f"⚠️ [{self.site.name}] Error on {page_url}: {e}")
+                    listing_failed = True
+                    break
+                if not artworks:
+                    print(f"[{self.site.name}] No artworks found on page {page}.")
+                    break
+                tasks.append(asyncio.create_task(self.crawl_page(page, artworks)))
+            pages_done = await asyncio.gather(*tasks)
+        finally:
+            # On cancellation (Ctrl+C) stop the page tasks before the session closes
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return not listing_failed and all(pages_done)
+
+# ---------------------
+# 🏛️ crawling several sites at once
+# ---------------------
+async def crawl(
+    sites,
+    max_pages=20,
+    image_dir=IMAGE_DIR,
+    metadata_db=DEFAULT_METADATA_DB,
+    max_concurrency=4,
+    rate=2.0,
+    burst=4,
+    resume=False,
+    parse_workers=PARSE_WORKERS,
+):
+    """
+    Crawl museum sites in parallel into one image store and one metadata store.
+
+    Every request shares one connection pool and goes through a per-host
+    concurrency cap and token bucket, so `rate` requests/second per host is
+    never exceeded however many artworks and sites are in flight.
+
+    Images go to the content-addressed ImageStore in image_dir with
+    conditional requests, so unchanged images are not transferred again.
+    With resume=True, artworks and pages recorded in a site's checkpoint
+    from an interrupted crawl are skipped.
+
+    :param sites: MuseumSite instances
+    :param max_concurrency: concurrent requests per host
+    :param rate: average requests per second per host (0 = unlimited)
+    :param burst: requests allowed back to back before the rate applies
+    :param parse_workers: processes parsing pages off the event loop (0 = parse inline)
+    :return: {site name: rows written}
+    """
+    limiter = HostLimiter(max_concurrency, rate, burst)
+    images = ImageStore(image_dir)
+    metadata = MetadataStore(metadata_db)
+    checkpoints = {site.name: CrawlCheckpoint(f"{metadata_db}.{site.name}.checkpoint.jsonl", resume) for site in sites}
+    completed = {site.name: False for site in sites}
+    parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers > 0 else None
+    start = time.perf_counter()
+    try:
+        async with open_session(max_connections=max_concurrency * 4 * len(sites)) as session:
+            fetcher = AsyncFetcher(session, limiter)
+            crawls = [SiteCrawl(site, fetcher, images, metadata, checkpoints[site.name], parse_pool) for site in sites]
+            results = await asyncio.gather(*(site_crawl.run(max_pages) for site_crawl in crawls), return_exceptions=True)
+            for site_crawl, result in zip(crawls, results):
+                if isinstance(result, BaseException):
+                    print(f"⚠️ [{site_crawl.site.name}] Crawl failed: {result}")
+                # The checkpoint is kept while anything is left for --resume
+                completed[site_crawl.site.name] = result is True
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown(cancel_futures=True)
+        for name, checkpoint in checkpoints.items():
+            checkpoint.close(completed[name])
+        images.close()
+        metadata.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ {sum(c.rows for c in crawls)} artworks in {elapsed:.1f}s ({fetcher.requests} requests, "
+          f"{fetcher.bytes / 1e6:.1f} MB, {fetcher.requests / elapsed:.1f} req/s)")
+    print(f"🗃️ images: {images.stats['downloaded']} downloaded ({images.stats['deduplicated']} duplicates), "
+          f"{images.stats['not_modified']} unchanged")
+    return {site_crawl.site.name: site_crawl.rows for site_crawl in crawls}
+
+def parse_base_urls(values):
+    base_urls = {}
+    for value in values:
+        name, sep, url = value.partition("=")
+        if not sep:
+            raise ValueError(f"Expected SITE=URL, got '{value}'")
+        base_urls[name] = url
+    return base_urls
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape artwork images and metadata from museum sites")
+    parser.add_argument("--site", action="append", help="Site to crawl (repeatable, default: ambrosiana)")
+    parser.add_argument("--all-sites", action="store_true", help="Crawl every registered site")
+    parser.add_argument("--plugin", action="append", default=[], help="Module that registers more sites (repeatable)")
+    parser.add_argument("--list-sites", action="store_true")
+    parser.add_argument("--base-url", action="append", default=[], metavar="SITE=URL",
+                        help="Override a site's collection page URL ({} = page number)")
+    parser.add_argument("--max-pages", type=int, default=20, help="Pages per site")
+    parser.add_argument("--image-dir", default=IMAGE_DIR, help="Content-addressed image store")
+    parser.add_argument("--metadata-db", default=DEFAULT_METADATA_DB, help="Normalized metadata store")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted crawl from its checkpoints")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per host")
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests per second per host, 0 = unlimited")
+    parser.add_argument("--burst", type=int, default=4, help="Back-to-back requests allowed per host")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="Page parser processes (0 = parse in the event loop)")
+    parser.add_argument("--parser", choices=("lxml", "html.parser"), default=None,
+                        help="HTML parser for sites that support both (default: lxml when installed)")
+    args = parser.parse_args()
+
+    load_site_plugins(args.plugin)
+    if args.list_sites:
+        print("\n".join(available_sites()))
+        return
 
-                image_url = img_tag["src"]
-                title = title_tag.text.strip()
-                artist = artist_tag.text.strip()
-                artwork_url = urljoin(BASE_URL, link_tag["href"])
-
-                filename = title.replace(" ", "_").replace("/", "_") + ".jpg"
-                image_path = os.path.join(OUTPUT_DIR, filename)
-
-                # Download image
-                img_data = requests.get(image_url).content
-                with open(image_path, "wb") as f:
-                    f.write(img_data)
-
-                # Get detailed information
-                print(f"📖 Getting details for: {title}")
-                details = get_artwork_details(artwork_url)
-                
-                # Add delay to be nice to the server
-                time.sleep(1)
-
-                # Combine all data
-                row = [
-                    title, artist, image_url, image_path,
-                    details.get("inventory", ""),
-                    details.get("date", ""),
-                    details.get("type", ""),
-                    details.get("technique", ""),
-                    details.get("dimensions", ""),
-                    details.get("subject", ""),
-                    details.get("school", ""),
-                    details.get("room", ""),
-                    details.get("description", "")
-                ]
-                
-                all_data.append(row)
-
-            except Exception as e:
-                print(f"⚠️ Error: {e}")
-                continue
-
-    return all_data
-
-def save_csv(data):
-    with open(CSV_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_headers)
-        writer.writerows(data)
+    names = available_sites() if args.all_sites else (args.site or ["ambrosiana"])
+    base_urls = parse_base_urls(args.base_url)
+    sites = [get_site(name, base_urls.get(name), args.parser) for name in names]
+    rows = asyncio.run(crawl(
+        sites, max_pages=args.max_pages, image_dir=args.image_dir, metadata_db=args.metadata_db,
+        max_concurrency=args.concurrency, rate=args.rate, burst=args.burst, resume=args.resume,
+        parse_workers=args.parse_workers,
+    ))
+    for name, count in rows.items():
+        print(f"✅ [{name}] {count} artworks saved.")
+    print(f"\n✅ Done! Metadata in {args.metadata_db}, images in {args.image_dir}/")
 
 if __name__ == "__main__":
-    data = scrape(max_pages=20)
-    save_csv(data)
-    print(f"\n✅ Done! {len(data)} artworks saved.")
+    main()
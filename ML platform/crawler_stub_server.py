@@ -0,0 +1,207 @@
+import io
+import os
+import asyncio
+import argparse
+from email.utils import formatdate
+from aiohttp import web
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+from PIL import Image
+from museum_sites import MuseumSite, register_site
+
+# ---------------------
+# 🧪 local stand-in for a museum site
+# ---------------------
+# Serves collection pages, detail pages and images built from the HTML
+# templates in crawler_fixtures/, in one of two layouts: "grid", the
+# structure of ambrosiana.it, and "cards", a different museum parsed by the
+# StubCardsSite plugin below. Images carry an ETag and Last-Modified and
+# answer conditional requests with 304 until their version is bumped.
+# `latency` delays every response, so crawl modes can be compared against
+# a realistic round trip:
+#
+#   python crawler_stub_server.py --pages 5 --per-page 12 --latency 0.2
+#   python crawler_stub_server.py --layout cards --port 8766
+#   python crawler.py --plugin crawler_stub_server --site ambrosiana --site stub-cards \
+#       --base-url ambrosiana=http://127.0.0.1:8765/en/discover/collection/page/{}/ \
+#       --base-url stub-cards=http://127.0.0.1:8766/collection/objects?page={}
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawler_fixtures")
+LISTING_PATHS = {
+    "grid": "/en/discover/collection/page/{}/",
+    "cards": "/collection/objects?page={}",
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def fixture_image(index, size=(64, 48)):
+    # A small JPEG per artwork, different colour for each
+    buffer = io.BytesIO()
+    Image.new("RGB", size, ((index * 37) % 256, (index * 91) % 256, (index * 53) % 256)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class StubMuseum:
+    """
+    `pages` collection pages of `per_page` artworks each; the page after the
+    last one is empty, which ends a crawl. Counts requests per path kind
+    and image bytes sent; `image_versions[index] += 1` changes an image.
+    """
+    def __init__(self, pages=3, per_page=12, latency=0.0, layout="grid"):
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.layout = layout
+        prefix = "" if layout == "grid" else f"{layout}_"
+        self.listing_template = load_fixture(f"{prefix}listing.html")
+        self.item_template = load_fixture(f"{prefix}listing_item.html" if layout == "grid" else f"{prefix}item.html")
+        self.detail_template = load_fixture(f"{prefix}detail.html")
+        self.requests = {"listing": 0, "detail": 0, "image": 0, "not_modified": 0}
+        self.image_bytes = 0
+        self.image_versions = {}
+        self.started = formatdate(usegmt=True)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def artwork(self, index):
+        return {
+            "index": index,
+            "slug": f"artwork-{index}",
+            "title": f"Study No. {index % 25}",  # repeated titles, like real collections
+            "artist": f"Painter {index % 7}",
+            "image_url": f"/wp-content/uploads/artwork-{index}.jpg",
+            "description": f"Fixture description of artwork {index}.",
+            "inventory": f"INV-{index:05d}",
+            "date": str(1500 + index % 300),
+            "dimensions": f"{40 + index % 60} × {30 + index % 50} cm",
+            "room": str(1 + index % 24),
+        }
+
+    async def _respond(self, kind, body, content_type, status=200, headers=None):
+        self.requests[kind] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if status == 304:
+                return web.Response(status=304, headers=headers)
+            return web.Response(body=body, content_type=content_type, headers=headers)
+        finally:
+            self.in_flight -= 1
+
+    async def listing(self, request):
+        page = int(request.match_info.get("page") or request.query.get("page", "1"))
+        indexes = range((page - 1) * self.per_page, page * self.per_page) if 1 <= page <= self.pages else []
+        items = "".join(self.item_template.format(**self.artwork(i)) for i in indexes)
+        return await self._respond("listing", self.listing_template.format(page=page, items=items).encode(), "text/html")
+
+    async def detail(self, request):
+        index = int(request.match_info["index"])
+        return await self._respond("detail", self.detail_template.format(**self.artwork(index)).encode(), "text/html")
+
+    async def image(self, request):
+        index = int(request.match_info["index"])
+        version = self.image_versions.get(index, 0)
+        headers = {"ETag": f'"{index}-{version}"', "Last-Modified": self.started}
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return await self._respond("not_modified", None, None, status=304, headers=headers)
+        body = fixture_image(index, size=(64 + version, 48))
+        self.image_bytes += len(body)
+        return await self._respond("image", body, "image/jpeg", headers=headers)
+
+    def app(self):
+        app = web.Application()
+        if self.layout == "grid":
+            app.router.add_get("/en/discover/collection/page/{page:\\d+}/", self.listing)
+            app.router.add_get("/en/opere/artwork-{index:\\d+}/", self.detail)
+            app.router.add_get("/wp-content/uploads/artwork-{index:\\d+}.jpg", self.image)
+        else:
+            app.router.add_get("/collection/objects", self.listing)
+            app.router.add_get("/collection/objects/{index:\\d+}", self.detail)
+            app.router.add_get("/media/{index:\\d+}/full.jpg", self.image)
+        return app
+
+
+async def start_stub_server(museum, host="127.0.0.1", port=0):
+    """
+    Start serving `museum` in the running event loop.
+
+    :return: (runner, base_url) - call `await runner.cleanup()` to stop;
+             base_url has {} for the page number, as MuseumSite expects
+    """
+    runner = web.AppRunner(museum.app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}{LISTING_PATHS[museum.layout]}"
+
+
+# ---------------------
+# 🔌 site plugin for the "cards" layout
+# ---------------------
+@register_site
+class StubCardsSite(MuseumSite):
+    name = "stub-cards"
+    museum_name = "Stub Museum of Cards"
+    base_url = "http://127.0.0.1:8766/collection/objects?page={}"
+
+    FACT_FIELDS = {
+        "object number": "inventory",
+        "dated": "date",
+        "medium": "technique",
+        "measurements": "dimensions",
+        "gallery": "room",
+    }
+
+    def parse_listing(self, html, page_url):
+        soup = BeautifulSoup(html, "html.parser")
+        items = []
+        for card in soup.select("li.object-card"):
+            img_tag = card.select_one("img[data-src]")
+            title_tag = card.select_one(".object-card__title")
+            maker_tag = card.select_one(".object-card__maker")
+            if not img_tag or not title_tag or not card.get("data-href"):
+                continue
+            items.append({
+                "title": title_tag.text.strip(),
+                "artist": maker_tag.text.strip() if maker_tag else "",
+                "image_url": urljoin(page_url, img_tag["data-src"]),
+                "artwork_url": urljoin(page_url, card["data-href"]),
+            })
+        return items
+
+    def parse_details(self, html):
+        soup = BeautifulSoup(html, "html.parser")
+        details = {"description": "\n".join(p.text.strip() for p in soup.select(".object__text p"))}
+        for dt in soup.select("dl.object__facts dt"):
+            dd = dt.find_next_sibling("dd")
+            label = dt.text.strip().lower()
+            # Unmapped facts (e.g. credit line) end up in the store's `extra` column
+            details[self.FACT_FIELDS.get(label, label.replace(" ", "_"))] = dd.text.strip() if dd else ""
+        return details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fixture museum pages for crawler.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--layout", choices=sorted(LISTING_PATHS), default="grid")
+    args = parser.parse_args()
+
+    museum = StubMuseum(args.pages, args.per_page, args.latency, args.layout)
+    print(f"🧪 Serving {args.pages * args.per_page} fixture artworks at "
+          f"http://{args.host}:{args.port}{LISTING_PATHS[args.layout]}")
+    web.run_app(museum.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import os
+import numpy as np
+
+# ---------------------
+# 🔎 pluggable nearest-neighbour indexes over normalized CLIP embeddings
+# ---------------------
+# Every backend stores L2-normalized float32 vectors, scores with inner
+# product (== cosine similarity) and returns (scores, ids) arrays of shape
+# [B, k], best first. Missing results are padded with id -1 / score -inf.
+
+def normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def top_k(scores, k):
+    """
+    Row-wise top-k of a [B, N] score matrix, sorted best first.
+    """
+    n = scores.shape[1]
+    if k >= n:
+        idx = np.argsort(-scores, axis=1)
+        return np.take_along_axis(scores, idx, axis=1), idx
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+def _pad(scores, ids, k):
+    missing = k - scores.shape[1]
+    if missing <= 0:
+        return scores, ids
+    scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+    ids = np.pad(ids, ((0, 0), (0, missing)), constant_values=-1)
+    return scores, ids
+
+
+class FlatIndex:
+    """
+    Exact search: one [B, D] x [D, N] matrix multiply plus top-k.
+    """
+    kind = "flat"
+
+    def __init__(self, block_size=65536):
+        self.vectors = None
+        self.block_size = block_size
+
+    def __len__(self):
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def build(self, vectors, normalized=False):
+        # ▶️ already-normalized (e.g. memory-mapped) vectors are used in place, not copied
+        self.vectors = vectors if normalized else np.ascontiguousarray(normalize(vectors))
+        return self
+
+    def _scores(self, queries):
+        if self.vectors.dtype == np.float32:
+            return queries @ self.vectors.T
+        # float16 stores: upcast block by block instead of materializing a float32 copy
+        return np.hstack([
+            queries @ self.vectors[i:i + self.block_size].astype(np.float32).T
+            for i in range(0, len(self.vectors), self.block_size)
+        ])
+
+    def search(self, queries, k=5):
+        queries = normalize(queries)
+        k_eff = min(k, len(self))
+        scores, ids = top_k(self._scores(queries), k_eff)
+        return _pad(scores, ids, k)
+
+    def state(self):
+        return {"vectors": self.vectors}
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls()
+        index.vectors = state["vectors"]
+        return index
+
+
+class IVFIndex:
+    """
+    Inverted-file index: spherical k-means splits the gallery into `nlist`
+    cells and a query only scans the `nprobe` closest cells.
+
+    Vectors are stored grouped by cell (CSR layout), so every probed cell is
+    one contiguous slice and search stays a handful of small matmuls.
+    """
+    kind = "ivf"
+
+    def __init__(self, nlist=None, nprobe=8, n_iter=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = None
+        self.vectors = None
+        self.ids = None
+        self.offsets = None
+
+    def __len__(self):
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def _train(self, vectors, nlist):
+        rng = np.random.default_rng(self.seed)
+        # k-means only needs a sample; a few dozen points per cell is plenty
+        sample_size = min(len(vectors), 64 * nlist)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            # ▶️ sort by cell and reduce contiguous runs; much faster than np.add.at
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            empty = ~filled
+            if empty.any():
+                # ▶️ re-seed empty cells with random points instead of dropping them
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            centroids = normalize(sums)
+        return centroids
+
+    def _assign(self, vectors, batch_size=65536):
+        return np.concatenate([
+            np.argmax(vectors[i:i + batch_size] @ self.centroids.T, axis=1)
+            for i in range(0, len(vectors), batch_size)
+        ])
+
+    def build(self, vectors, normalized=False):
+        vectors = np.asarray(vectors, dtype=np.float32) if normalized else normalize(vectors)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(vectors))))
+        self.nlist = min(nlist, len(vectors))
+        self.centroids = self._train(vectors, self.nlist)
+
+        assign = self._assign(vectors)
+        order = np.argsort(assign, kind="stable")
+        self.vectors = np.ascontiguousarray(vectors[order])
+        self.ids = order.astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))])
+        return self
+
+    def search(self, queries, k=5, nprobe=None):
+        queries = normalize(queries)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        _, probes = top_k(queries @ self.centroids.T, nprobe)
+
+        all_scores, all_ids = [], []
+        for query, cells in zip(queries, probes):
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+            if len(rows) == 0:
+                scores, ids = np.empty((1, 0), np.float32), np.empty((1, 0), np.int64)
+            else:
+                scores, local = top_k((self.vectors[rows] @ query)[None, :], min(k, len(rows)))
+                ids = self.ids[rows[local]]
+            scores, ids = _pad(scores, ids, k)
+            all_scores.append(scores)
+            all_ids.append(ids)
+        return np.vstack(all_scores), np.vstack(all_ids)
+
+    def state(self):
+        return {
+            "centroids": self.centroids,
+            "vectors": self.vectors,
+            "ids": self.ids,
+            "offsets": self.offsets,
+            "params": np.array([self.nlist, self.nprobe, self.n_iter, self.seed], dtype=np.int64),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        nlist, nprobe, n_iter, seed = (int(v) for v in state["params"])
+        index = cls(nlist=nlist, nprobe=nprobe, n_iter=n_iter, seed=seed)
+        index.centroids = state["centroids"]
+        index.vectors = state["vectors"]
+        index.ids = state["ids"]
+        index.offsets = state["offsets"]
+        return index
+
+
+INDEX_BACKENDS = {
+    FlatIndex.kind: FlatIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+# ---------------------
+# 🏗️ build / save / load helpers
+# ---------------------
+def build_index(vectors, kind="flat", normalized=False, **kwargs):
+    if kind not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index type '{kind}'. Use one of: {', '.join(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[kind](**kwargs).build(vectors, normalized=normalized)
+
+def save_index(index, index_file, gallery_fingerprint=""):
+    """
+    :param gallery_fingerprint: gallery_store.gallery_fingerprint of the store the
+                                index was built from, checked again on load
+    """
+    # ▶️ plain .npz without pickled objects, so loading never executes code
+    np.savez(index_file, kind=np.array(index.kind), gallery_fingerprint=np.array(gallery_fingerprint), **index.state())
+
+def load_index(index_file):
+    """
+    :return: the index; its gallery_fingerprint attribute is "" for indexes saved without one
+    """
+    if not os.path.exists(index_file):
+        raise FileNotFoundError(f"Gallery index file not found: {index_file}")
+    with np.load(index_file, allow_pickle=False) as data:
+        kind = str(data["kind"])
+        if kind not in INDEX_BACKENDS:
+            raise ValueError(f"Unknown index type '{kind}' in {index_file}")
+        fingerprint = str(data["gallery_fingerprint"]) if "gallery_fingerprint" in data.files else ""
+        state = {key: data[key] for key in data.files if key not in ("kind", "gallery_fingerprint")}
+    index = INDEX_BACKENDS[kind].from_state(state)
+    index.gallery_fingerprint = fingerprint
+    return index
+
+# ---------------------
+# 🎯 main entry: build an index for the gallery and save it
+# ---------------------
+def main():
+    import argparse
+    from gallery_store import gallery_fingerprint, load_gallery_store
+
+    parser = argparse.ArgumentParser(description="Build and save a search index over the CLIP gallery")
+    parser.add_argument("--gallery-dir", default="clip_gallery")
+    parser.add_argument("--index-file", default="clip_gallery_index.npz")
+    parser.add_argument("--type", default="ivf", choices=sorted(INDEX_BACKENDS))
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    embeddings, _, header = load_gallery_store(args.gallery_dir)
+    kwargs = {"nlist": args.nlist, "nprobe": args.nprobe} if args.type == "ivf" else {}
+    index = build_index(embeddings, kind=args.type, normalized=header["normalized"], **kwargs)
+    save_index(index, args.index_file, gallery_fingerprint(args.gallery_dir, header))
+    print(f"✅ Saved {args.type} index over {len(index)} embeddings to {args.index_file}")
+
+if __name__ == "__main__":
+    main()
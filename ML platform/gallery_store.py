@@ -0,0 +1,212 @@
+import os
+import csv
+import json
+import time
+import hashlib
+import shutil
+import numpy as np
+
+# ---------------------
+# 🗄️ on-disk gallery store
+# ---------------------
+# A gallery is a directory with a header and one data directory per write:
+#   header.json               model name, encoder backend, dimension, dtype, normalization,
+#                             row count, and data_dir: the version directory below
+#   <data_dir>/embeddings.npy [N, D] float16/float32 matrix, memory-mapped on load
+#   <data_dir>/metadata.csv   one row per embedding, same order as the matrix
+# Nothing in it is pickled, so loading never executes code, and every
+# worker process that maps embeddings.npy shares the same page cache.
+# Stores written before data_dir existed keep their files next to the header.
+
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.csv"
+SUPPORTED_DTYPES = ("float16", "float32")
+VERSION_PREFIX = "v"
+
+
+def save_gallery_store(store_dir, embeddings, metadata, model_name, dtype="float32", normalized=True, encoder="torch"):
+    """
+    Write a gallery store.
+
+    :param embeddings: [N, D] array-like of image embeddings
+    :param metadata: list of N dicts with the same keys (title, artist, image_path, ...)
+    :param model_name: name of the CLIP checkpoint that produced the embeddings
+    :param dtype: on-disk dtype, "float32" (default) or "float16"
+    :param normalized: whether the rows are already L2-normalized
+    :param encoder: CLIP backend that produced them ("torch", "onnx-fp32" or "onnx-int8", see clip_encoder.py)
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}'. Use one of: {', '.join(SUPPORTED_DTYPES)}")
+    embeddings = np.asarray(embeddings)
+    if embeddings.ndim != 2 or len(embeddings) != len(metadata):
+        raise ValueError(f"Expected [N, D] embeddings for {len(metadata)} rows, got shape {embeddings.shape}")
+
+    os.makedirs(store_dir, exist_ok=True)
+    columns = list(metadata[0].keys()) if metadata else ["title", "artist", "image_path"]
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_name": model_name,
+        "encoder": encoder,
+        "dim": int(embeddings.shape[1]),
+        "count": int(embeddings.shape[0]),
+        "dtype": dtype,
+        "normalized": bool(normalized),
+        "metadata_columns": columns,
+    }
+
+    # ▶️ the files go to a fresh version directory that no reader knows yet; replacing
+    #    header.json (a single atomic rename) then switches readers from the old
+    #    complete version to the new one
+    previous = read_data_dir(store_dir)
+    version = f"{VERSION_PREFIX}{time.time_ns()}"
+    data_dir = os.path.join(store_dir, version)
+    os.makedirs(data_dir)
+    with open(os.path.join(data_dir, EMBEDDINGS_FILE), "wb") as f:
+        np.save(f, np.ascontiguousarray(embeddings, dtype=dtype))
+    with open(os.path.join(data_dir, METADATA_FILE), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(metadata)
+
+    header["data_dir"] = version
+    header_path = os.path.join(store_dir, HEADER_FILE)
+    with open(header_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+    os.replace(header_path + ".tmp", header_path)
+
+    # ▶️ keep the previous version: a reader may have just read the old header
+    remove_old_versions(store_dir, keep=(version, previous))
+    return header
+
+
+def read_data_dir(store_dir):
+    """
+    :return: data_dir of the current header, "" for stores with the files next to
+             the header, None when there is no store yet
+    """
+    header_path = os.path.join(store_dir, HEADER_FILE)
+    if not os.path.exists(header_path):
+        return None
+    with open(header_path, encoding="utf-8") as f:
+        return json.load(f).get("data_dir", "")
+
+
+def remove_old_versions(store_dir, keep):
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if name.startswith(VERSION_PREFIX) and name[len(VERSION_PREFIX):].isdigit() and os.path.isdir(path) and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+    if "" not in keep:
+        # ▶️ files of a store written before versioned data directories
+        for name in (EMBEDDINGS_FILE, METADATA_FILE):
+            if os.path.exists(os.path.join(store_dir, name)):
+                os.remove(os.path.join(store_dir, name))
+
+
+def load_gallery_header(store_dir):
+    header_path = os.path.join(store_dir, HEADER_FILE)
+    if not os.path.exists(header_path):
+        raise FileNotFoundError(f"Gallery store not found: {store_dir}")
+    with open(header_path, encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported gallery store version {header.get('format_version')} in {store_dir}")
+    return header
+
+
+def load_gallery_store(store_dir, mmap=True, attempts=3):
+    """
+    Load a gallery store.
+
+    :param mmap: memory-map embeddings.npy read-only instead of reading it into memory
+    :param attempts: header reads when the version it points to is removed meanwhile
+    :return: (embeddings [N, D] array, metadata list of dicts, header dict)
+    """
+    for attempt in range(attempts):
+        header = load_gallery_header(store_dir)
+        data_dir = os.path.join(store_dir, header.get("data_dir", ""))
+        try:
+            embeddings = np.load(
+                os.path.join(data_dir, EMBEDDINGS_FILE),
+                mmap_mode="r" if mmap else None,
+                allow_pickle=False,
+            )
+            with open(os.path.join(data_dir, METADATA_FILE), newline="", encoding="utf-8") as f:
+                metadata = list(csv.DictReader(f))
+            break
+        except FileNotFoundError:
+            # ▶️ two newer stores were saved since the header was read; follow the new header
+            if attempt == attempts - 1:
+                raise
+
+    if embeddings.shape != (header["count"], header["dim"]) or len(metadata) != header["count"]:
+        raise ValueError(
+            f"Corrupt gallery store {store_dir}: header says {header['count']} x {header['dim']}, "
+            f"found {embeddings.shape} embeddings and {len(metadata)} metadata rows"
+        )
+    return embeddings, metadata, header
+
+
+def gallery_fingerprint(store_dir, header=None):
+    """
+    Identity of the store's current contents, saved with prebuilt indexes so a
+    stale index (rows replaced or reordered, same count) is detected.
+
+    :return: the header's data_dir (new on every save); for stores written
+             before data_dir existed, a sha256 of their embeddings and metadata
+    """
+    header = header or load_gallery_header(store_dir)
+    if header.get("data_dir"):
+        return header["data_dir"]
+    digest = hashlib.sha256()
+    for name in (EMBEDDINGS_FILE, METADATA_FILE):
+        with open(os.path.join(store_dir, name), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return f"sha256:{digest.hexdigest()}"
+
+
+# ---------------------
+# 🔁 one-shot converter from the legacy pickle gallery
+# ---------------------
+def convert_pickle_gallery(pickle_file, store_dir, model_name="openai/clip-vit-base-patch32", dtype="float32"):
+    """
+    Convert a legacy clip_gallery_embeddings.pkl, a pickled list of
+    (torch.Tensor, title, artist, image_path) tuples, into a gallery store.
+
+    Only run this on pickle files you produced yourself: unpickling executes code.
+    """
+    import pickle
+    import torch  # noqa: F401  (the pickle references torch tensors)
+
+    with open(pickle_file, "rb") as f:
+        rows = pickle.load(f)
+    if not rows:
+        raise ValueError(f"No embeddings in {pickle_file}")
+
+    embeddings = np.stack([emb.float().cpu().numpy() for emb, _, _, _ in rows]).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    metadata = [
+        {"title": title, "artist": artist, "image_path": image_path}
+        for _, title, artist, image_path in rows
+    ]
+    return save_gallery_store(store_dir, embeddings, metadata, model_name, dtype=dtype, normalized=True)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a legacy pickle gallery into a memory-mappable gallery store")
+    parser.add_argument("pickle_file", nargs="?", default="clip_gallery_embeddings.pkl")
+    parser.add_argument("store_dir", nargs="?", default="clip_gallery")
+    parser.add_argument("--model-name", default="openai/clip-vit-base-patch32")
+    parser.add_argument("--dtype", default="float32", choices=SUPPORTED_DTYPES)
+    args = parser.parse_args()
+
+    header = convert_pickle_gallery(args.pickle_file, args.store_dir, args.model_name, args.dtype)
+    print(f"✅ Converted {header['count']} embeddings ({header['dim']}-d, {header['dtype']}) to {args.store_dir}/")
+
+if __name__ == "__main__":
+    main()
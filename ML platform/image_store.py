@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import mimetypes
+from urllib.parse import urlsplit
+
+# ---------------------
+# 🗃️ content-addressed image store
+# ---------------------
+# Images are saved under their sha256, so two artworks with the same title
+# never overwrite each other and identical images are stored once:
+#   <root>/ab/abcdef....jpg
+#   <root>/manifest.jsonl   one JSON line per fetch: url, sha256, path, etag,
+#                           last_modified, size; the last line of a url wins
+# The manifest is append-only and flushed per line, so a crash loses at most
+# the image being written. It is compacted to one line per url on open.
+# Fetches send the ETag / Last-Modified of the previous fetch, so a re-crawl
+# only transfers images the server reports as changed.
+
+MANIFEST_FILE = "manifest.jsonl"
+DEFAULT_EXTENSION = ".jpg"
+
+
+class ImageStore:
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.manifest_path = os.path.join(root_dir, MANIFEST_FILE)
+        self.entries = {}
+        os.makedirs(root_dir, exist_ok=True)
+        self._load()
+        self._manifest = open(self.manifest_path, "a", encoding="utf-8")
+        self.stats = {"downloaded": 0, "not_modified": 0, "deduplicated": 0, "bytes": 0}
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, encoding="utf-8") as f:
+            lines = f.readlines()
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; the image it described is fetched again
+                continue
+            self.entries[entry["url"]] = entry
+
+        if len(lines) > len(self.entries):
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.manifest_path)
+
+    def close(self):
+        self._manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, url):
+        """
+        The stored entry for url, or None if it was never fetched or its file is gone.
+        """
+        entry = self.entries.get(url)
+        if entry is None or not os.path.exists(entry["path"]):
+            return None
+        return entry
+
+    def conditional_headers(self, url):
+        entry = self.lookup(url)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def path_for(self, sha256, extension):
+        return os.path.join(self.root_dir, sha256[:2], sha256 + extension)
+
+    def temp_path(self):
+        return os.path.join(self.root_dir, uuid.uuid4().hex + ".part")
+
+    def not_modified(self, url):
+        """
+        Record a 304 for url and return its stored path.
+        """
+        self.stats["not_modified"] += 1
+        return self.lookup(url)["path"]
+
+    def commit(self, url, tmp_path, sha256, size, headers):
+        """
+        Move a downloaded temp file to its content address and record it.
+
+        :param headers: response headers (ETag, Last-Modified, Content-Type)
+        :return: path of the stored image
+        """
+        extension = image_extension(url, headers.get("Content-Type"))
+        path = self.path_for(sha256, extension)
+        if os.path.exists(path):
+            # Same bytes already stored for another url (or an unchanged re-download)
+            os.remove(tmp_path)
+            self.stats["deduplicated"] += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        self.stats["downloaded"] += 1
+        self.stats["bytes"] += size
+
+        entry = {
+            "url": url,
+            "sha256": sha256,
+            "path": path,
+            "size": size,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        self.entries[url] = entry
+        self._manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._manifest.flush()
+        return path
+
+
+def image_extension(url, content_type=None):
+    extension = os.path.splitext(urlsplit(url).path)[1].lower()
+    if extension in (".jpg", ".jpeg", ".png", ".webp", ".gif"):
+        return ".jpg" if extension == ".jpeg" else extension
+    guessed = mimetypes.guess_extension((content_type or "").split(";")[0].strip())
+    if guessed in (".jpg", ".jpeg", ".png", ".webp", ".gif"):
+        return ".jpg" if guessed == ".jpeg" else guessed
+    return DEFAULT_EXTENSION
+
+
+async def fetch_image(store, fetcher, url, chunk_size=64 * 1024):
+    """
+    Conditionally fetch url through a crawler AsyncFetcher into the store.
+
+    :return: stored image path
+    """
+    async with fetcher.get(url, headers=store.conditional_headers(url)) as resp:
+        if resp.status == 304:
+            return store.not_modified(url)
+        tmp_path = store.temp_path()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                async for chunk in resp.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            fetcher.bytes += size
+            return store.commit(url, tmp_path, digest.hexdigest(), size, resp.headers)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import pandas as pd
+from museum_sites import DETAIL_FIELDS
+
+# ---------------------
+# 🗂️ normalized artwork metadata store
+# ---------------------
+# One SQLite table for every crawled museum, keyed by artwork page URL, so
+# re-crawls update rows in place and several sites can be written by one
+# crawl. build_clip_gallery reads it directly (load_metadata), as it reads
+# a legacy per-museum CSV.
+
+DEFAULT_METADATA_DB = "museum_metadata.sqlite3"
+COLUMNS = (
+    "site", "artwork_url", "museum_name",
+    "title", "artist", "image_url", "image_path",
+) + DETAIL_FIELDS + ("extra", "crawled_at")
+
+
+class MetadataStore:
+    def __init__(self, path=DEFAULT_METADATA_DB):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        detail_columns = ", ".join(f"{field} TEXT" for field in DETAIL_FIELDS)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artworks ("
+            "site TEXT NOT NULL, artwork_url TEXT PRIMARY KEY, museum_name TEXT, "
+            "title TEXT, artist TEXT, image_url TEXT, image_path TEXT, "
+            f"{detail_columns}, extra TEXT, crawled_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS artworks_site ON artworks (site)")
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upsert(self, site, item, image_path, details):
+        """
+        Insert or replace the row of one artwork.
+
+        :param site: MuseumSite the artwork was crawled from
+        :param item: listing entry (title, artist, image_url, artwork_url)
+        :param details: parsed detail fields; keys outside DETAIL_FIELDS go to `extra`
+        """
+        extra = {k: v for k, v in details.items() if k not in DETAIL_FIELDS}
+        row = (
+            site.name, item["artwork_url"], site.museum_name,
+            item["title"], item["artist"], item["image_url"], image_path,
+        ) + tuple(details.get(field, "") for field in DETAIL_FIELDS) + (
+            json.dumps(extra, ensure_ascii=False) if extra else "",
+            time.time(),
+        )
+        self._db.execute(
+            f"INSERT OR REPLACE INTO artworks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+            row,
+        )
+        # Committed per row, so an interrupted crawl keeps everything written so far
+        self._db.commit()
+
+    def count(self, site=None):
+        if site is None:
+            return self._db.execute("SELECT COUNT(*) FROM artworks").fetchone()[0]
+        return self._db.execute("SELECT COUNT(*) FROM artworks WHERE site = ?", (site,)).fetchone()[0]
+
+    def to_dataframe(self, sites=None):
+        query = f"SELECT {', '.join(COLUMNS)} FROM artworks"
+        params = ()
+        if sites:
+            query += f" WHERE site IN ({', '.join('?' for _ in sites)})"
+            params = tuple(sites)
+        return pd.read_sql_query(query + " ORDER BY site, rowid", self._db, params=params)
+
+    def import_csv(self, csv_path, site, museum_name):
+        """
+        Load a legacy crawler CSV (e.g. ambrosiana_metadata.csv) as rows of `site`.
+        The CSV has no artwork page URL, so image_url stands in as the key.
+        """
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        df.columns = df.columns.str.strip()
+        now = time.time()
+        rows = []
+        for record in df.to_dict("records"):
+            rows.append(
+                (site, record.get("artwork_url") or record["image_url"], record.get("museum_name") or museum_name,
+                 record["title"], record["artist"], record["image_url"], record["image_path"])
+                + tuple(record.get(field, "") for field in DETAIL_FIELDS)
+                + ("", now)
+            )
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO artworks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+            rows,
+        )
+        self._db.commit()
+        return len(rows)
+
+
+def load_metadata(path, sites=None):
+    """
+    Artwork metadata as a DataFrame, from the SQLite store or a legacy CSV.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Metadata file not found: {path}")
+    if path.endswith((".sqlite3", ".sqlite", ".db")):
+        with MetadataStore(path) as store:
+            return store.to_dataframe(sites)
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or import into the artwork metadata store")
+    parser.add_argument("--db", default=DEFAULT_METADATA_DB)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Rows per site")
+    import_parser = subparsers.add_parser("import", help="Load a legacy crawler CSV")
+    import_parser.add_argument("csv_path")
+    import_parser.add_argument("--site", default="ambrosiana")
+    import_parser.add_argument("--museum-name", default="Pinacoteca Ambrosiana")
+    args = parser.parse_args()
+
+    with MetadataStore(args.db) as store:
+        if args.command == "import":
+            count = store.import_csv(args.csv_path, args.site, args.museum_name)
+            print(f"✅ Imported {count} rows from {args.csv_path} as '{args.site}'")
+        else:
+            df = store.to_dataframe()
+            for site, rows in df.groupby("site"):
+                print(f"{site:<20} {len(rows):>6} artworks  ({rows['museum_name'].iloc[0]})")
+            print(f"{'total':<20} {len(df):>6} artworks")
+
+
+if __name__ == "__main__":
+    main()
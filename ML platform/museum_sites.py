@@ -0,0 +1,250 @@
+import importlib
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+# ---------------------
+# 🏛️ museum site plugins
+# ---------------------
+# A site plugin knows one museum's pages: where its collection listing is
+# and how to read artworks off listing and detail pages. Fetching, rate
+# limiting, image storage, checkpoints and the metadata store are shared
+# (crawler.py), so adding a museum means writing a subclass here (or in any
+# module passed to crawler.py --plugin) and registering it by name:
+#
+#   @register_site
+#   class MyMuseum(MuseumSite):
+#       name = "my-museum"
+#       museum_name = "My Museum"
+#       base_url = "https://example.org/collection?page={}"
+#       def parse_listing(self, html, page_url): ...
+#       def parse_details(self, html): ...
+#
+# Parsers run in crawler.py's process pool, so sites must be picklable
+# (plain attributes; compiled selectors belong on the class).
+
+# Detail fields every site maps its own labels onto; anything else a parser
+# returns is kept in the metadata store's `extra` column
+DETAIL_FIELDS = (
+    "inventory", "date", "type", "technique",
+    "dimensions", "subject", "school", "room",
+    "description",
+)
+
+_SITES = {}
+
+
+def xpath(expression):
+    return etree.XPath(expression) if HAVE_LXML else None
+
+
+def has_class(name):
+    # XPath 1.0 equivalent of the CSS selector .name
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def node_text(nodes):
+    return nodes[0].text_content().strip() if nodes else ""
+
+
+def parse_document(html):
+    try:
+        return lxml_html.fromstring(html)
+    except ValueError:
+        # lxml refuses str input that still carries an <?xml encoding=...?> declaration
+        return lxml_html.fromstring(html.encode("utf-8"))
+
+
+class MuseumSite:
+    name = None
+    museum_name = None
+    base_url = None
+
+    def __init__(self, base_url=None, parser=None):
+        """
+        :param parser: "lxml" (C parser, compiled XPath; default when installed)
+                       or "html.parser" (BeautifulSoup, pure Python)
+        """
+        if base_url:
+            self.base_url = base_url
+        self.parser = parser or ("lxml" if HAVE_LXML else "html.parser")
+        if self.parser == "lxml" and not HAVE_LXML:
+            raise ValueError("parser='lxml' needs the lxml package")
+
+    def listing_url(self, page):
+        """
+        URL of collection page `page` (1-based). The crawl stops at the first
+        page without artworks.
+        """
+        return self.base_url.format(page)
+
+    def parse_listing(self, html, page_url):
+        """
+        :return: list of dicts with title, artist, image_url and artwork_url (absolute)
+        """
+        raise NotImplementedError
+
+    def parse_details(self, html):
+        """
+        :return: dict of DETAIL_FIELDS (missing ones may be left out) plus any extra fields
+        """
+        raise NotImplementedError
+
+
+def register_site(cls):
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} has no name")
+    if cls.name in _SITES and _SITES[cls.name] is not cls:
+        raise ValueError(f"Museum site '{cls.name}' is already registered by {_SITES[cls.name].__name__}")
+    _SITES[cls.name] = cls
+    return cls
+
+
+def get_site(name, base_url=None, parser=None):
+    if name not in _SITES:
+        raise ValueError(f"Unknown museum site '{name}'. Available: {', '.join(available_sites())}")
+    return _SITES[name](base_url, parser)
+
+
+def available_sites():
+    return sorted(_SITES)
+
+
+def load_site_plugins(modules):
+    """
+    Import modules that register additional sites.
+    """
+    for module in modules:
+        importlib.import_module(module)
+
+
+def parse_page(site, kind, html, page_url=None):
+    """
+    Entry point for parser worker processes: `site` arrives pickled (its
+    class's module is imported on the way, registering plugin sites too).
+
+    :param kind: "listing" or "details"
+    """
+    if kind == "listing":
+        return site.parse_listing(html, page_url)
+    return site.parse_details(html)
+
+
+# ---------------------
+# 🖼️ Pinacoteca Ambrosiana (ambrosiana.it)
+# ---------------------
+@register_site
+class AmbrosianaSite(MuseumSite):
+    name = "ambrosiana"
+    museum_name = "Pinacoteca Ambrosiana"
+    base_url = "https://ambrosiana.it/en/discover/collection/page/{}/"
+
+    SIDEBAR_LABELS = {
+        "inventory": "inventory",
+        "date": "date",
+        "type": "type",
+        "technique": "technique",
+        "dimension": "dimensions",
+        "subject": "subject",
+        "school": "school",
+        "room": "room",
+    }
+
+    # Compiled once per process; each pulls exactly one field
+    _ITEMS = xpath(f"//*[{has_class('grid-item')}]")
+    _ITEM_IMAGE = xpath("(.//img)[1]/@src")
+    _ITEM_TITLE = xpath(f"(.//h2[{has_class('italic')}])[1]")
+    _ITEM_H2 = xpath(".//h2")
+    _ITEM_LINK = xpath("(.//a)[1]/@href")
+    _DESCRIPTION = xpath("(//div[@id='opera_content']//p)[1]")
+    _SIDEBAR_ITEMS = xpath("//div[@id='opera_sidebar']//ul//li")
+    _ITEM_KEY = xpath("(.//h3)[1]")
+    _ITEM_VALUE = xpath("(.//span)[1]")
+
+    def parse_listing(self, html, page_url):
+        if self.parser != "lxml":
+            return self._parse_listing_soup(html, page_url)
+        items = []
+        for art in self._ITEMS(parse_document(html)):
+            image = self._ITEM_IMAGE(art)
+            title = self._ITEM_TITLE(art)
+            headings = self._ITEM_H2(art)
+            link = self._ITEM_LINK(art)
+
+            if not image or not title or len(headings) < 2 or not link:
+                continue
+
+            items.append({
+                "title": node_text(title),
+                "artist": node_text(headings[1:2]),
+                "image_url": urljoin(page_url, image[0]),
+                "artwork_url": urljoin(page_url, link[0]),
+            })
+        return items
+
+    def parse_details(self, html):
+        if self.parser != "lxml":
+            return self._parse_details_soup(html)
+        root = parse_document(html)
+        details = {"description": node_text(self._DESCRIPTION(root))}
+        for item in self._SIDEBAR_ITEMS(root):
+            key_nodes = self._ITEM_KEY(item)
+            value_nodes = self._ITEM_VALUE(item)
+            if not key_nodes or not value_nodes:
+                print("⚠️ Error parsing metadata item: missing label or value")
+                continue
+            key = node_text(key_nodes).lower()
+            for label, field in self.SIDEBAR_LABELS.items():
+                if label in key:
+                    details[field] = node_text(value_nodes)
+                    break
+        return details
+
+    def _parse_listing_soup(self, html, page_url):
+        soup = BeautifulSoup(html, "html.parser")
+        items = []
+        for art in soup.select(".grid-item"):
+            img_tag = art.select_one("img")
+            title_tag = art.select_one("h2.italic")
+            artist_tag = art.select("h2")[1] if len(art.select("h2")) > 1 else None
+            link_tag = art.select_one("a")
+
+            if not img_tag or not title_tag or not artist_tag or not link_tag:
+                continue
+
+            items.append({
+                "title": title_tag.text.strip(),
+                "artist": artist_tag.text.strip(),
+                "image_url": urljoin(page_url, img_tag["src"]),
+                "artwork_url": urljoin(page_url, link_tag["href"]),
+            })
+        return items
+
+    def _parse_details_soup(self, html):
+        soup = BeautifulSoup(html, "html.parser")
+        details = {}
+
+        # Get description
+        description_tag = soup.select_one("div#opera_content p")
+        details["description"] = description_tag.text.strip() if description_tag else ""
+
+        # Metadata section
+        for item in soup.select("div#opera_sidebar ul li"):
+            try:
+                key = item.select_one("h3").text.strip().lower()
+                value = item.select_one("span").text.strip()
+            except Exception as e:
+                print(f"⚠️ Error parsing metadata item: {e}")
+                continue
+            for label, field in self.SIDEBAR_LABELS.items():
+                if label in key:
+                    details[field] = value
+                    break
+
+        return details
@@ -0,0 +1,135 @@
+import numpy as np
+from PIL import Image, ImageStat
+
+try:
+    import cv2
+    HAVE_CV2 = True
+except ImportError:
+    HAVE_CV2 = False
+
+# ---------------------
+# 🖼️ query views of a visitor photo
+# ---------------------
+# Visitor photos are taken at an angle, show the frame and the wall around
+# it and often catch glare. CLIP's own preprocessing keeps a single centre
+# crop, so one photo becomes several query views, encoded in one batch,
+# and each gallery row keeps its best (or mean) score over them:
+#   full         the whole photo, padded to a square instead of cropped
+#   center       CLIP's usual resize + centre crop (the single-view query)
+#   tiles        four overlapping corner crops and a tight centre crop, for
+#                off-centre artworks and photos with a glare spot
+#   perspective  the largest quadrilateral in the photo (usually the frame)
+#                warped to a rectangle; needs opencv-python, and is left out
+#                when no frame is found
+
+VIEW_NAMES = ("full", "center", "tiles", "perspective")
+TILE_FRACTION = 2 / 3
+# A detected frame must cover this share of the photo, and not all of it
+MIN_QUAD_AREA = 0.2
+MAX_QUAD_AREA = 0.95
+
+def pad_to_square(image):
+    width, height = image.size
+    side = max(width, height)
+    fill = tuple(int(c) for c in ImageStat.Stat(image).mean[:3])
+    square = Image.new("RGB", (side, side), fill)
+    square.paste(image, ((side - width) // 2, (side - height) // 2))
+    return square
+
+def tile_crops(image, fraction=TILE_FRACTION):
+    """
+    Four corner crops and a centre crop, each `fraction` of the width and height.
+    """
+    width, height = image.size
+    tile_w, tile_h = round(width * fraction), round(height * fraction)
+    left, top = (width - tile_w) // 2, (height - tile_h) // 2
+    origins = [(0, 0), (width - tile_w, 0), (0, height - tile_h), (width - tile_w, height - tile_h), (left, top)]
+    return [image.crop((x, y, x + tile_w, y + tile_h)) for x, y in origins]
+
+def order_corners(points):
+    """
+    :return: [4, 2] float32 corners as top-left, top-right, bottom-right, bottom-left
+    """
+    sums = points.sum(axis=1)
+    diffs = points[:, 1] - points[:, 0]
+    return np.float32([points[sums.argmin()], points[diffs.argmin()], points[sums.argmax()], points[diffs.argmax()]])
+
+def find_artwork_quad(image, max_edge=512):
+    """
+    Corners of the largest convex quadrilateral outline in the photo, in
+    full-size pixel coordinates, or None (also when opencv is not installed).
+    """
+    if not HAVE_CV2:
+        return None
+    scale = min(1.0, max_edge / max(image.size))
+    small = image.resize((round(image.width * scale), round(image.height * scale))) if scale < 1 else image
+    gray = cv2.GaussianBlur(cv2.cvtColor(np.asarray(small), cv2.COLOR_RGB2GRAY), (5, 5), 0)
+    # ▶️ dilate so small gaps in the frame outline do not split its contour
+    edges = cv2.dilate(cv2.Canny(gray, 50, 150), None)
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    area = gray.shape[0] * gray.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:10]:
+        contour_area = cv2.contourArea(contour)
+        if contour_area < MIN_QUAD_AREA * area:
+            break
+        if contour_area > MAX_QUAD_AREA * area:
+            continue
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            return order_corners(approx.reshape(4, 2).astype(np.float32) / scale)
+    return None
+
+def perspective_crop(image):
+    """
+    The detected artwork warped to a fronto-parallel rectangle, or None.
+    """
+    quad = find_artwork_quad(image)
+    if quad is None:
+        return None
+    top_left, top_right, bottom_right, bottom_left = quad
+    width = int(max(np.linalg.norm(top_right - top_left), np.linalg.norm(bottom_right - bottom_left)))
+    height = int(max(np.linalg.norm(bottom_left - top_left), np.linalg.norm(bottom_right - top_right)))
+    if width < 16 or height < 16:
+        return None
+    target = np.float32([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]])
+    matrix = cv2.getPerspectiveTransform(quad, target)
+    return Image.fromarray(cv2.warpPerspective(np.asarray(image), matrix, (width, height)))
+
+def make_views(image, views=VIEW_NAMES):
+    """
+    Build the query views of an RGB photo, in VIEW_NAMES order.
+
+    :param views: names from VIEW_NAMES
+    :return: (images, names), one name per image ("tiles" gives five)
+    """
+    unknown = set(views) - set(VIEW_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown query views: {', '.join(sorted(unknown))}. Available: {', '.join(VIEW_NAMES)}")
+    images, names = [], []
+    if "full" in views:
+        images.append(pad_to_square(image))
+        names.append("full")
+    if "center" in views:
+        # ▶️ the processor resizes and centre-crops it, exactly like the gallery images
+        images.append(image)
+        names.append("center")
+    if "tiles" in views:
+        tiles = tile_crops(image)
+        images.extend(tiles)
+        names.extend(f"tile{i}" for i in range(len(tiles)))
+    if "perspective" in views:
+        try:
+            warped = perspective_crop(image)
+        except Exception as e:
+            # ▶️ a failed frame detection only costs this view, not the query
+            print(f"⚠️ Perspective correction failed: {e}")
+            warped = None
+        if warped is not None:
+            images.append(warped)
+            names.append("perspective")
+    if not images:
+        # ▶️ perspective alone and no frame found: fall back to the single-view query
+        images.append(image)
+        names.append("center")
+    return images, names
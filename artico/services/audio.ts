@@ -9,6 +9,9 @@ interface PollAudioOptions {
   timeoutMs?: number;
 }
 
+// Longest wait per request; the server caps it as well
+const LONG_POLL_WAIT_SECONDS = 25;
+
 export const pollAudioUrl = ({
   sessionId,
   onAudioReady,
@@ -16,37 +19,45 @@ export const pollAudioUrl = ({
   timeoutMs = 15 * 1000
 }: PollAudioOptions) => {
   const startTime = Date.now();
+  let cancelled = false;
 
+  // Long poll: each request returns as soon as the audio is stored, or when its wait runs out
   const poll = async () => {
-    try {
-      const response = await fetch(`http://${IP_ADDRESS}:8000/api/audio_url?session_id=${sessionId}`);
-      const data = await response.json();
-
-      if (data.audio_url) {
-        const savedAudioUri = await saveAudioToFileSystem(data.audio_url);
-        onAudioReady(savedAudioUri);
-        return true;
-      }
-
-      if (Date.now() - startTime > timeoutMs) {
+    while (!cancelled) {
+      const remainingMs = timeoutMs - (Date.now() - startTime);
+      if (remainingMs <= 0) {
         onError?.(new Error('Audio polling timeout'));
-        return true;
+        return;
       }
 
-      return false;
-    } catch (error) {
-      console.error('Error polling audio URL:', error);
-      onError?.(error);
-      return false;
+      try {
+        const wait = Math.min(LONG_POLL_WAIT_SECONDS, Math.ceil(remainingMs / 1000));
+        const response = await fetch(`http://${IP_ADDRESS}:8000/api/audio_url?session_id=${sessionId}&wait=${wait}`);
+        const data = await response.json();
+        if (cancelled) return;
+
+        if (data.audio_url) {
+          const savedAudioUri = await saveAudioToFileSystem(data.audio_url);
+          onAudioReady(savedAudioUri);
+          return;
+        }
+
+        if (data.status === 'failed') {
+          onError?.(new Error('Audio generation failed'));
+          return;
+        }
+      } catch (error) {
+        console.error('Error polling audio URL:', error);
+        onError?.(error);
+        // Back off before retrying after a network error
+        await new Promise(resolve => setTimeout(resolve, 5000));
+      }
     }
   };
 
-  const pollInterval = setInterval(async () => {
-    const isDone = await poll();
-    if (isDone) {
-      clearInterval(pollInterval);
-    }
-  }, 5000);
+  poll();
 
-  return () => clearInterval(pollInterval);
-}; 
\ No newline at end of file
+  return () => {
+    cancelled = true;
+  };
+};
@@ -15,11 +15,12 @@ class AIClient(ABC):
         self.role = role
 
     @abstractmethod
-    def generate_initial_description(self, image_bytes):
+    def generate_initial_description(self, image_bytes, mime_type="image/jpeg"):
         """
         Generate the initial spoken description for an artwork.
         
         :param image_bytes: The image content in bytes
+        :param mime_type: MIME type of image_bytes
         :param language: Target language for explanation
         :param role: User type (child, adult, senior, expert)
         :return: ArtworkMetadata object
@@ -46,3 +47,48 @@ class AIClient(ABC):
         :param session_id: Unique session identifier
         """
         pass
+
+    @abstractmethod
+    async def agenerate_initial_description(self, image_bytes, mime_type="image/jpeg"):
+        """
+        Async variant of generate_initial_description. Must not block the event loop.
+        
+        :param image_bytes: The image content in bytes
+        :param mime_type: MIME type of image_bytes
+        :return: ArtworkMetadata object
+        """
+        pass
+
+    @abstractmethod
+    async def acontinue_conversation(self, user_input: str, history: list = None):
+        """
+        Async variant of continue_conversation. Must not block the event loop.
+        
+        :param user_input: The user's input message
+        :param history: List of previous messages in the conversation
+        :return: The AI's response
+        """
+        pass
+
+    @abstractmethod
+    def astream_conversation(self, user_input: str, history: list = None):
+        """
+        Stream the AI's reply as it is generated. Once the stream is exhausted,
+        the user input and the full reply have been appended to history.
+        
+        :param user_input: The user's input message
+        :param history: List of previous messages in the conversation
+        :return: Async iterator of reply text fragments
+        """
+        pass
+
+    @abstractmethod
+    async def asummarize_conversation(self, summary: str, messages: list) -> str:
+        """
+        Fold older conversation turns into a running summary.
+        
+        :param summary: The current summary ("" if none yet)
+        :param messages: The turns ({"role", "content"}) to fold in, oldest first
+        :return: The updated summary
+        """
+        pass
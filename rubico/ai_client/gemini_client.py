@@ -2,28 +2,29 @@ from google import genai
 from google.genai import types
 from model.ArtworkMetadata import ArtworkMetadata
 from .client import AIClient
-from .promptGenerator import PromptGenerator
 from .tts_client import synthesize_speech
-from utils.s3Server import upload_file_and_get_presigned_url
+from utils.client_registry import ClientRegistry, get_registry
 import json
 from typing import Dict
 
 
 class GeminiClient(AIClient):
-    def __init__(self, api_key, language="en", role="adult"):
+    def __init__(self, api_key, language="en", role="adult", registry: ClientRegistry = None):
         """
         Initialize the Gemini client.
         
         :param api_key: Gemini API key
         :param language: Target language for responses
         :param role: User type (child, adult, senior, expert)
+        :param registry: Shared clients to use (default: the process-wide registry)
         """
         super().__init__(language, role)
-        self.client = genai.Client(api_key=api_key)
+        registry = registry or get_registry()
+        self.client = registry.gemini(api_key)
         self.model_name = 'gemini-2.0-flash-exp'
-        self.prompt_generator = PromptGenerator(language=language, role=role) 
+        self.prompt_generator = registry.prompt_generator(language, role)
  
-    def generate_initial_description(self, image_bytes):
+    def generate_initial_description(self, image_bytes, mime_type='image/jpeg'):
         """
         Generate the initial spoken description for an artwork using Gemini Flash model.
         """
@@ -32,7 +33,7 @@ class GeminiClient(AIClient):
         response = self.client.models.generate_content(
             model=self.model_name,
             contents=[
-                types.Part.from_bytes(data=image_bytes, mime_type='image/jpeg'),
+                types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
                 prompt,
                 self.prompt_generator.language,
             ],
@@ -45,6 +46,27 @@ class GeminiClient(AIClient):
         artwork_data: ArtworkMetadata = response.parsed
         return artwork_data
 
+    async def agenerate_initial_description(self, image_bytes, mime_type='image/jpeg'):
+        """
+        Async variant of generate_initial_description using the client's aio interface.
+        """
+        prompt = self.prompt_generator.generate_structure_prompt()
+
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=[
+                types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+                prompt,
+                self.prompt_generator.language,
+            ],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": ArtworkMetadata,
+            },
+        )
+        artwork_data: ArtworkMetadata = response.parsed
+        return artwork_data
+
 
     def continue_conversation(self, user_input: str, history = []):
         """
@@ -63,6 +85,67 @@ class GeminiClient(AIClient):
         
         return response.text
 
+    async def acontinue_conversation(self, user_input: str, history = []):
+        """
+        Async variant of continue_conversation using the client's aio interface.
+        
+        :param user_input: The user's input message
+        :param history: List of previous messages ({"role", "content"}) in the conversation
+        :return: The AI's response
+        """
+        chat = self._aio_chat(history)
+        response = await chat.send_message(user_input)
+
+        return response.text
+
+    async def astream_conversation(self, user_input: str, history = None):
+        """
+        Stream the reply to user_input chunk by chunk through the client's aio interface.
+        
+        :param user_input: The user's input message
+        :param history: List of previous messages ({"role", "content"}) in the conversation
+        :return: Async iterator of reply text fragments
+        """
+        history = history if history is not None else []
+        chat = self._aio_chat(history)
+
+        parts = []
+        async for chunk in await chat.send_message_stream(user_input):
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+
+        history.append({"role": "user", "content": user_input})
+        history.append({"role": "assistant", "content": "".join(parts)})
+
+    async def asummarize_conversation(self, summary: str, messages: list) -> str:
+        """
+        Fold older turns into the running summary.
+        """
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=self.prompt_generator.generate_summary_prompt(summary, messages),
+        )
+
+        return response.text
+
+    def _aio_chat(self, history):
+        # Gemini takes system messages as a system instruction, not as chat turns
+        system = "\n\n".join(message["content"] for message in history if message["role"] == "system")
+        config = types.GenerateContentConfig(system_instruction=system) if system else None
+        return self.client.aio.chats.create(model=self.model_name, history=self._to_gemini_history(history), config=config)
+
+    @staticmethod
+    def _to_gemini_history(history):
+        return [
+            types.Content(
+                role="model" if message["role"] == "assistant" else "user",
+                parts=[types.Part.from_text(text=message["content"])],
+            )
+            for message in history
+            if message["role"] in ("user", "assistant")
+        ]
+
     def generate_and_store_audio(self, description: str, session_id: str):
         """
         Generate audio from description and store it.
@@ -72,7 +155,6 @@ class GeminiClient(AIClient):
         """
         try:
             # audio_bytes = synthesize_speech(description)
-            # upload_file_and_get_presigned_url(audio_bytes, session_id)
             pass
         except Exception as e:
             print(f"Error generating audio for session {session_id}: {e}")
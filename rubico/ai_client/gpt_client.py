@@ -1,41 +1,46 @@
-from openai import OpenAI
 import base64
-from .promptGenerator import PromptGenerator
 from model.ArtworkMetadata import ArtworkMetadata
 from .client import AIClient
-from .tts_client import synthesize_speech
-from utils.s3Server import upload_file_and_get_presigned_url
+from .tts_client import synthesize_speech_chunked, TTS_MODEL, TTS_VOICE
+from utils.audio_cache import get_or_create_session_audio
+from utils.audio_events import audio_ready
+from utils.client_registry import ClientRegistry, get_registry
 
 class GPTClient(AIClient):
-    def __init__(self, language="en", role="adult"):
+    def __init__(self, language="en", role="adult", registry: ClientRegistry = None):
         """
         Initialize the GPT client.
         
         :param language: Target language for responses
         :param role: User type (child, adult, senior, expert)
+        :param registry: Shared clients to use (default: the process-wide registry)
         """
         super().__init__(language, role)
-        self.client = OpenAI()
+        registry = registry or get_registry()
+        self.client = registry.openai
+        self.async_client = registry.async_openai
         self.model_name = "gpt-4-vision-preview"
-        self.prompt_generator = PromptGenerator(language=language, role=role)
+        self.prompt_generator = registry.prompt_generator(language, role)
 
-    def generate_initial_description(self, image_bytes):
-        """
-        Generate the initial spoken description for an artwork using GPT-4 Vision.
-        """
+    def _initial_description_messages(self, image_bytes, mime_type):
         base64_image = base64.b64encode(image_bytes).decode('utf-8')
-        
-        print("Generating initial description...")
-        messages = [
+        return [
             {"role": "system", "content": self.prompt_generator.generate_role()},
             {"role": "user", "content": [
                 {"type": "text", "text": self.prompt_generator.generate_structure_prompt()},
                 {"type": "image_url", "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
+                    "url": f"data:{mime_type};base64,{base64_image}"
                 }}
             ]}
         ]
 
+    def generate_initial_description(self, image_bytes, mime_type="image/jpeg"):
+        """
+        Generate the initial spoken description for an artwork using GPT-4 Vision.
+        """
+        print("Generating initial description...")
+        messages = self._initial_description_messages(image_bytes, mime_type)
+
         completion = self.client.beta.chat.completions.parse(
             model="gpt-4.1-mini",
             messages=messages,
@@ -46,6 +51,22 @@ class GPTClient(AIClient):
         reply_json = completion.choices[0].message.parsed
         return reply_json
 
+    async def agenerate_initial_description(self, image_bytes, mime_type="image/jpeg"):
+        """
+        Async variant of generate_initial_description using the async OpenAI client.
+        """
+        print("Generating initial description...")
+        messages = self._initial_description_messages(image_bytes, mime_type)
+
+        completion = await self.async_client.beta.chat.completions.parse(
+            model="gpt-4.1-mini",
+            messages=messages,
+            max_tokens=800,
+            response_format=ArtworkMetadata,
+        )
+
+        return completion.choices[0].message.parsed
+
     def continue_conversation(self, user_input: str, history = []):
         """
         Continue the conversation with GPT.
@@ -67,6 +88,64 @@ class GPTClient(AIClient):
         
         return reply
 
+    async def acontinue_conversation(self, user_input: str, history = []):
+        """
+        Async variant of continue_conversation using the async OpenAI client.
+        """
+        history.append({"role": "user", "content": user_input})
+
+        completion = await self.async_client.chat.completions.create(
+            model="gpt-4.1-nano",
+            messages=history,
+            max_tokens=600
+        )
+
+        reply = completion.choices[0].message.content
+        history.append({"role": "assistant", "content": reply})
+
+        return reply
+
+    async def astream_conversation(self, user_input: str, history = None):
+        """
+        Stream the reply to user_input token by token from the async OpenAI client.
+        
+        :param user_input: The user's input message
+        :param history: List of previous messages in the conversation
+        :return: Async iterator of reply text fragments
+        """
+        history = history if history is not None else []
+        history.append({"role": "user", "content": user_input})
+
+        stream = await self.async_client.chat.completions.create(
+            model="gpt-4.1-nano",
+            messages=history,
+            max_tokens=600,
+            stream=True,
+        )
+
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        history.append({"role": "assistant", "content": "".join(parts)})
+
+    async def asummarize_conversation(self, summary: str, messages: list) -> str:
+        """
+        Fold older turns into the running summary with a small, cheap model.
+        """
+        completion = await self.async_client.chat.completions.create(
+            model="gpt-4.1-nano",
+            messages=[{"role": "user", "content": self.prompt_generator.generate_summary_prompt(summary, messages)}],
+            max_tokens=300
+        )
+
+        return completion.choices[0].message.content
+
     def generate_and_store_audio(self, description: str, session_id: str):
         """
         Generate audio from description and store it.
@@ -75,7 +154,8 @@ class GPTClient(AIClient):
         :param session_id: Unique session identifier
         """
         try:
-            audio_bytes = synthesize_speech(description)
-            upload_file_and_get_presigned_url(audio_bytes, session_id)
+            # Identical narrations (same text, voice and model) are synthesized once and shared
+            get_or_create_session_audio(description, session_id, synthesize_speech_chunked, voice=TTS_VOICE, model=TTS_MODEL)
         except Exception as e:
             print(f"Error generating audio for session {session_id}: {e}")
+            audio_ready.notify(session_id, None)
@@ -94,3 +94,30 @@ class PromptGenerator:
         Combine role description and context prompt.
         """
         return self.generate_role() + "\n\n" + self.generate_context()
+
+    def generate_followup_context(self, title: str, artist: str, museum_name: str, summary: str = "") -> str:
+        """
+        System prompt for follow-up questions: role, the artwork being discussed
+        and the running summary of earlier turns, if any.
+        """
+        prompt = (
+            f"{self.generate_role()} "
+            f"The visitor is looking at \"{title}\" by {artist}, at {museum_name}. "
+            f"Answer their follow-up questions about it in {self.target_language}."
+        )
+        if summary:
+            prompt += f"\n\nSummary of the conversation so far:\n{summary}"
+        return prompt
+
+    def generate_summary_prompt(self, summary: str, messages: list) -> str:
+        """
+        Prompt that folds older conversation turns into the running summary.
+        """
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        return (
+            "Update the running summary of a conversation between a museum guide (assistant) and a visitor (user). "
+            "Keep the facts already given about the artwork and what the visitor asked or showed interest in; "
+            f"drop small talk. Write at most 150 words in {self.target_language}. Output only the summary.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\n"
+            f"New turns:\n{transcript}"
+        )
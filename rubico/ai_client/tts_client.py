@@ -1,16 +1,129 @@
+import asyncio
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openai import OpenAI
+from typing import AsyncIterator, List
+from utils.client_registry import get_registry
 
-client = OpenAI()
+TTS_MODEL = "gpt-4o-mini-tts"      # 注意：openai 官方是 tts-1 或 tts-1-hd，如果你用 gpt-4o tts 要确认一下
+TTS_VOICE = "alloy"      # 可选: alloy, shimmer, echo, fable, nova
 
-def synthesize_speech(text):
-    response = client.audio.speech.create(
-        model="gpt-4o-mini-tts",      # 注意：openai 官方是 tts-1 或 tts-1-hd，如果你用 gpt-4o tts 要确认一下
-        voice="alloy",      # 可选: alloy, shimmer, echo, fable, nova
+# Long narrations are split at sentence boundaries and synthesized in parallel
+TTS_CHUNK_MAX_CHARS = int(os.getenv("TTS_CHUNK_MAX_CHARS", "600"))
+TTS_FIRST_CHUNK_MAX_CHARS = int(os.getenv("TTS_FIRST_CHUNK_MAX_CHARS", "200"))  # 第一段短一些，尽早开始播放
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4"))
+
+# A sentence: up to terminal punctuation (plus closing quotes) followed by whitespace; CJK needs no space
+_SENTENCE = re.compile(r'.+?(?:[.!?…]+["\'”’)\]]*(?=\s|$)|[。！？]+["\'”’」』）]*|$)\s*', re.S)
+_CLAUSE_BREAK = re.compile(r'[,;:，、；：]\s*|\s+')
+
+_tts_executor = ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENCY, thread_name_prefix="tts")
+
+
+def _split_long_sentence(sentence: str, max_chars: int) -> List[str]:
+    pieces = []
+    while len(sentence) > max_chars:
+        # Cut after the last clause break (or space) that fits, else hard cut
+        breaks = [m.end() for m in _CLAUSE_BREAK.finditer(sentence, 0, max_chars)]
+        cut = breaks[-1] if breaks else max_chars
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:]
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_tts_chunks(text: str, max_chars: int = TTS_CHUNK_MAX_CHARS,
+                     first_chunk_max_chars: int = TTS_FIRST_CHUNK_MAX_CHARS) -> List[str]:
+    """
+    Split text into chunks of whole sentences of at most max_chars each
+    (first_chunk_max_chars for the first one, so it is synthesized quickly).
+    Sentences longer than a chunk are split at clause breaks.
+    """
+    pieces = []
+    for sentence in _SENTENCE.findall(text):
+        pieces.extend(_split_long_sentence(sentence, max_chars))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        limit = max_chars if chunks else first_chunk_max_chars
+        if current and len(current) + len(piece) > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+def synthesize_speech(text, voice=TTS_VOICE, model=TTS_MODEL):
+    response = get_registry().openai.audio.speech.create(
+        model=model,
+        voice=voice,
         input=text
     )
 
     audio_bytes = response.content
 
     return audio_bytes
+
+
+async def asynthesize_speech(text, voice=TTS_VOICE, model=TTS_MODEL):
+    response = await get_registry().async_openai.audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text
+    )
+
+    return response.content
+
+
+def synthesize_speech_chunked(text, voice=TTS_VOICE, model=TTS_MODEL):
+    """
+    Synthesize text as sentence chunks on a bounded thread pool and join the
+    MP3s in order (MP3 frames concatenate into one playable stream).
+    """
+    chunks = split_tts_chunks(text)
+    if not chunks:
+        raise ValueError("Nothing to synthesize: the narration text is empty")
+    if len(chunks) == 1:
+        return synthesize_speech(text, voice, model)
+    return b"".join(_tts_executor.map(lambda chunk: synthesize_speech(chunk, voice, model), chunks))
+
+
+async def astream_speech_chunks(text, voice=TTS_VOICE, model=TTS_MODEL,
+                                max_concurrency=TTS_MAX_CONCURRENCY) -> AsyncIterator[bytes]:
+    """
+    Synthesize the sentence chunks of text concurrently (at most
+    max_concurrency requests at a time) and yield their MP3s in text order,
+    each as soon as it and every chunk before it are done. The short first
+    chunk is yielded early, while later ones are still being synthesized.
+    """
+    chunks = split_tts_chunks(text)
+    if not chunks:
+        raise ValueError("Nothing to synthesize: the narration text is empty")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def synthesize(chunk):
+        async with semaphore:
+            return await asynthesize_speech(chunk, voice, model)
+
+    # Tasks queue on the semaphore in creation order, so chunks start in text order
+    tasks = [asyncio.create_task(synthesize(chunk)) for chunk in chunks]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        # Stop outstanding requests if the consumer goes away or a chunk failed
+        for task in tasks:
+            task.cancel()
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def asynthesize_speech_chunked(text, voice=TTS_VOICE, model=TTS_MODEL):
+    """
+    Async variant of synthesize_speech_chunked.
+    """
+    return b"".join([audio async for audio in astream_speech_chunks(text, voice, model)])
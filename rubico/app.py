@@ -1,103 +1,441 @@
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException, Body, Request
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import asyncio
 import uuid
+import json
 import os
 
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 from model.ArtworkMetadata import ArtworkMetadata
-from utils.s3Server import upload_file_and_get_presigned_url, get_presigned_url_by_session_id
+from utils.s3Server import get_presigned_url, get_presigned_url_by_session_id
+from utils.audio_cache import audio_cache_key, find_cached_audio, link_session_audio, atee_session_audio_stream
+from ai_client.tts_client import astream_speech_chunks, TTS_MODEL, TTS_VOICE
 from ai_client.client_factory import AIClientFactory
+from recognition.clip_matcher import load_clip_matcher, gallery_match_to_metadata
+from cache.description_cache import DescriptionCache
+from conversation.session_store import load_session_store
+from jobs.audio_queue import load_audio_queue
+from utils.image_preprocess import prepare_image, preprocess_stats
+from utils.upload_reader import read_upload, UploadTooLargeError, MAX_UPLOAD_BYTES
+from utils.client_registry import get_registry, close_registry
+from utils.audio_index import get_audio_index, close_audio_index
+from utils.audio_events import audio_ready
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared, pooled SDK clients for every request in this worker
+    app.state.client_registry = get_registry()
+    app.state.audio_index = get_audio_index()
+    # Load the CLIP model and gallery once per worker, not per request
+    app.state.clip_matcher = load_clip_matcher()
+    app.state.description_cache = DescriptionCache()
+    app.state.session_store = load_session_store()
+    # Narration jobs run on a bounded queue instead of per-request background tasks
+    app.state.audio_queue = load_audio_queue()
+    await app.state.audio_queue.start()
+    yield
+    await app.state.audio_queue.stop()
+    app.state.description_cache.close()
+    app.state.session_store.close()
+    close_audio_index()
+    await close_registry()
+
+app = FastAPI(lifespan=lifespan)
+
+# Room for the multipart boundaries and the small form fields next to the image
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse an upload that declares itself too large before the form is parsed
+    # and spooled; read_upload still enforces the cap on the actual bytes
+    if request.method == "POST" and request.url.path == "/api/recognize":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES:
+            return JSONResponse({"detail": UploadTooLargeError(MAX_UPLOAD_BYTES).args[0]}, status_code=413)
+    return await call_next(request)
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# A session that asked to stream its narration but has not opened
+# /api/audio_stream within this long gets it from the audio queue instead
+AUDIO_STREAM_GRACE_SECONDS = float(os.getenv("AUDIO_STREAM_GRACE_SECONDS", "30"))
+# Pending fallbacks, referenced so the event loop does not drop them
+narration_fallbacks = set()
+
+# Long-poll limits of /api/audio_url?wait=...; the index is re-checked every
+# AUDIO_WAIT_RECHECK_SECONDS for audio stored by another worker
+AUDIO_URL_MAX_WAIT_SECONDS = float(os.getenv("AUDIO_URL_MAX_WAIT_SECONDS", "30"))
+AUDIO_WAIT_RECHECK_SECONDS = float(os.getenv("AUDIO_WAIT_RECHECK_SECONDS", "2"))
+
 class Message(BaseModel):
     role: str
     content: str
 
 class FollowupRequest(BaseModel):
     user_input: str
-    artwork_name: str
-    artwork_artist: str
-    artwork_museum: str
+    # With a session_id from /api/recognize the server keeps the history;
+    # the fields below are only needed for sessions it does not know
+    session_id: Optional[str] = None
+    artwork_name: str = ""
+    artwork_artist: str = ""
+    artwork_museum: str = ""
     message_history: List[Message] = []
+    stream: bool = False
+
+def followup_input_with_context(payload: FollowupRequest) -> str:
+    # Create context string
+    context_parts = []
+    if payload.artwork_name:
+        context_parts.append(f"Artwork: {payload.artwork_name}")
+    if payload.artwork_artist:
+        context_parts.append(f"by {payload.artwork_artist}")
+    if payload.artwork_museum:
+        context_parts.append(f"at {payload.artwork_museum}")
+    context = " ".join(context_parts) + ". "
+
+    # Compose final input
+    return context + payload.user_input
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @app.post("/api/recognize")
 async def upload_image(
-    background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
     language: str = Form(default="en"),
     role: str = Form(default="adult"),
+    stream_audio: bool = Form(default=False),
 ):
-    image_bytes = await image.read()
+    try:
+        upload = await read_upload(image)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     session_id = str(uuid.uuid4())
-    
+
+    # 1. The exact same photo (a retry, or a shared image) is answered from the
+    #    cache by its content hash, before decoding anything
+    description_cache = app.state.description_cache
+    parsed_artworks_info = None
+    match = None
+    recognition_source = "llm"
+    upload_key = None
+    try:
+        upload_key = description_cache.make_key(f"sha256:{upload.sha256}", language, role)
+        parsed_artworks_info = await run_in_threadpool(description_cache.get, upload_key)
+        if parsed_artworks_info is not None:
+            recognition_source = "cache"
+    except Exception as e:
+        print(f"Description cache lookup failed: {e}")
+
     # Create client using factory
     client = AIClientFactory.create_client("gpt", language=language, role=role)
+    cache_key = None
+
+    if parsed_artworks_info is None:
+        # Decode, upright and downsize once; every model below gets the compact version
+        try:
+            prepared = await run_in_threadpool(prepare_image, upload.stream)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        del upload
+
+        # 2. Try the local CLIP gallery first; only weak matches go to the LLM
+        matcher = app.state.clip_matcher
+        if matcher is not None:
+            try:
+                match = await run_in_threadpool(matcher.best_confident_match, prepared.image)
+            except Exception as e:
+                print(f"Local CLIP matching failed, falling back to LLM: {e}")
 
-    # 1. Generate initial structured data (parsed JSON)
-    parsed_artworks_info: ArtworkMetadata = client.generate_initial_description(
-        image_bytes=image_bytes
-    )
+        # 3. Look up the description cache by artwork identity + language + role.
+        #    Only a gallery match identifies the artwork: a perceptual hash of the
+        #    photo collides for low-texture shots of different works, so unmatched
+        #    photos are only cached by their exact content (step 1)
+        if match is not None:
+            try:
+                cache_key = description_cache.make_key(f"gallery:{match.image_path}", language, role)
+                parsed_artworks_info = await run_in_threadpool(description_cache.get, cache_key)
+                if parsed_artworks_info is not None:
+                    recognition_source = "cache"
+            except Exception as e:
+                print(f"Description cache lookup failed: {e}")
 
-    # 2. Add audio generation to background tasks
-    background_tasks.add_task(
-        client.generate_and_store_audio,
-        parsed_artworks_info.description,
-        session_id
-    )
+        if parsed_artworks_info is None and match is not None:
+            parsed_artworks_info = await run_in_threadpool(gallery_match_to_metadata, match, language, role)
+            if parsed_artworks_info is not None:
+                recognition_source = "gallery"
 
-    # 3. Return immediate response with text only
+        if parsed_artworks_info is None:
+            # Generate initial structured data (parsed JSON)
+            parsed_artworks_info: ArtworkMetadata = await client.agenerate_initial_description(
+                image_bytes=prepared.data, mime_type=prepared.mime_type
+            )
+
+        # A failed cache write must not lose the description that was just generated
+        store_keys = [upload_key] if recognition_source == "cache" else [cache_key, upload_key]
+        for key in store_keys:
+            if key is None:
+                continue
+            try:
+                await run_in_threadpool(description_cache.set, key, parsed_artworks_info)
+            except Exception as e:
+                print(f"Description cache store failed: {e}")
+
+    # Keep the conversation server-side so follow-ups only send the new question;
+    # /api/audio_stream reads the narration from it, in whichever worker it lands
+    has_narration = bool(parsed_artworks_info.description.strip())
+    try:
+        await run_in_threadpool(
+            app.state.session_store.create, session_id, parsed_artworks_info, language, role,
+            audio_started=not (stream_audio and has_narration),
+        )
+        session_created = True
+    except Exception as e:
+        print(f"Could not create conversation session: {e}")
+        session_created = False
+
+    # 4. Queue audio generation, or leave it to /api/audio_stream
+    audio_stream_url = None
+    if not has_narration:
+        # Nothing to narrate
+        audio_status = "unavailable"
+    elif stream_audio and session_created:
+        schedule_narration_fallback(session_id)
+        audio_stream_url = f"/api/audio_stream?session_id={session_id}"
+        audio_status = "streaming"
+    else:
+        try:
+            queued = await app.state.audio_queue.aenqueue(parsed_artworks_info.description, session_id)
+        except Exception as e:
+            print(f"Could not queue audio generation: {e}")
+            queued = False
+        # Under overload the text answer is still returned, without narration
+        audio_status = "queued" if queued else "unavailable"
+
+    # 5. Return immediate response with text only
     return JSONResponse({
         "session_id": session_id,
         "title": parsed_artworks_info.title,
         "artist": parsed_artworks_info.artist,
         "museum_name": parsed_artworks_info.museum_name,
         "description": parsed_artworks_info.description,
-        "audio_description_url": None  # Will be available later via /api/audio_url
+        "audio_description_url": None,  # Will be available later via /api/audio_url
+        "audio_stream_url": audio_stream_url,
+        "audio_status": audio_status,
+        "recognition_source": recognition_source,
+        "match_score": match.score if match is not None else None,
     })
 
+def schedule_narration_fallback(session_id: str, delay: float = AUDIO_STREAM_GRACE_SECONDS):
+    """
+    Queue the narration of a streaming session after `delay`, unless a stream
+    has claimed it by then, so /api/audio_url still gets audio when the
+    client never opens (or abandons) the stream.
+    """
+    async def fallback():
+        await asyncio.sleep(delay)
+        try:
+            session = await run_in_threadpool(app.state.session_store.claim_audio, session_id)
+            if session is not None:
+                await app.state.audio_queue.aenqueue(session.description, session_id)
+        except Exception as e:
+            print(f"Could not queue audio generation for session {session_id}: {e}")
+
+    task = asyncio.create_task(fallback())
+    narration_fallbacks.add(task)
+    task.add_done_callback(narration_fallbacks.discard)
+
 @app.get("/api/audio_url")
-async def get_audio_url(session_id: str):
+async def get_audio_url(session_id: str, wait: float = 0):
     """
     Get the presigned URL for the audio file associated with the session_id.
     Returns None if the audio is not ready yet.
+
+    With wait > 0 (seconds, capped at AUDIO_URL_MAX_WAIT_SECONDS) this is a
+    long poll: the request returns as soon as the audio is stored, or with
+    status "pending" when the wait runs out, or "failed" if generation failed.
     """
     print("Called get_audio_url" + session_id)
-    audio_url = get_presigned_url_by_session_id(session_id)
-    return JSONResponse({"audio_url": audio_url})
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(wait, 0), AUDIO_URL_MAX_WAIT_SECONDS)
+    status = None
+
+    with audio_ready.subscribe(session_id) as ready:
+        audio_url = await run_in_threadpool(get_presigned_url_by_session_id, session_id)
+        if audio_url is None and await app.state.audio_queue.ahas_failed(session_id):
+            status = "failed"
+        while status is None and audio_url is None and loop.time() < deadline:
+            try:
+                object_key = await asyncio.wait_for(
+                    asyncio.shield(ready), min(deadline - loop.time(), AUDIO_WAIT_RECHECK_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                # Audio generated, or given up on, by another worker only shows
+                # up in the index and the job table; S3 was already checked above
+                audio_url = await run_in_threadpool(get_presigned_url_by_session_id, session_id, s3_fallback=False)
+                if audio_url is None and await app.state.audio_queue.ahas_failed(session_id):
+                    status = "failed"
+                continue
+            if object_key is None:
+                status = "failed"
+                break
+            audio_url = get_presigned_url(object_key)
+
+    if status is None:
+        status = "ready" if audio_url else "pending"
+    return JSONResponse({"audio_url": audio_url, "status": status})
+
+@app.get("/api/audio_stream")
+async def stream_audio_narration(session_id: str):
+    """
+    Stream the narration of a session recognized with stream_audio=true as
+    MP3 chunks while it is being synthesized: sentence chunks are synthesized
+    in parallel and sent in order, starting with a short first chunk. The
+    bytes are stored in the audio cache at the end, so replays and
+    /api/audio_url use the stored file.
+    """
+    audio_url = await run_in_threadpool(get_presigned_url_by_session_id, session_id)
+    if audio_url is not None:
+        # Already streamed (or synthesized in the background): replay the stored file
+        return RedirectResponse(audio_url)
+    session = await run_in_threadpool(app.state.session_store.claim_audio, session_id)
+    if session is None:
+        # Unknown session, or its narration is already being streamed or queued
+        raise HTTPException(status_code=404, detail="No narration for this session")
+    text = session.description
+
+    object_key = await run_in_threadpool(find_cached_audio, audio_cache_key(text, TTS_VOICE, TTS_MODEL))
+    if object_key is not None:
+        await run_in_threadpool(link_session_audio, session_id, object_key)
+        return RedirectResponse(get_presigned_url(object_key))
+
+    async def narration_chunks():
+        completed = False
+        try:
+            async for chunk in atee_session_audio_stream(
+                astream_speech_chunks(text, voice=TTS_VOICE, model=TTS_MODEL), text, session_id, TTS_VOICE, TTS_MODEL
+            ):
+                yield chunk
+            completed = True
+        finally:
+            if not completed:
+                # Let the client retry an interrupted stream, or the queue take over.
+                # Not awaited: a disconnect cancels every await left in this generator
+                try:
+                    app.state.session_store.release_audio(session_id)
+                    schedule_narration_fallback(session_id)
+                except Exception as e:
+                    print(f"Could not release the narration of session {session_id}: {e}")
+
+    return StreamingResponse(narration_chunks(), media_type="audio/mpeg")
+
+@app.get("/api/health")
+async def health_check():
+    """
+    Check that the shared OpenAI and S3 clients can reach their services.
+    """
+    results = await app.state.client_registry.health_check()
+    return JSONResponse(results, status_code=200 if results["ok"] else 503)
+
+@app.get("/api/audio_queue/stats")
+async def get_audio_queue_stats():
+    """
+    Depth, throughput, retries and latency of the audio generation queue.
+    """
+    return JSONResponse({"audio_queue": app.state.audio_queue.stats()})
+
+@app.get("/api/image/stats")
+async def get_image_stats():
+    """
+    Bytes and time saved by upload preprocessing (downscale + re-encode).
+    """
+    return JSONResponse({"image_preprocessing": preprocess_stats()})
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters of the description cache.
+    """
+    return JSONResponse({"description_cache": app.state.description_cache.stats()})
 
 @app.post("/api/followup")
-async def ask_question(payload: FollowupRequest = Body(...)):
+async def ask_question(background_tasks: BackgroundTasks, payload: FollowupRequest = Body(...)):
+    """
+    Answer a follow-up question.
+
+    With a known session_id the history comes from the server-side session
+    store (recent turns plus a running summary of older ones) and the new
+    turn is recorded there; otherwise the client's message_history is used.
+
+    With "stream": true the reply is sent as server-sent events: "token"
+    events carry {"delta": ...} as the model produces them, and a final
+    "done" event carries the full reply ("error" if generation fails midway).
+    """
     try:
         # Debug print
         print(f"Received user_input: {payload.user_input}")
         print(f"History: {payload.message_history}")
 
-        # Create context string
-        context_parts = []
-        if payload.artwork_name:
-            context_parts.append(f"Artwork: {payload.artwork_name}")
-        if payload.artwork_artist:
-            context_parts.append(f"by {payload.artwork_artist}")
-        if payload.artwork_museum:
-            context_parts.append(f"at {payload.artwork_museum}")
-        context = " ".join(context_parts) + ". "
-
-        # Compose final input
-        user_input_with_context = context + payload.user_input
+        session_store = app.state.session_store
+        session = session_store.get(payload.session_id) if payload.session_id else None
 
         # Create client using factory
-        client = AIClientFactory.create_client("gpt")
-        
+        if session is not None:
+            client = AIClientFactory.create_client("gpt", language=session.language, role=session.role)
+            system_prompt = client.prompt_generator.generate_followup_context(
+                session.title, session.artist, session.museum_name, session.summary
+            )
+            model_input = payload.user_input
+            history = [{"role": "system", "content": system_prompt}] + session.messages
+        else:
+            client = AIClientFactory.create_client("gpt")
+            model_input = followup_input_with_context(payload)
+            history = [message.model_dump() for message in payload.message_history]
+
+        def finish(reply: str) -> dict:
+            if session is None:
+                message_history = [message.model_dump() for message in payload.message_history]
+                message_history.append({"role": "user", "content": payload.user_input})
+                message_history.append({"role": "assistant", "content": reply})
+                return {"message_history": message_history}
+
+            updated = session_store.append_turn(session.session_id, payload.user_input, reply)
+            if updated is not None and session_store.needs_compaction(updated):
+                # Summarize after the response is sent, off the request's critical path
+                background_tasks.add_task(session_store.compact, session.session_id, client.asummarize_conversation)
+            return {"session_id": session.session_id}
+
+        if payload.stream:
+            return StreamingResponse(
+                stream_followup(client, model_input, history, finish),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         # Generate reply using the client instance
-        reply = client.continue_conversation(user_input_with_context, payload.message_history)
+        reply = await client.acontinue_conversation(model_input, history)
 
-        return JSONResponse({"reply": reply})
+        return JSONResponse({"reply": reply, **finish(reply)})
     except Exception as e:
         print("Error:", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+async def stream_followup(client, model_input: str, history: list, finish):
+    parts = []
+    try:
+        async for delta in client.astream_conversation(model_input, history):
+            parts.append(delta)
+            yield sse_event("token", {"delta": delta})
+    except Exception as e:
+        print("Error:", e)
+        yield sse_event("error", {"detail": str(e)})
+        return
+
+    reply = "".join(parts)
+    yield sse_event("done", {"reply": reply, **finish(reply)})
@@ -0,0 +1,73 @@
+"""
+Benchmark for upload preprocessing (EXIF transpose, downscale, re-encode).
+
+Reports, per output format and max edge, the bytes sent to the vision
+model (as base64, the way GPTClient embeds it) before and after
+preprocessing, and the preprocessing time.
+
+Usage (from the rubico directory):
+    python -m benchmarks.image_preprocess --images path/to/photos
+    python -m benchmarks.image_preprocess --max-edge 768 1024 1536
+"""
+import argparse
+import base64
+import io
+import os
+import statistics
+
+import numpy as np
+from PIL import Image
+
+from utils.image_preprocess import prepare_image
+
+
+def synthetic_photo(width: int = 4032, height: int = 3024, seed: int = 0) -> bytes:
+    """
+    A 12 MP phone-sized JPEG: smooth gradients plus sensor-like noise.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width)
+    y = np.linspace(0, 255, height)
+    pixels = np.stack([
+        np.add.outer(y, x) / 2,
+        np.add.outer(y, x[::-1]) / 2,
+        np.outer(np.ones(height), x),
+    ], axis=-1) + rng.normal(0, 8, (height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def load_images(images_dir: str) -> list:
+    extensions = (".jpg", ".jpeg", ".png", ".webp")
+    paths = sorted(p for p in os.listdir(images_dir) if p.lower().endswith(extensions))
+    images = []
+    for name in paths:
+        with open(os.path.join(images_dir, name), "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload preprocessing benchmark")
+    parser.add_argument("--images", help="Directory of sample uploads (default: synthetic 12 MP photos)")
+    parser.add_argument("--count", type=int, default=5, help="Number of synthetic photos")
+    parser.add_argument("--max-edge", type=int, nargs="+", default=[1024])
+    parser.add_argument("--formats", nargs="+", default=["JPEG", "WEBP"])
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else [synthetic_photo(seed=i) for i in range(args.count)]
+    original = sum(len(base64.b64encode(data)) for data in images)
+    print(f"{len(images)} images, {original / len(images) / 1024:.0f}KB base64 payload per image unprocessed")
+
+    for image_format in args.formats:
+        for max_edge in args.max_edge:
+            results = [prepare_image(data, max_edge=max_edge, image_format=image_format) for data in images]
+            payload = sum(len(base64.b64encode(r.data)) for r in results)
+            ms = [r.seconds * 1000 for r in results]
+            print(f"{image_format:<5} max edge {max_edge:>5}: {payload / len(images) / 1024:7.0f}KB per image "
+                  f"({payload / original:6.1%} of original)  preprocess p50 {statistics.median(ms):6.1f}ms  max {max(ms):6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
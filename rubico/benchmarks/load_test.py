@@ -0,0 +1,111 @@
+"""
+Load test for /api/followup.
+
+In-process mode (default) drives the FastAPI app through an ASGI transport
+with a fake AI client whose model calls take --latency seconds, and compares:
+
+  blocking - the model call blocks the event loop (sync SDK called from an
+             async route, the behaviour before the async clients)
+  async    - the model call is awaited (async SDK clients)
+
+With --url it instead sends the same request mix to a running server.
+
+Usage (from the rubico directory):
+    python -m benchmarks.load_test --requests 200 --concurrency 50 --latency 0.5
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --requests 50 --concurrency 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+# OpenAI clients need a key to be constructed; the fake client never uses them
+os.environ.setdefault("OPENAI_API_KEY", "load-test")
+
+PAYLOAD = {
+    "user_input": "Tell me more about the technique",
+    "artwork_name": "Basket of Fruit",
+    "artwork_artist": "Caravaggio",
+    "artwork_museum": "Pinacoteca Ambrosiana",
+    "message_history": [],
+}
+
+
+class FakeClient:
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+
+    def continue_conversation(self, user_input, history=None):
+        time.sleep(self.latency)
+        return "reply"
+
+    async def acontinue_conversation(self, user_input, history=None):
+        if self.blocking:
+            return self.continue_conversation(user_input, history)
+        await asyncio.sleep(self.latency)
+        return "reply"
+
+
+async def run_load(client: httpx.AsyncClient, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/followup", json=PAYLOAD)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, elapsed: float, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:<10} {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50 {statistics.median(latencies) * 1000:8.1f}ms  p95 {p95 * 1000:8.1f}ms  "
+          f"total {elapsed:6.2f}s")
+
+
+async def in_process(args):
+    import app as app_module
+
+    # ASGITransport does not send lifespan events; run the app's lifespan
+    # ourselves so the stores and queues on app.state exist
+    async with app_module.app.router.lifespan_context(app_module.app):
+        for mode in ("blocking", "async"):
+            fake = FakeClient(args.latency, blocking=mode == "blocking")
+            app_module.AIClientFactory.create_client = staticmethod(lambda *a, **k: fake)
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+                elapsed, latencies = await run_load(client, args.requests, args.concurrency)
+            report(mode, elapsed, latencies)
+
+
+async def against_server(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        elapsed, latencies = await run_load(client, args.requests, args.concurrency)
+    report("server", elapsed, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for /api/followup")
+    parser.add_argument("--url", help="Load-test a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated model latency (in-process mode)")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    asyncio.run(against_server(args) if args.url else in_process(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark for sentence-chunked parallel TTS.
+
+Replaces the TTS request with a fake whose latency grows with the text
+length (--base-latency + --per-char-latency * len), as real TTS does, and
+compares a single request for the whole narration with
+astream_speech_chunks at several concurrency levels: time to the first
+audio chunk and total wall-clock time.
+
+Usage (from the rubico directory):
+    python -m benchmarks.tts_chunking
+    python -m benchmarks.tts_chunking --text-file narration.txt --concurrency 1 2 4 8
+"""
+import argparse
+import asyncio
+import time
+
+from ai_client import tts_client
+
+SAMPLE_SENTENCE = (
+    "Caravaggio painted the Basket of Fruit around 1599, and it is often called "
+    "the first true still life in Italian painting. "
+)
+
+
+async def run_single(text: str):
+    start = time.perf_counter()
+    await tts_client.asynthesize_speech(text)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def run_chunked(text: str, concurrency: int):
+    start = time.perf_counter()
+    first = None
+    async for _ in tts_client.astream_speech_chunks(text, max_concurrency=concurrency):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentence-chunked parallel TTS benchmark")
+    parser.add_argument("--text-file", help="Narration to synthesize (default: a generated ~3000 character text)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--base-latency", type=float, default=0.4, help="Fixed seconds per TTS request")
+    parser.add_argument("--per-char-latency", type=float, default=0.002, help="Seconds per character synthesized")
+    args = parser.parse_args()
+
+    if args.text_file:
+        with open(args.text_file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = SAMPLE_SENTENCE * 25
+
+    async def fake_tts(chunk, voice=tts_client.TTS_VOICE, model=tts_client.TTS_MODEL):
+        await asyncio.sleep(args.base_latency + args.per_char_latency * len(chunk))
+        return b"\xff\xfb" + chunk.encode("utf-8")
+
+    tts_client.asynthesize_speech = fake_tts
+
+    chunks = tts_client.split_tts_chunks(text)
+    print(f"{len(text)} characters -> {len(chunks)} chunks (first {len(chunks[0])} chars)")
+
+    first, total = asyncio.run(run_single(text))
+    print(f"{'single':<14} first audio {first:6.2f}s  total {total:6.2f}s")
+    for concurrency in args.concurrency:
+        first, total = asyncio.run(run_chunked(text, concurrency))
+        print(f"{f'chunked x{concurrency}':<14} first audio {first:6.2f}s  total {total:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark of peak memory per /api/recognize upload.
+
+Runs the upload handling of the endpoint (without the model calls) over an
+UploadFile backed by the same spooled temp file Starlette's form parser
+uses, and reports per-request peak Python heap (tracemalloc) and the
+process max RSS for each variant:
+
+    read      await image.read() into bytes, then prepare_image
+    stream    read_upload (chunked, capped, hashed), then prepare_image on the spooled file
+    hash-hit  read_upload only: an exact repeat answered from the cache by sha256
+    oversize  an upload over the size cap (here MAX_UPLOAD_BYTES / 1024), rejected by read_upload
+
+Each variant runs in its own subprocess so the RSS numbers do not mix.
+tracemalloc does not see Pillow's pixel buffers, which RSS includes.
+
+Usage (from the rubico directory):
+    python -m benchmarks.upload_memory
+    python -m benchmarks.upload_memory --images path/to/photos --concurrency 8
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from starlette.datastructures import UploadFile
+
+from benchmarks.image_preprocess import load_images, synthetic_photo
+from utils.image_preprocess import prepare_image
+from utils.upload_reader import MAX_UPLOAD_BYTES, UploadTooLargeError, read_upload
+
+VARIANTS = ["read", "stream", "hash-hit", "oversize"]
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss survives exec on Linux (it would report the parent's peak);
+    # VmHWM belongs to this process image only
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def spooled_upload(data: bytes) -> UploadFile:
+    # Starlette spools form files to disk above 1MB
+    file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    file.write(data)
+    file.seek(0)
+    return UploadFile(file, size=None, filename="upload.jpg")
+
+
+async def handle(variant: str, upload: UploadFile):
+    if variant == "read":
+        image_bytes = await upload.read()
+        prepared = await asyncio.to_thread(prepare_image, image_bytes)
+        del image_bytes
+        base64.b64encode(prepared.data)
+    elif variant == "stream":
+        uploaded = await read_upload(upload)
+        prepared = await asyncio.to_thread(prepare_image, uploaded.stream)
+        del uploaded
+        base64.b64encode(prepared.data)
+    elif variant == "hash-hit":
+        await read_upload(upload)
+    elif variant == "oversize":
+        try:
+            await read_upload(upload, max_bytes=MAX_UPLOAD_BYTES // 1024)
+        except UploadTooLargeError:
+            pass
+    await upload.close()
+
+
+async def measure(variant: str, images: list, concurrency: int) -> dict:
+    # Warm up imports and codecs outside the measurement
+    await handle(variant, spooled_upload(images[0]))
+
+    peaks = []
+    for data in images:
+        # Already parsed and spooled by the time the endpoint runs
+        uploads = [spooled_upload(data) for _ in range(concurrency)]
+        tracemalloc.start()
+        await asyncio.gather(*(handle(variant, upload) for upload in uploads))
+        peaks.append(tracemalloc.get_traced_memory()[1] / concurrency)
+        tracemalloc.stop()
+    return {
+        "variant": variant,
+        "peak_kb": max(peaks) / 1024,
+        "mean_peak_kb": sum(peaks) / len(peaks) / 1024,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload peak memory benchmark")
+    parser.add_argument("--images", help="Directory of sample uploads (default: synthetic 12 MP photos)")
+    parser.add_argument("--count", type=int, default=3, help="Number of synthetic photos")
+    parser.add_argument("--concurrency", type=int, default=1, help="Uploads handled at once")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(asyncio.run(measure(args.variant, load_images(args.images), args.concurrency))))
+        return
+
+    with tempfile.TemporaryDirectory() as images_dir:
+        if not args.images:
+            # Written once here, so generating them does not count towards the RSS of a variant
+            for i in range(args.count):
+                with open(os.path.join(images_dir, f"synthetic_{i}.jpg"), "wb") as f:
+                    f.write(synthetic_photo(seed=i))
+        images_dir = args.images or images_dir
+        sizes = [len(data) for data in load_images(images_dir)]
+        print(f"{len(sizes)} images, {sum(sizes) / len(sizes) / 1024:.0f}KB per upload, "
+              f"MAX_UPLOAD_BYTES {MAX_UPLOAD_BYTES / (1024 * 1024):.3g}MB, concurrency {args.concurrency}")
+
+        for variant in VARIANTS:
+            command = [sys.executable, "-m", "benchmarks.upload_memory", "--variant", variant,
+                       "--images", images_dir, "--concurrency", str(args.concurrency)]
+            result = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+            print(f"{variant:<9} peak heap per request {result['peak_kb']:8.0f}KB "
+                  f"(mean {result['mean_peak_kb']:8.0f}KB)  process max RSS {result['max_rss_mb']:6.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from model.ArtworkMetadata import ArtworkMetadata
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+DESCRIPTION_CACHE_DB = os.getenv("DESCRIPTION_CACHE_DB", "description_cache.sqlite3")
+DESCRIPTION_CACHE_MEMORY_ITEMS = int(os.getenv("DESCRIPTION_CACHE_MEMORY_ITEMS", "1024"))
+DESCRIPTION_CACHE_TTL_SECONDS = int(os.getenv("DESCRIPTION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+class DescriptionCache:
+    """
+    Two-tier cache of generated artwork descriptions.
+
+    Entries are keyed by artwork identity + language + role. Lookups hit an
+    in-memory LRU first, then a local SQLite table shared by all workers on
+    the host. Both tiers expire entries after `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DESCRIPTION_CACHE_DB,
+        max_memory_items: int = DESCRIPTION_CACHE_MEMORY_ITEMS,
+        ttl_seconds: int = DESCRIPTION_CACHE_TTL_SECONDS,
+    ):
+        self.max_memory_items = max_memory_items
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS descriptions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(artwork_id: str, language: str, role: str) -> str:
+        """
+        Build a cache key from a stable artwork identity (e.g. "gallery:<image_path>"
+        or "sha256:<upload hash>") plus the language and role of the description.
+        """
+        return f"{artwork_id}|{language}|{role}"
+
+    def get(self, key: str) -> Optional[ArtworkMetadata]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM descriptions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+
+            value = ArtworkMetadata.model_validate_json(row[0])
+            self._remember(key, row[1], value)
+            self.disk_hits += 1
+            return value
+
+    def set(self, key: str, value: ArtworkMetadata):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO descriptions (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value.model_dump_json(), expires_at),
+            )
+            self._db.commit()
+            self._writes += 1
+            # Sweep expired rows now and then instead of on every write
+            if self._writes % 100 == 0:
+                self._evict_expired()
+
+    def _remember(self, key: str, expires_at: float, value: ArtworkMetadata):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_expired(self):
+        cursor = self._db.execute("DELETE FROM descriptions WHERE expires_at <= ?", (time.time(),))
+        self._db.commit()
+        if cursor.rowcount:
+            logger.info(f"[DescriptionCache] Evicted {cursor.rowcount} expired descriptions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            disk_items = self._db.execute("SELECT COUNT(*) FROM descriptions").fetchone()[0]
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": disk_items,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
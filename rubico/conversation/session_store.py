@@ -0,0 +1,389 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from model.ArtworkMetadata import ArtworkMetadata
+from model.ConversationSession import ConversationSession
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "sqlite")  # memory | sqlite | redis
+SESSION_STORE_DB = os.getenv("SESSION_STORE_DB", "conversation_sessions.sqlite3")
+SESSION_STORE_REDIS_URL = os.getenv("SESSION_STORE_REDIS_URL", "redis://localhost:6379/0")
+SESSION_MEMORY_ITEMS = int(os.getenv("SESSION_MEMORY_ITEMS", "10000"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+SESSION_HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "1500"))
+SESSION_RECENT_MESSAGES = int(os.getenv("SESSION_RECENT_MESSAGES", "2"))
+
+KEY_PREFIX = "conversation:"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate without a tokenizer: ~4 ASCII characters per token,
+    one token per non-ASCII character (CJK text is close to that).
+    """
+    non_ascii = sum(1 for c in text if ord(c) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii + 4
+
+
+class InMemorySessionBackend:
+    """
+    Per-process key/value backend (LRU bounded, with TTL). Sessions are lost
+    on restart and not shared between workers.
+    """
+
+    def __init__(self, max_items: int = SESSION_MEMORY_ITEMS):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: int):
+        with self._lock:
+            self._items[key] = (time.time() + ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def update(self, key: str, change: Callable[[Optional[str]], Optional[str]], ttl_seconds: int) -> Optional[str]:
+        with self._lock:
+            entry = self._items.get(key)
+            value = change(entry[1] if entry is not None and entry[0] > time.time() else None)
+            if value is not None:
+                self._items[key] = (time.time() + ttl_seconds, value)
+                self._items.move_to_end(key)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionBackend:
+    """
+    Key/value backend on a local SQLite file, shared by all workers on the host.
+    """
+
+    def __init__(self, db_path: str = SESSION_STORE_DB):
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM sessions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl_seconds: int):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl_seconds),
+            )
+            self._db.commit()
+            self._writes += 1
+            # Sweep expired rows now and then instead of on every write
+            if self._writes % 100 == 0:
+                cursor = self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+                if cursor.rowcount:
+                    logger.info(f"[SQLiteSessionBackend] Evicted {cursor.rowcount} expired sessions")
+
+    def update(self, key: str, change: Callable[[Optional[str]], Optional[str]], ttl_seconds: int) -> Optional[str]:
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock before the read, so another
+            # worker cannot write the row between our read and our write
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM sessions WHERE key = ?", (key,)
+                ).fetchone()
+                value = change(row[0] if row is not None and row[1] > time.time() else None)
+                if value is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, time.time() + ttl_seconds),
+                    )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisSessionBackend:
+    """
+    Key/value backend on Redis (or any server speaking its protocol), shared
+    by all workers and hosts. Expiry is left to the server.
+    """
+
+    def __init__(self, url: str = SESSION_STORE_REDIS_URL):
+        # redis is only needed when this backend is selected
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._redis.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl_seconds: int):
+        self._redis.set(key, value, ex=ttl_seconds)
+
+    def update(self, key: str, change: Callable[[Optional[str]], Optional[str]], ttl_seconds: int) -> Optional[str]:
+        from redis.exceptions import WatchError
+
+        with self._redis.pipeline() as pipe:
+            while True:
+                try:
+                    # The write fails if anyone else wrote the key after WATCH; retry then
+                    pipe.watch(key)
+                    current = pipe.get(key)
+                    value = change(current.decode("utf-8") if current is not None else None)
+                    if value is None:
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    pipe.set(key, value, ex=ttl_seconds)
+                    pipe.execute()
+                    return value
+                except WatchError:
+                    continue
+
+    def delete(self, key: str):
+        self._redis.delete(key)
+
+    def close(self):
+        self._redis.close()
+
+
+class SessionStore:
+    """
+    Server-side conversation state keyed by the session_id of /api/recognize.
+
+    Each session keeps its recent messages verbatim plus a running summary of
+    older ones. Once the recent messages exceed `token_budget`, the oldest are
+    folded into the summary (down to half the budget, keeping at least
+    `recent_messages`), so the history sent to the model stays bounded
+    however long the conversation runs.
+    """
+
+    def __init__(
+        self,
+        backend,
+        token_budget: int = SESSION_HISTORY_TOKEN_BUDGET,
+        recent_messages: int = SESSION_RECENT_MESSAGES,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+    ):
+        self.backend = backend
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.ttl_seconds = ttl_seconds
+        # One [lock, waiters] entry per session being compacted
+        self._compaction_locks = {}
+
+    def create(
+        self,
+        session_id: str,
+        metadata: ArtworkMetadata,
+        language: str,
+        role: str,
+        audio_started: bool = True,
+    ) -> ConversationSession:
+        """
+        Start a session whose first message is the artwork description. Pass
+        audio_started=False when its narration is left to /api/audio_stream.
+        """
+        session = ConversationSession(
+            session_id=session_id,
+            language=language,
+            role=role,
+            title=metadata.title,
+            artist=metadata.artist,
+            museum_name=metadata.museum_name,
+            messages=[{"role": "assistant", "content": metadata.description}],
+            description=metadata.description,
+            audio_started=audio_started,
+        )
+        self.save(session)
+        return session
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        value = self.backend.get(KEY_PREFIX + session_id)
+        return ConversationSession.model_validate_json(value) if value is not None else None
+
+    def save(self, session: ConversationSession):
+        self.backend.set(KEY_PREFIX + session.session_id, session.model_dump_json(), self.ttl_seconds)
+
+    def update(self, session_id: str, change: Callable[[ConversationSession], bool]) -> Optional[ConversationSession]:
+        """
+        Read, change and write a session as one atomic step of the backend, so
+        concurrent follow-ups and compact() (in any worker) never overwrite
+        each other. `change` edits the session in place and returns False to
+        leave it as stored. Returns the written session, or None if it expired
+        or was left unchanged.
+        """
+        def apply(value: Optional[str]) -> Optional[str]:
+            if value is None:
+                return None
+            session = ConversationSession.model_validate_json(value)
+            if change(session) is False:
+                return None
+            return session.model_dump_json()
+
+        value = self.backend.update(KEY_PREFIX + session_id, apply, self.ttl_seconds)
+        return ConversationSession.model_validate_json(value) if value is not None else None
+
+    def append_turn(self, session_id: str, user_input: str, reply: str) -> Optional[ConversationSession]:
+        """
+        Record a question and its answer. Returns the updated session, or
+        None if it expired meanwhile.
+        """
+        def append(session: ConversationSession):
+            session.messages.append({"role": "user", "content": user_input})
+            session.messages.append({"role": "assistant", "content": reply})
+
+        return self.update(session_id, append)
+
+    def claim_audio(self, session_id: str) -> Optional[ConversationSession]:
+        """
+        Mark the narration of a session as started. Returns the session if
+        this call claimed it, None if it was already started or the session
+        expired, so concurrent streams and fallbacks generate it once.
+        """
+        def claim(session: ConversationSession) -> bool:
+            if session.audio_started:
+                return False
+            session.audio_started = True
+            return True
+
+        return self.update(session_id, claim)
+
+    def release_audio(self, session_id: str):
+        """
+        Undo claim_audio, e.g. after an interrupted stream.
+        """
+        def release(session: ConversationSession) -> bool:
+            session.audio_started = False
+            return True
+
+        self.update(session_id, release)
+
+    def history_tokens(self, messages: List[dict]) -> int:
+        return sum(estimate_tokens(message["content"]) for message in messages)
+
+    def needs_compaction(self, session: ConversationSession) -> bool:
+        return (
+            len(session.messages) > self.recent_messages
+            and self.history_tokens(session.messages) > self.token_budget
+        )
+
+    def _compaction_split(self, messages: List[dict]) -> int:
+        # Number of leading messages to fold into the summary
+        target = self.token_budget // 2
+        tokens = self.history_tokens(messages)
+        split = 0
+        while split < len(messages) - self.recent_messages and tokens > target:
+            tokens -= estimate_tokens(messages[split]["content"])
+            split += 1
+        return split
+
+    async def compact(self, session_id: str, summarize: Callable[[str, List[dict]], Awaitable[str]]):
+        """
+        Fold the oldest messages of a session into its running summary.
+
+        Args:
+            session_id (str): Session to compact.
+            summarize (Callable): async (summary, messages) -> updated summary,
+                e.g. AIClient.asummarize_conversation.
+        """
+        entry = self._compaction_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                session = self.get(session_id)
+                if session is None or not self.needs_compaction(session):
+                    return
+                split = self._compaction_split(session.messages)
+                if split == 0:
+                    return
+
+                start = time.perf_counter()
+                summarized = session.summarized_messages
+                summary = await summarize(session.summary, session.messages[:split])
+
+                def fold(session: ConversationSession) -> bool:
+                    # Another worker compacted this session meanwhile: its summary wins
+                    if session.summarized_messages != summarized:
+                        return False
+                    # Turns appended while summarizing are kept: only drop what was summarized
+                    session.summary = summary
+                    session.messages = session.messages[split:]
+                    session.summarized_messages += split
+                    return True
+
+                if self.update(session_id, fold) is None:
+                    return
+                logger.info(f"[SessionStore.compact] Folded {split} messages of session {session_id} "
+                            f"into the summary in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"[SessionStore.compact] Failed to compact session {session_id}: {e}")
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._compaction_locks.pop(session_id, None)
+
+    def close(self):
+        self.backend.close()
+
+
+def load_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    """
+    Build the session store for the configured backend ("memory", "sqlite" or "redis").
+    """
+    if backend == "memory":
+        return SessionStore(InMemorySessionBackend())
+    if backend == "sqlite":
+        return SessionStore(SQLiteSessionBackend())
+    if backend == "redis":
+        return SessionStore(RedisSessionBackend())
+    raise ValueError(f"Unsupported SESSION_STORE_BACKEND '{backend}'. Use 'memory', 'sqlite' or 'redis'")
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+from ai_client.tts_client import asynthesize_speech_chunked, TTS_MODEL, TTS_VOICE
+from utils.audio_cache import audio_cache_key, aget_or_create_session_audio, link_session_audio
+from utils.audio_events import audio_ready
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+AUDIO_QUEUE_BACKEND = os.getenv("AUDIO_QUEUE_BACKEND", "inprocess")  # inprocess | process
+AUDIO_QUEUE_MAX_SIZE = int(os.getenv("AUDIO_QUEUE_MAX_SIZE", "200"))
+AUDIO_QUEUE_CONCURRENCY = int(os.getenv("AUDIO_QUEUE_CONCURRENCY", "4"))
+AUDIO_QUEUE_DRAIN_SECONDS = float(os.getenv("AUDIO_QUEUE_DRAIN_SECONDS", "10"))
+AUDIO_QUEUE_DB = os.getenv("AUDIO_QUEUE_DB", "audio_jobs.sqlite3")
+AUDIO_JOB_MAX_ATTEMPTS = int(os.getenv("AUDIO_JOB_MAX_ATTEMPTS", "3"))
+AUDIO_JOB_BACKOFF_SECONDS = float(os.getenv("AUDIO_JOB_BACKOFF_SECONDS", "1"))
+# Sessions whose narration failed, remembered for late /api/audio_url polls
+AUDIO_FAILED_SESSIONS = int(os.getenv("AUDIO_FAILED_SESSIONS", "10000"))
+
+
+class AudioJob:
+    """
+    One narration to synthesize, shared by every session that asked for the same text.
+    """
+
+    def __init__(self, text: str, session_id: str, voice: str = TTS_VOICE, model: str = TTS_MODEL):
+        self.text = text
+        self.voice = voice
+        self.model = model
+        self.digest = audio_cache_key(text, voice, model)
+        self.session_ids = [session_id]
+        self.enqueued_at = time.time()
+
+
+class AudioJobMetrics:
+    """
+    Counters and a rolling window of enqueue-to-done latencies.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.retried = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self, queue_depth: int, in_flight: int) -> dict:
+        return {
+            "queue_depth": queue_depth,
+            "in_flight": in_flight,
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "retried": self.retried,
+            "completed": self.completed,
+            "failed": self.failed,
+            **latency_percentiles(self.latencies),
+        }
+
+
+def latency_percentiles(latencies) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"latency_p50_seconds": None, "latency_p95_seconds": None}
+    return {
+        "latency_p50_seconds": latencies[int(0.5 * (len(latencies) - 1))],
+        "latency_p95_seconds": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+async def run_audio_job(
+    text: str,
+    session_id: str,
+    voice: str = TTS_VOICE,
+    model: str = TTS_MODEL,
+    max_attempts: int = AUDIO_JOB_MAX_ATTEMPTS,
+    backoff_seconds: float = AUDIO_JOB_BACKOFF_SECONDS,
+    metrics: Optional[AudioJobMetrics] = None,
+) -> str:
+    """
+    Synthesize (or reuse) the narration and link it to session_id, retrying
+    failures with exponential backoff and jitter.
+
+    Returns:
+        str: Object key of the stored audio.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return await aget_or_create_session_audio(text, session_id, asynthesize_speech_chunked, voice, model)
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            delay = backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logger.warning(f"[run_audio_job] Attempt {attempt} for session {session_id} failed ({e}), retrying in {delay:.1f}s")
+            if metrics is not None:
+                metrics.retried += 1
+            await asyncio.sleep(delay)
+
+
+def finish_audio_job(session_ids: List[str], object_key: Optional[str]):
+    """
+    Point the sessions that joined a finished job at its audio, or tell
+    their waiting requests that generation failed.
+    """
+    for session_id in session_ids:
+        if object_key is not None:
+            link_session_audio(session_id, object_key)
+        else:
+            audio_ready.notify(session_id, None)
+
+
+class InProcessAudioQueue:
+    """
+    Bounded audio generation queue served by a pool of asyncio workers in
+    the API process.
+
+    Identical texts queued or running at the same time are synthesized once
+    for all their sessions. When the queue is full, enqueue() refuses the job
+    instead of letting work pile up in the process.
+    """
+
+    def __init__(
+        self,
+        max_size: int = AUDIO_QUEUE_MAX_SIZE,
+        concurrency: int = AUDIO_QUEUE_CONCURRENCY,
+        max_attempts: int = AUDIO_JOB_MAX_ATTEMPTS,
+        backoff_seconds: float = AUDIO_JOB_BACKOFF_SECONDS,
+    ):
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.metrics = AudioJobMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs = {}  # digest -> AudioJob, queued or running
+        self._workers = []
+        self._in_flight = 0
+        self._failed_sessions: "OrderedDict[str, None]" = OrderedDict()
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self, drain_seconds: float = AUDIO_QUEUE_DRAIN_SECONDS):
+        """
+        Give queued jobs up to drain_seconds to finish, then cancel the workers.
+        """
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"[InProcessAudioQueue] Dropping {self._queue.qsize()} queued audio jobs on shutdown")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def enqueue(self, text: str, session_id: str, voice: str = TTS_VOICE, model: str = TTS_MODEL) -> bool:
+        """
+        Queue the narration of session_id. Returns False if the queue is full.
+        """
+        job = self._jobs.get(audio_cache_key(text, voice, model))
+        if job is not None:
+            job.session_ids.append(session_id)
+            self.metrics.deduplicated += 1
+            return True
+
+        job = AudioJob(text, session_id, voice, model)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            logger.warning(f"[InProcessAudioQueue] Queue full ({self.max_size}), rejected audio for session {session_id}")
+            return False
+        self._jobs[job.digest] = job
+        self.metrics.enqueued += 1
+        return True
+
+    async def aenqueue(self, text: str, session_id: str, voice: str = TTS_VOICE, model: str = TTS_MODEL) -> bool:
+        return self.enqueue(text, session_id, voice, model)
+
+    async def ahas_failed(self, session_id: str) -> bool:
+        """
+        Whether the narration of session_id was given up on. Waiting requests
+        are also told through audio_ready; this covers polls that start later.
+        """
+        return session_id in self._failed_sessions
+
+    def _remember_failed(self, session_ids: List[str]):
+        for session_id in session_ids:
+            self._failed_sessions[session_id] = None
+        while len(self._failed_sessions) > AUDIO_FAILED_SESSIONS:
+            self._failed_sessions.popitem(last=False)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._in_flight += 1
+            object_key = None
+            try:
+                object_key = await run_audio_job(
+                    job.text, job.session_ids[0], job.voice, job.model,
+                    self.max_attempts, self.backoff_seconds, self.metrics,
+                )
+                self.metrics.completed += 1
+            except Exception as e:
+                self.metrics.failed += 1
+                logger.error(f"[InProcessAudioQueue] Audio job for sessions {job.session_ids} failed: {e}")
+            finally:
+                # No await between unregistering the job and finishing it,
+                # so sessions that joined it meanwhile are all linked
+                self._jobs.pop(job.digest, None)
+                self._in_flight -= 1
+                self._queue.task_done()
+            if object_key is None:
+                self._remember_failed(job.session_ids)
+            sessions = job.session_ids[1:] if object_key is not None else job.session_ids
+            try:
+                finish_audio_job(sessions, object_key)
+            except Exception as e:
+                logger.error(f"[InProcessAudioQueue] Could not link audio for sessions {sessions}: {e}")
+            self.metrics.latencies.append(time.time() - job.enqueued_at)
+
+    def stats(self) -> dict:
+        return {"backend": "inprocess", **self.metrics.snapshot(self._queue.qsize() if self._queue else 0, self._in_flight)}
+
+
+def connect_job_db(db_path: str = AUDIO_QUEUE_DB) -> sqlite3.Connection:
+    """
+    Open the job table shared by the API (producer) and audio workers.
+    """
+    db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA busy_timeout=5000")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS audio_jobs ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, digest TEXT NOT NULL, text TEXT NOT NULL, "
+        "voice TEXT NOT NULL, model TEXT NOT NULL, session_ids TEXT NOT NULL, "
+        "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT, "
+        "enqueued_at REAL NOT NULL, claimed_at REAL, finished_at REAL)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS audio_jobs_status ON audio_jobs (status, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS audio_jobs_digest ON audio_jobs (digest, status)")
+    return db
+
+
+class SQLiteAudioQueue:
+    """
+    Producer side of the separate-process backend: jobs are written to a
+    SQLite table on the host and processed by `python -m jobs.audio_worker`,
+    so TTS and uploads never run in the API process. Dedup and the size
+    bound work as in InProcessAudioQueue.
+    """
+
+    def __init__(self, db_path: str = AUDIO_QUEUE_DB, max_size: int = AUDIO_QUEUE_MAX_SIZE):
+        self.max_size = max_size
+        self.deduplicated = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._db = connect_job_db(db_path)
+
+    async def start(self):
+        pass
+
+    async def stop(self, drain_seconds: float = AUDIO_QUEUE_DRAIN_SECONDS):
+        with self._lock:
+            self._db.close()
+
+    def enqueue(self, text: str, session_id: str, voice: str = TTS_VOICE, model: str = TTS_MODEL) -> bool:
+        """
+        Queue the narration of session_id. Returns False if the queue is full.
+        """
+        digest = audio_cache_key(text, voice, model)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, session_ids FROM audio_jobs WHERE digest = ? AND status IN ('pending', 'running')",
+                    (digest,),
+                ).fetchone()
+                if row is not None:
+                    session_ids = json.loads(row[1]) + [session_id]
+                    self._db.execute("UPDATE audio_jobs SET session_ids = ? WHERE id = ?", (json.dumps(session_ids), row[0]))
+                    self._db.execute("COMMIT")
+                    self.deduplicated += 1
+                    return True
+
+                depth = self._db.execute("SELECT COUNT(*) FROM audio_jobs WHERE status = 'pending'").fetchone()[0]
+                if depth >= self.max_size:
+                    self._db.execute("ROLLBACK")
+                    self.rejected += 1
+                    logger.warning(f"[SQLiteAudioQueue] Queue full ({self.max_size}), rejected audio for session {session_id}")
+                    return False
+
+                self._db.execute(
+                    "INSERT INTO audio_jobs (digest, text, voice, model, session_ids, status, enqueued_at) "
+                    "VALUES (?, ?, ?, ?, ?, 'pending', ?)",
+                    (digest, text, voice, model, json.dumps([session_id]), time.time()),
+                )
+                self._db.execute("COMMIT")
+                return True
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    async def aenqueue(self, text: str, session_id: str, voice: str = TTS_VOICE, model: str = TTS_MODEL) -> bool:
+        # The transaction can wait up to busy_timeout on the workers; keep it off the event loop
+        return await asyncio.to_thread(self.enqueue, text, session_id, voice, model)
+
+    def has_failed(self, session_id: str) -> bool:
+        """
+        Whether the latest job of session_id failed. Failures happen in the
+        worker process, so its notifications never reach this one's waiters.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT audio_jobs.status FROM audio_jobs, json_each(audio_jobs.session_ids) "
+                "WHERE json_each.value = ? ORDER BY audio_jobs.id DESC LIMIT 1",
+                (session_id,),
+            ).fetchone()
+        return row is not None and row[0] == "failed"
+
+    async def ahas_failed(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self.has_failed, session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM audio_jobs GROUP BY status").fetchall())
+            latencies = [row[0] for row in self._db.execute(
+                "SELECT finished_at - enqueued_at FROM audio_jobs WHERE status = 'done' ORDER BY id DESC LIMIT 1000"
+            )]
+            retried = self._db.execute("SELECT COALESCE(SUM(attempts - 1), 0) FROM audio_jobs WHERE attempts > 1").fetchone()[0]
+        return {
+            "backend": "process",
+            "queue_depth": counts.get("pending", 0),
+            "in_flight": counts.get("running", 0),
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "retried": retried,
+            "completed": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            **latency_percentiles(latencies),
+        }
+
+
+def load_audio_queue(backend: str = AUDIO_QUEUE_BACKEND):
+    """
+    Build the audio job queue for the configured backend ("inprocess" or "process").
+    """
+    if backend == "inprocess":
+        return InProcessAudioQueue()
+    if backend == "process":
+        return SQLiteAudioQueue()
+    raise ValueError(f"Unsupported AUDIO_QUEUE_BACKEND '{backend}'. Use 'inprocess' or 'process'")
@@ -0,0 +1,166 @@
+"""
+Audio worker process for AUDIO_QUEUE_BACKEND=process.
+
+Claims narration jobs that the API wrote to the shared SQLite job table,
+synthesizes and stores them, and links the audio to every session that
+asked for it. Run one or more next to the API on the same host:
+
+    python -m jobs.audio_worker --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from jobs.audio_queue import (
+    AUDIO_QUEUE_CONCURRENCY,
+    AUDIO_QUEUE_DB,
+    AUDIO_JOB_BACKOFF_SECONDS,
+    AUDIO_JOB_MAX_ATTEMPTS,
+    AudioJobMetrics,
+    connect_job_db,
+    finish_audio_job,
+    run_audio_job,
+)
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+AUDIO_WORKER_POLL_SECONDS = float(os.getenv("AUDIO_WORKER_POLL_SECONDS", "0.5"))
+# A running job not finished within this long (crashed worker) is claimed again
+AUDIO_JOB_LEASE_SECONDS = float(os.getenv("AUDIO_JOB_LEASE_SECONDS", "600"))
+AUDIO_JOB_RETENTION_SECONDS = float(os.getenv("AUDIO_JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+
+class AudioWorker:
+    def __init__(
+        self,
+        db_path: str = AUDIO_QUEUE_DB,
+        concurrency: int = AUDIO_QUEUE_CONCURRENCY,
+        max_attempts: int = AUDIO_JOB_MAX_ATTEMPTS,
+        backoff_seconds: float = AUDIO_JOB_BACKOFF_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._lock = threading.Lock()
+        self._db = connect_job_db(db_path)
+
+    def claim(self) -> Optional[tuple]:
+        """
+        Atomically take the oldest pending job (or one whose lease ran out).
+
+        Returns:
+            Optional[tuple]: (id, text, voice, model, first session_id), or None if there is no work.
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                "SELECT id, text, voice, model, session_ids FROM audio_jobs "
+                "WHERE status = 'pending' OR (status = 'running' AND claimed_at < ?) ORDER BY id LIMIT 1",
+                (now - AUDIO_JOB_LEASE_SECONDS,),
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE audio_jobs SET status = 'running', claimed_at = ? WHERE id = ?", (now, row[0]))
+        if row is None:
+            return None
+        return row[0], row[1], row[2], row[3], json.loads(row[4])[0]
+
+    def finish(self, job_id: int, ok: bool, attempts: int, error: Optional[str] = None) -> List[str]:
+        """
+        Mark a job done or failed and return every session that joined it.
+        """
+        with self._lock, self._transaction():
+            session_ids = json.loads(self._db.execute(
+                "SELECT session_ids FROM audio_jobs WHERE id = ?", (job_id,)
+            ).fetchone()[0])
+            self._db.execute(
+                "UPDATE audio_jobs SET status = ?, attempts = ?, error = ?, finished_at = ? WHERE id = ?",
+                ("done" if ok else "failed", attempts, error, time.time(), job_id),
+            )
+        return session_ids
+
+    @contextmanager
+    def _transaction(self):
+        # Write lock up front, so two workers cannot claim the same job
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def sweep(self):
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM audio_jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - AUDIO_JOB_RETENTION_SECONDS,),
+            )
+        if cursor.rowcount:
+            logger.info(f"[AudioWorker] Removed {cursor.rowcount} finished jobs")
+
+    async def _loop(self):
+        while True:
+            try:
+                job = self.claim()
+            except sqlite3.Error as e:
+                logger.error(f"[AudioWorker] Could not claim a job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(AUDIO_WORKER_POLL_SECONDS)
+                continue
+
+            try:
+                await self._process(*job)
+            except Exception as e:
+                # The job stays 'running' and is retried once its lease runs out
+                logger.error(f"[AudioWorker] Could not record the result of job {job[0]}: {e}")
+
+    async def _process(self, job_id: int, text: str, voice: str, model: str, session_id: str):
+        metrics = AudioJobMetrics()
+        start = time.perf_counter()
+        try:
+            object_key = await run_audio_job(
+                text, session_id, voice, model, self.max_attempts, self.backoff_seconds, metrics
+            )
+        except Exception as e:
+            logger.error(f"[AudioWorker] Job {job_id} failed: {e}")
+            session_ids = self.finish(job_id, False, metrics.retried + 1, str(e))
+            finish_audio_job(session_ids, None)
+            return
+
+        session_ids = self.finish(job_id, True, metrics.retried + 1)
+        finish_audio_job([sid for sid in session_ids if sid != session_id], object_key)
+        logger.info(f"[AudioWorker] Job {job_id} done in {time.perf_counter() - start:.2f}s for {len(session_ids)} session(s)")
+
+    async def run(self):
+        logger.info(f"[AudioWorker] Processing audio jobs with concurrency {self.concurrency}")
+        loops = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        try:
+            while True:
+                self.sweep()
+                await asyncio.sleep(3600)
+        finally:
+            for loop in loops:
+                loop.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued narration audio jobs")
+    parser.add_argument("--db", default=AUDIO_QUEUE_DB, help="SQLite job table shared with the API")
+    parser.add_argument("--concurrency", type=int, default=AUDIO_QUEUE_CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(AudioWorker(args.db, args.concurrency).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from typing import Dict, List
+from pydantic import BaseModel
+
+class ConversationSession(BaseModel):
+    session_id: str
+    language: str = "en"
+    role: str = "adult"
+    title: str = ""
+    artist: str = ""
+    museum_name: str = ""
+    # Running summary of the turns compacted out of `messages`
+    summary: str = ""
+    messages: List[Dict[str, str]] = []
+    summarized_messages: int = 0
+    # Narration text; unlike messages[0] it survives compaction
+    description: str = ""
+    # Set once the narration is being streamed or queued, so it is generated once
+    audio_started: bool = False
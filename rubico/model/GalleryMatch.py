@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+class GalleryMatch(BaseModel):
+    title: str
+    artist: str
+    museum_name: str
+    description: str
+    image_path: str
+    score: float
@@ -0,0 +1,211 @@
+import io
+import logging
+import os
+import sys
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+from language.language import Language
+from model.ArtworkMetadata import ArtworkMetadata
+from model.GalleryMatch import GalleryMatch
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+CLIP_MATCH_ENABLED = os.getenv("CLIP_MATCH_ENABLED", "true").lower() == "true"
+ML_PLATFORM_DIR = os.getenv("ML_PLATFORM_DIR", os.path.join("..", "ML platform"))
+CLIP_GALLERY_DIR = os.getenv("CLIP_GALLERY_DIR", os.path.join(ML_PLATFORM_DIR, "clip_gallery"))
+CLIP_MATCH_THRESHOLD = float(os.getenv("CLIP_MATCH_THRESHOLD", "0.85"))
+CLIP_QUERY_VIEWS = tuple(v.strip() for v in os.getenv("CLIP_QUERY_VIEWS", "center").split(",") if v.strip())
+CLIP_VIEW_AGGREGATE = os.getenv("CLIP_VIEW_AGGREGATE", "max")  # max | mean
+CLIP_ENCODER = os.getenv("CLIP_ENCODER", "torch")  # torch | onnx-fp32 | onnx-int8
+CLIP_ENCODER_DIR = os.getenv("CLIP_ENCODER_DIR", os.path.join(ML_PLATFORM_DIR, "clip_encoder"))
+CLIP_ENCODER_THREADS = int(os.getenv("CLIP_ENCODER_THREADS", "0")) or None  # onnxruntime intra-op threads
+
+# The audience the gallery (museum) descriptions are written for
+GALLERY_DESCRIPTION_ROLE = "adult"
+
+# The gallery store format, its index, the query views and the image encoders
+# live in the ML platform's scripts; share them instead of keeping second copies here
+if os.path.abspath(ML_PLATFORM_DIR) not in sys.path:
+    sys.path.append(os.path.abspath(ML_PLATFORM_DIR))
+
+try:
+    from gallery_index import FlatIndex
+    from gallery_store import load_gallery_store
+    from query_views import VIEW_NAMES, make_views
+    HAVE_ML_PLATFORM = True
+except ImportError:
+    HAVE_ML_PLATFORM = False
+
+
+class ClipMatcher:
+    """
+    Resident CLIP image matcher over a gallery store built by the ML platform
+    (header.json + embeddings.npy + metadata.csv).
+
+    The model and the memory-mapped gallery are loaded once; match() then
+    costs one batched forward pass over the query views of the upload plus
+    one exact FlatIndex search. Each gallery row is scored by its best view
+    (aggregate="max") or its mean over views ("mean"); views=("center",)
+    is the plain single-crop query.
+
+    The image encoder comes from the ML platform's clip_encoder.load_encoder:
+    the PyTorch CLIP model ("torch") or the exported ONNX image tower run by
+    onnxruntime ("onnx-fp32", or "onnx-int8" with
+    quantized weights), which never loads the PyTorch checkpoint.
+    """
+
+    def __init__(
+        self,
+        gallery_dir: str,
+        threshold: float = CLIP_MATCH_THRESHOLD,
+        views: Sequence[str] = CLIP_QUERY_VIEWS,
+        aggregate: str = CLIP_VIEW_AGGREGATE,
+        encoder: str = CLIP_ENCODER,
+        encoder_dir: str = CLIP_ENCODER_DIR,
+        num_threads: Optional[int] = CLIP_ENCODER_THREADS,
+    ):
+        # The store loader checks the header against the files; the embeddings stay
+        # memory-mapped and float16 stores are upcast block by block while scoring
+        embeddings, self.metadata, header = load_gallery_store(gallery_dir)
+        self.index = FlatIndex().build(embeddings, normalized=header["normalized"])
+
+        if aggregate not in ("max", "mean"):
+            raise ValueError(f"Unknown view aggregate '{aggregate}', use 'max' or 'mean'")
+        if not views or set(views) - set(VIEW_NAMES):
+            raise ValueError(f"Query views must be a non-empty subset of {', '.join(VIEW_NAMES)}, got {views}")
+        self.threshold = threshold
+        self.views = tuple(views)
+        self.aggregate = aggregate
+        self.model_name = header["model_name"]
+        self.encoder = encoder
+        # torch / transformers (and onnxruntime for the ONNX encoders) are only
+        # needed when local matching is enabled
+        from clip_encoder import load_encoder
+
+        self.image_encoder = load_encoder(encoder, encoder_dir, self.model_name, num_threads)
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def _encode(self, images: List[Image.Image]) -> np.ndarray:
+        # Every backend returns L2-normalized float32 [B, D] embeddings
+        return self.image_encoder(self.image_encoder.preprocess(images))
+
+    def embed(self, image: Union[bytes, Image.Image]):
+        """
+        Encode an uploaded image (encoded bytes, or an already decoded RGB
+        image such as PreparedImage.image) into a normalized [D] float32 vector.
+        """
+        if isinstance(image, bytes):
+            image = Image.open(io.BytesIO(image)).convert("RGB")
+        return self._encode([image])[0]
+
+    def embed_views(self, image: Union[bytes, Image.Image]):
+        """
+        Encode the configured query views of an uploaded image in one batch
+        into normalized [V, D] float32 vectors.
+        """
+        if isinstance(image, bytes):
+            image = Image.open(io.BytesIO(image)).convert("RGB")
+        images, _ = make_views(image, self.views)
+        return self._encode(images)
+
+    def match(self, image: Union[bytes, Image.Image], k: int = 1) -> List[GalleryMatch]:
+        """
+        Return the k best gallery matches for an uploaded image, best first.
+        """
+        if k <= 0 or len(self.index) == 0:
+            return []
+        view_embs = self.embed_views(image)
+        if self.aggregate == "mean":
+            mean = view_embs.mean(axis=0)
+            scores, ids = self.index.search(mean, k=k)
+            # search normalizes the query; scale back so scores are mean cosines
+            norm = float(np.linalg.norm(mean))
+            top = [(i, float(score) * norm) for i, score in zip(ids[0], scores[0]) if i >= 0]
+        else:
+            # A row's best view ranks in that view's own top k, so k per view is exact
+            scores, ids = self.index.search(view_embs, k=k)
+            best = {}
+            for row_ids, row_scores in zip(ids, scores):
+                for i, score in zip(row_ids, row_scores):
+                    if i >= 0 and score > best.get(i, -np.inf):
+                        best[i] = float(score)
+            top = sorted(best.items(), key=lambda item: -item[1])[:k]
+
+        return [
+            GalleryMatch(
+                title=self.metadata[i]["title"],
+                artist=self.metadata[i]["artist"],
+                museum_name=self.metadata[i].get("museum_name", ""),
+                description=self.metadata[i].get("description", ""),
+                image_path=self.metadata[i]["image_path"],
+                score=score,
+            )
+            for i, score in top
+        ]
+
+    def best_confident_match(self, image: Union[bytes, Image.Image]) -> Optional[GalleryMatch]:
+        """
+        Return the top match if its score clears the threshold, else None.
+        """
+        matches = self.match(image, k=1)
+        if matches and matches[0].score >= self.threshold:
+            return matches[0]
+        return None
+
+
+def load_clip_matcher(gallery_dir: str = CLIP_GALLERY_DIR) -> Optional[ClipMatcher]:
+    """
+    Build the resident matcher at startup. Returns None (LLM-only recognition)
+    when matching is disabled, the gallery is missing or the ML dependencies
+    are not installed.
+    """
+    if not CLIP_MATCH_ENABLED:
+        logger.info("[load_clip_matcher] Local CLIP matching disabled")
+        return None
+    if not HAVE_ML_PLATFORM:
+        logger.warning(f"[load_clip_matcher] ML platform modules not found in '{ML_PLATFORM_DIR}', using LLM recognition only")
+        return None
+    if not os.path.exists(os.path.join(gallery_dir, "header.json")):
+        logger.warning(f"[load_clip_matcher] No gallery store at '{gallery_dir}', using LLM recognition only")
+        return None
+    try:
+        matcher = ClipMatcher(gallery_dir)
+    except ImportError as e:
+        logger.warning(f"[load_clip_matcher] CLIP dependencies not installed ({e}), using LLM recognition only")
+        return None
+    logger.info(
+        f"[load_clip_matcher] Loaded {len(matcher)} gallery embeddings from '{gallery_dir}', "
+        f"{matcher.encoder} encoder, query views {','.join(matcher.views)} ({matcher.aggregate})"
+    )
+    return matcher
+
+
+def gallery_match_to_metadata(match: GalleryMatch, language: str = "en", role: str = "adult") -> Optional[ArtworkMetadata]:
+    """
+    Turn a confident gallery match into the ArtworkMetadata the API returns,
+    translating the gallery description when needed. Returns None when the
+    gallery has no usable description, so the caller falls back to the LLM.
+    Gallery descriptions are museum texts written for adults, so other roles
+    get None too and an LLM description in their own style.
+    """
+    description = match.description
+    if not description or role != GALLERY_DESCRIPTION_ROLE:
+        return None
+    if language != "en":
+        try:
+            description = Language.translate_to_language(description, Language.from_code(language))
+        except Exception as e:
+            logger.warning(f"[gallery_match_to_metadata] Could not translate description to '{language}': {e}")
+            return None
+    return ArtworkMetadata(
+        title=match.title,
+        artist=match.artist,
+        museum_name=match.museum_name,
+        description=description,
+    )
@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Optional
+
+from botocore.exceptions import ClientError
+
+from utils.s3Server import get_s3_client, S3_BUCKET_NAME, SESSION_POINTER_EXTENSION, generate_object_key
+from utils.audio_index import get_audio_index
+from utils.audio_events import audio_ready
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+AUDIO_CACHE_PREFIX = os.getenv("AUDIO_CACHE_PREFIX", "audio")
+AUDIO_CACHE_TTL_DAYS = int(os.getenv("AUDIO_CACHE_TTL_DAYS", "30"))
+SESSION_AUDIO_TTL_DAYS = int(os.getenv("SESSION_AUDIO_TTL_DAYS", "1"))
+# A cache hit older than this is copied onto itself to restart its lifecycle clock
+AUDIO_CACHE_REFRESH_SECONDS = int(os.getenv("AUDIO_CACHE_REFRESH_SECONDS", str(24 * 3600)))
+
+# One [lock, waiters] entry per audio digest, so concurrent sessions asking
+# for the same text synthesize it once instead of racing each other
+_digest_locks = {}
+_digest_locks_guard = threading.Lock()
+# Same for the async path; only touched from the event loop, so no guard needed
+_async_digest_locks = {}
+
+
+def audio_cache_key(text: str, voice: str, model: str) -> str:
+    """
+    Content address of a narration: sha256 over TTS model, voice and text.
+
+    Returns:
+        str: Hex digest identifying the audio.
+    """
+    return hashlib.sha256(f"{model}\n{voice}\n{text}".encode("utf-8")).hexdigest()
+
+
+def audio_object_key(digest: str, extension: str = "mp3") -> str:
+    """
+    S3 object key of the cached audio, e.g. 'audio/ab/abcdef....mp3'.
+    """
+    return f"{AUDIO_CACHE_PREFIX}/{digest[:2]}/{digest}.{extension}"
+
+
+def find_cached_audio(digest: str, bucket_name: Optional[str] = None) -> Optional[str]:
+    """
+    Return the object key of the cached audio for digest, or None if it is not stored.
+    Hits that have not been refreshed recently are touched so the lifecycle
+    rule evicts by last use rather than by first upload.
+    """
+    bucket = bucket_name or S3_BUCKET_NAME
+    object_key = audio_object_key(digest)
+    try:
+        head = get_s3_client().head_object(Bucket=bucket, Key=object_key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+    age = (datetime.now(timezone.utc) - head["LastModified"]).total_seconds()
+    if age > AUDIO_CACHE_REFRESH_SECONDS:
+        try:
+            get_s3_client().copy_object(
+                Bucket=bucket,
+                Key=object_key,
+                CopySource={"Bucket": bucket, "Key": object_key},
+                ContentType=head.get("ContentType", "audio/mpeg"),
+                MetadataDirective="REPLACE",
+            )
+        except ClientError as e:
+            logger.warning(f"[find_cached_audio] Could not refresh {object_key}: {e}")
+    return object_key
+
+
+def store_cached_audio(digest: str, audio_bytes: bytes, content_type: str = "audio/mpeg",
+                       bucket_name: Optional[str] = None) -> str:
+    """
+    Upload synthesized audio under its content address and return the object key.
+    """
+    if not audio_bytes:
+        # An empty object would be served as the narration of every session with this text
+        raise ValueError(f"Refusing to cache empty audio for {digest}")
+    bucket = bucket_name or S3_BUCKET_NAME
+    object_key = audio_object_key(digest)
+    get_s3_client().put_object(Bucket=bucket, Key=object_key, Body=audio_bytes, ContentType=content_type)
+    return object_key
+
+
+def link_session_audio(session_id: str, object_key: str, bucket_name: Optional[str] = None):
+    """
+    Point a session at a stored audio object in the local audio index,
+    where /api/audio_url looks it up, and wake requests waiting for it.
+    A tiny pointer object 'sessions/{session_id}/{timestamp}.ref' whose body
+    is the target key lets hosts without the index entry find it on S3.
+    """
+    get_audio_index().set(session_id, object_key)
+    audio_ready.notify(session_id, object_key)
+    try:
+        get_s3_client().put_object(
+            Bucket=bucket_name or S3_BUCKET_NAME,
+            Key=generate_object_key(session_id, extension=SESSION_POINTER_EXTENSION),
+            Body=object_key.encode("utf-8"),
+            ContentType="text/plain",
+        )
+    except Exception as e:
+        logger.warning(f"[link_session_audio] Could not store the S3 pointer of session {session_id}: {e}")
+
+
+def get_or_create_session_audio(
+    text: str,
+    session_id: str,
+    synthesize: Callable[[str], bytes],
+    voice: str,
+    model: str,
+) -> str:
+    """
+    Make the audio for text available to session_id, synthesizing and
+    uploading it only if no identical narration is stored yet.
+
+    Args:
+        text (str): Narration text.
+        session_id (str): Session that should play the audio.
+        synthesize (Callable[[str], bytes]): TTS function, called on cache misses only.
+        voice (str): TTS voice, part of the cache key.
+        model (str): TTS model, part of the cache key.
+
+    Returns:
+        str: Object key of the (cached) audio.
+    """
+    digest = audio_cache_key(text, voice, model)
+    with _digest_locks_guard:
+        entry = _digest_locks.setdefault(digest, [threading.Lock(), 0])
+        entry[1] += 1
+
+    try:
+        with entry[0]:
+            object_key = find_cached_audio(digest)
+            if object_key is None:
+                start = time.perf_counter()
+                object_key = store_cached_audio(digest, synthesize(text))
+                logger.info(f"[get_or_create_session_audio] Synthesized {object_key} in {time.perf_counter() - start:.2f}s")
+            else:
+                logger.info(f"[get_or_create_session_audio] Reusing cached audio {object_key} for session {session_id}")
+    finally:
+        with _digest_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _digest_locks.pop(digest, None)
+
+    link_session_audio(session_id, object_key)
+    return object_key
+
+
+async def aget_or_create_session_audio(
+    text: str,
+    session_id: str,
+    synthesize: Callable[[str], Awaitable[bytes]],
+    voice: str,
+    model: str,
+) -> str:
+    """
+    Async variant of get_or_create_session_audio: synthesize is awaited and
+    the (synchronous) S3 calls run in worker threads, so the event loop is
+    never blocked.
+
+    Returns:
+        str: Object key of the (cached) audio.
+    """
+    digest = audio_cache_key(text, voice, model)
+    entry = _async_digest_locks.setdefault(digest, [asyncio.Lock(), 0])
+    entry[1] += 1
+
+    try:
+        async with entry[0]:
+            object_key = await asyncio.to_thread(find_cached_audio, digest)
+            if object_key is None:
+                start = time.perf_counter()
+                audio_bytes = await synthesize(text)
+                object_key = await asyncio.to_thread(store_cached_audio, digest, audio_bytes)
+                logger.info(f"[aget_or_create_session_audio] Synthesized {object_key} in {time.perf_counter() - start:.2f}s")
+            else:
+                logger.info(f"[aget_or_create_session_audio] Reusing cached audio {object_key} for session {session_id}")
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _async_digest_locks.pop(digest, None)
+
+    await asyncio.to_thread(link_session_audio, session_id, object_key)
+    return object_key
+
+
+async def atee_session_audio_stream(
+    chunks: AsyncIterable[bytes],
+    text: str,
+    session_id: str,
+    voice: str,
+    model: str,
+) -> AsyncIterator[bytes]:
+    """
+    Pass streamed TTS chunks through to the caller while buffering them;
+    once the stream completes, store the audio in the cache and link it to
+    session_id so later plays and /api/audio_url find it. The S3 calls
+    run in worker threads. An interrupted stream is not stored.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        yield chunk
+
+    digest = audio_cache_key(text, voice, model)
+    try:
+        object_key = await asyncio.to_thread(store_cached_audio, digest, bytes(buffer))
+        await asyncio.to_thread(link_session_audio, session_id, object_key)
+        logger.info(f"[atee_session_audio_stream] Stored streamed audio {object_key} for session {session_id}")
+    except Exception as e:
+        logger.error(f"[atee_session_audio_stream] Failed to store streamed audio for session {session_id}: {e}")
+
+
+def apply_audio_cache_lifecycle(
+    audio_ttl_days: int = AUDIO_CACHE_TTL_DAYS,
+    session_ttl_days: int = SESSION_AUDIO_TTL_DAYS,
+    bucket_name: Optional[str] = None,
+):
+    """
+    Install the storage-side eviction policy: cached audio expires after
+    audio_ttl_days without use (hits restart the clock, see find_cached_audio),
+    per-session objects and pointers after session_ttl_days.
+    """
+    bucket = bucket_name or S3_BUCKET_NAME
+    get_s3_client().put_bucket_lifecycle_configuration(
+        Bucket=bucket,
+        LifecycleConfiguration={
+            "Rules": [
+                {
+                    "ID": "expire-cached-audio",
+                    "Filter": {"Prefix": f"{AUDIO_CACHE_PREFIX}/"},
+                    "Status": "Enabled",
+                    "Expiration": {"Days": audio_ttl_days},
+                },
+                {
+                    "ID": "expire-session-audio",
+                    "Filter": {"Prefix": "sessions/"},
+                    "Status": "Enabled",
+                    "Expiration": {"Days": session_ttl_days},
+                },
+            ]
+        },
+    )
+    logger.info(f"[apply_audio_cache_lifecycle] Cached audio TTL {audio_ttl_days}d, session TTL {session_ttl_days}d on '{bucket}'")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    apply_audio_cache_lifecycle()
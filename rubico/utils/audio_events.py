@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+
+class AudioReadyNotifier:
+    """
+    In-process readiness signal for session audio.
+
+    Long-polling requests subscribe to a session and get a future; whoever
+    stores the session's audio resolves it with the object key (or with None
+    if generation failed). Notifications may come from any thread: futures
+    are resolved on their own event loop.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self, session_id: str) -> Iterator[asyncio.Future]:
+        """
+        Register interest in session_id's audio for the duration of the block.
+        Subscribe before checking whether the audio already exists, so a
+        notification cannot slip in between the check and the wait.
+        """
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._waiters.setdefault(session_id, set()).add(future)
+        try:
+            yield future
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(session_id)
+                if waiters is not None:
+                    waiters.discard(future)
+                    if not waiters:
+                        del self._waiters[session_id]
+
+    def notify(self, session_id: str, object_key: Optional[str]):
+        """
+        Wake every request waiting on session_id.
+
+        Args:
+            session_id (str): Session whose audio finished.
+            object_key (Optional[str]): Stored audio object, or None if generation failed.
+        """
+        with self._lock:
+            waiters = self._waiters.pop(session_id, set())
+        for future in waiters:
+            try:
+                future.get_loop().call_soon_threadsafe(_resolve, future, object_key)
+            except RuntimeError:
+                # The waiter's event loop has shut down
+                pass
+
+
+def _resolve(future: asyncio.Future, object_key: Optional[str]):
+    if not future.done():
+        future.set_result(object_key)
+
+
+# Process-wide notifier shared by the audio pipeline and the API
+audio_ready = AudioReadyNotifier()
@@ -0,0 +1,93 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+AUDIO_INDEX_DB = os.getenv("AUDIO_INDEX_DB", "audio_index.sqlite3")
+AUDIO_INDEX_TTL_SECONDS = int(os.getenv("AUDIO_INDEX_TTL_SECONDS", str(24 * 3600)))
+
+
+class AudioIndex:
+    """
+    Local session_id -> S3 object key index of narration audio.
+
+    Written when a session's audio is stored or linked, read by
+    /api/audio_url polls, so finding a session's audio is one primary-key
+    lookup instead of an S3 LIST. Backed by a SQLite file shared by all
+    workers on the host; entries expire after `ttl_seconds`, matching the
+    lifetime of per-session audio.
+    """
+
+    def __init__(self, db_path: str = AUDIO_INDEX_DB, ttl_seconds: int = AUDIO_INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_audio ("
+            "session_id TEXT PRIMARY KEY, object_key TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Return the object key of the session's audio, or None if it is not ready.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT object_key, expires_at FROM session_audio WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, session_id: str, object_key: str):
+        """
+        Point session_id at object_key, replacing any earlier audio of the session.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO session_audio (session_id, object_key, expires_at) VALUES (?, ?, ?)",
+                (session_id, object_key, time.time() + self.ttl_seconds),
+            )
+            self._db.commit()
+            self._writes += 1
+            # Sweep expired rows now and then instead of on every write
+            if self._writes % 100 == 0:
+                cursor = self._db.execute("DELETE FROM session_audio WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+                if cursor.rowcount:
+                    logger.info(f"[AudioIndex] Evicted {cursor.rowcount} expired entries")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_audio_index: Optional[AudioIndex] = None
+_audio_index_lock = threading.Lock()
+
+
+def get_audio_index() -> AudioIndex:
+    """
+    Return the process-wide audio index, opening it on first use.
+    """
+    global _audio_index
+    with _audio_index_lock:
+        if _audio_index is None:
+            _audio_index = AudioIndex()
+        return _audio_index
+
+
+def close_audio_index():
+    global _audio_index
+    with _audio_index_lock:
+        index, _audio_index = _audio_index, None
+    if index is not None:
+        index.close()
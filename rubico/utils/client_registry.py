@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import boto3
+import httpx
+from botocore.config import Config
+from openai import OpenAI, AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "5"))
+
+
+class ClientRegistry:
+    """
+    Process-wide, long-lived SDK clients (OpenAI sync/async, Gemini, S3)
+    sharing pooled keep-alive HTTP connections, so per-request code never
+    pays client construction or TLS setup.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        s3_max_pool_connections: int = S3_MAX_POOL_CONNECTIONS,
+    ):
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.async_http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self.openai = OpenAI(http_client=self.http_client)
+        self.async_openai = AsyncOpenAI(http_client=self.async_http_client)
+
+        region = os.getenv('AWS_REGION', 'us-east-2')
+        try:
+            self.s3 = boto3.client(
+                's3',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'your-access-key'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'your-secret-key'),
+                region_name=region,
+                endpoint_url=f"https://s3.{region}.amazonaws.com",
+                config=Config(max_pool_connections=s3_max_pool_connections, tcp_keepalive=True),
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to initialize S3 client: {e}")
+
+        self._gemini = {}  # api_key -> client
+        self._gemini_lock = threading.Lock()
+
+    def gemini(self, api_key: str):
+        """
+        Shared Gemini client for api_key, created on first use of that key.
+        """
+        with self._gemini_lock:
+            client = self._gemini.get(api_key)
+            if client is None:
+                from google import genai
+                client = self._gemini[api_key] = genai.Client(api_key=api_key)
+            return client
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def prompt_generator(language: str, role: str):
+        """
+        Shared PromptGenerator per (language, role); they are immutable after init.
+        """
+        from ai_client.promptGenerator import PromptGenerator
+        return PromptGenerator(language=language, role=role)
+
+    async def health_check(self, bucket_name: Optional[str] = None) -> dict:
+        """
+        Check that the pooled clients can reach their services.
+
+        Returns:
+            dict: {"ok": bool, "openai": "ok" | error, "s3": "ok" | error}
+        """
+        from utils.s3Server import S3_BUCKET_NAME
+        bucket = bucket_name or S3_BUCKET_NAME
+
+        async def check(name, probe):
+            try:
+                await asyncio.wait_for(probe(), HEALTH_CHECK_TIMEOUT_SECONDS)
+                return name, "ok"
+            except Exception as e:
+                logger.warning(f"[ClientRegistry.health_check] {name} unhealthy: {e}")
+                return name, f"error: {e}"
+
+        results = dict(await asyncio.gather(
+            check("openai", lambda: self.async_openai.models.list()),
+            check("s3", lambda: asyncio.to_thread(self.s3.head_bucket, Bucket=bucket)),
+        ))
+        results["ok"] = all(value == "ok" for value in results.values())
+        return results
+
+    async def aclose(self):
+        await self.async_http_client.aclose()
+        self.http_client.close()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ClientRegistry:
+    """
+    Return the process-wide registry, creating it on first use (scripts and
+    background jobs); the API creates it up front in its lifespan.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+        return _registry
+
+
+async def close_registry():
+    global _registry
+    with _registry_lock:
+        registry, _registry = _registry, None
+    if registry is not None:
+        await registry.aclose()
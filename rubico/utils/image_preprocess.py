@@ -0,0 +1,128 @@
+import io
+import logging
+import os
+import threading
+import time
+from typing import BinaryIO, Union
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Environment config
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG | WEBP
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+_stats = {"images": 0, "original_bytes": 0, "prepared_bytes": 0, "seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+class PreparedImage:
+    """
+    An upload after preprocessing: the bytes and MIME type to send to vision
+    models, plus the decoded image for local matching.
+    """
+
+    def __init__(self, data: bytes, mime_type: str, image: Image.Image, original_size: int, seconds: float):
+        self.data = data
+        self.mime_type = mime_type
+        self.image = image
+        self.original_size = original_size
+        self.seconds = seconds
+
+
+def prepare_image(
+    image_bytes: Union[bytes, BinaryIO],
+    max_edge: int = IMAGE_MAX_EDGE,
+    image_format: str = IMAGE_FORMAT,
+    quality: int = IMAGE_QUALITY,
+) -> PreparedImage:
+    """
+    Decode an upload, apply its EXIF orientation, downsize it to max_edge
+    pixels on the longest side and re-encode it as a compact JPEG or WebP.
+
+    An upload that is already small, upright and in the target format is
+    kept as is when re-encoding would not make it smaller.
+
+    Args:
+        image_bytes (Union[bytes, BinaryIO]): Encoded image as uploaded, or a
+            seekable stream over it (decoded in place, without another copy).
+        max_edge (int): Longest side of the prepared image in pixels.
+        image_format (str): "JPEG" or "WEBP".
+        quality (int): Encoder quality (1-95).
+
+    Returns:
+        PreparedImage: The re-encoded image.
+
+    Raises:
+        ValueError: If the upload is not a decodable image.
+    """
+    start = time.perf_counter()
+    stream = io.BytesIO(image_bytes) if isinstance(image_bytes, bytes) else image_bytes
+    stream.seek(0, io.SEEK_END)
+    original_size = stream.tell()
+    stream.seek(0)
+    try:
+        image = Image.open(stream)
+        source_format = image.format
+        orientation = image.getexif().get(0x0112, 1)
+        # JPEGs can be decoded directly at a reduced scale, much faster than full size + resize
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Could not decode image: {e}")
+
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white; JPEG has no alpha channel
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    resized = max(image.size) > max_edge
+    if resized:
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    data = buffer.getvalue()
+
+    if not resized and orientation == 1 and source_format == image_format and original_size <= len(data):
+        stream.seek(0)
+        data = stream.read()
+
+    seconds = time.perf_counter() - start
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["original_bytes"] += original_size
+        _stats["prepared_bytes"] += len(data)
+        _stats["seconds"] += seconds
+    logger.info(
+        f"[prepare_image] {original_size / 1024:.0f}KB -> {len(data) / 1024:.0f}KB "
+        f"({image.width}x{image.height} {image_format}) in {seconds * 1000:.0f}ms"
+    )
+    return PreparedImage(data, MIME_TYPES[image_format], image, original_size, seconds)
+
+
+def preprocess_stats() -> dict:
+    """
+    Totals of prepare_image since startup: bytes saved and time spent.
+    """
+    with _stats_lock:
+        images = _stats["images"]
+        original = _stats["original_bytes"]
+        prepared = _stats["prepared_bytes"]
+        return {
+            "images": images,
+            "original_bytes": original,
+            "prepared_bytes": prepared,
+            "bytes_saved": original - prepared,
+            "size_ratio": prepared / original if original else None,
+            "mean_ms": _stats["seconds"] / images * 1000 if images else None,
+        }
@@ -1,27 +1,34 @@
 import os
+import threading
 import time
 import uuid
-import boto3
+from collections import OrderedDict
 from botocore.exceptions import NoCredentialsError, ClientError
 from typing import Optional
 
+from utils.client_registry import get_registry
+from utils.audio_index import get_audio_index
+
 # Environment config
-AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', 'your-access-key')
-AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'your-secret-key')
-AWS_REGION = os.getenv('AWS_REGION', 'us-east-2')
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', 'rubico-generated-audio')
+# Cached presigned URLs are re-signed once this fraction of their lifetime has
+# passed, so a URL handed out always has at least the rest of it left
+PRESIGNED_URL_REUSE_FRACTION = float(os.getenv('PRESIGNED_URL_REUSE_FRACTION', '0.5'))
+PRESIGNED_URL_CACHE_ITEMS = int(os.getenv('PRESIGNED_URL_CACHE_ITEMS', '10000'))
 
-# Initialize S3 client
-try:
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=AWS_REGION,
-        endpoint_url=f"https://s3.{AWS_REGION}.amazonaws.com"
-    )
-except Exception as e:
-    raise RuntimeError(f"Failed to initialize S3 client: {e}")
+# Extension of the objects that point a session at shared, cached audio
+SESSION_POINTER_EXTENSION = "ref"
+
+# (bucket, object_key, expiration_seconds) -> (url, expires_at)
+_presigned_urls: "OrderedDict[tuple, tuple]" = OrderedDict()
+_presigned_urls_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Shared, connection-pooled S3 client from the client registry.
+    """
+    return get_registry().s3
 
 def generate_object_key(
     session_id: str,
@@ -66,19 +73,15 @@ def upload_file_and_get_presigned_url(
     object_key = generate_object_key(session_id)
 
     try:
-        s3_client.put_object(
+        get_s3_client().put_object(
             Bucket=bucket,
             Key=object_key,
             Body=file_bytes,
             ContentType=content_type,
         )
+        get_audio_index().set(session_id, object_key)
 
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket, 'Key': object_key},
-            ExpiresIn=expiration_seconds
-        )
-        return presigned_url
+        return get_presigned_url(object_key, expiration_seconds, bucket)
 
     except NoCredentialsError:
         raise Exception("AWS credentials not found. Please check your environment variables.")
@@ -91,61 +94,113 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def get_presigned_url_by_session_id(
-        session_id: str,
+def get_presigned_url(
+        object_key: str,
         expiration_seconds: int = 300,
+        bucket_name: Optional[str] = None
+) -> str:
+    """
+    Sign a GET URL for an existing object. Signing is local, no S3 request is made,
+    and the URL is reused for the first PRESIGNED_URL_REUSE_FRACTION of its lifetime.
+
+    Args:
+        object_key (str): Key of the object to share.
+        expiration_seconds (int): How long the pre-signed URL is valid (default: 300 seconds).
+        bucket_name (Optional[str]): Optionally override the default bucket.
+
+    Returns:
+        str: A pre-signed URL to access the object.
+    """
+    bucket = bucket_name or S3_BUCKET_NAME
+    cache_key = (bucket, object_key, expiration_seconds)
+    now = time.time()
+    with _presigned_urls_lock:
+        entry = _presigned_urls.get(cache_key)
+        if entry is not None and entry[1] - now > expiration_seconds * (1 - PRESIGNED_URL_REUSE_FRACTION):
+            _presigned_urls.move_to_end(cache_key)
+            return entry[0]
+
+    url = get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket, 'Key': object_key},
+        ExpiresIn=expiration_seconds
+    )
+    with _presigned_urls_lock:
+        _presigned_urls[cache_key] = (url, now + expiration_seconds)
+        _presigned_urls.move_to_end(cache_key)
+        while len(_presigned_urls) > PRESIGNED_URL_CACHE_ITEMS:
+            _presigned_urls.popitem(last=False)
+    return url
+
+
+def find_session_audio_key(
+        session_id: str,
         bucket_name: Optional[str] = None,
-        prefix: str = "sessions",
-        extension: str = "mp3"
+        prefix: str = "sessions"
 ) -> Optional[str]:
     """
-    Finds the audio file with the specified session_id on S3 and returns its presigned URL.
-    Returns None if no file is found.
+    Finds the latest audio of session_id on S3 with one LIST of its folder,
+    plus a GET when that is a pointer to cached audio. Used when the local
+    audio index misses, e.g. for audio stored on another host.
 
     Args:
         session_id (str): Session ID to look up.
-        expiration_seconds (int): How long the pre-signed URL is valid (default: 300 seconds).
         bucket_name (Optional[str]): Optionally override the default bucket.
         prefix (str): Top-level folder in S3 (default: 'sessions').
-        extension (str): File extension without the leading dot (default: 'mp3').
 
     Returns:
-        Optional[str]: A pre-signed URL to access the file, or None if not found.
+        Optional[str]: Object key of the session's audio, or None if there is none.
     """
     bucket = bucket_name or S3_BUCKET_NAME
-    prefix = f"{prefix}/{session_id}/"
-
-    logger.info(f"[get_presigned_url_by_session_id] Looking for audio file in bucket '{bucket}' with prefix '{prefix}'")
+    response = get_s3_client().list_objects_v2(Bucket=bucket, Prefix=f"{prefix}/{session_id}/")
+    contents = response.get('Contents', [])
+    if not contents:
+        return None
 
-    try:
-        response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-        contents = response.get('Contents', [])
+    # Find the latest file by timestamp in the filename
+    latest_obj = max(contents, key=lambda x: int(x['Key'].split('/')[-1].split('.')[0]))
+    object_key = latest_obj['Key']
 
-        if not contents:
-            logger.info(f"[get_presigned_url_by_session_id] No audio file found for session_id: {session_id}")
-            return None
+    # Sessions served from the audio cache hold a pointer to the shared object
+    if object_key.endswith(f".{SESSION_POINTER_EXTENSION}"):
+        pointer = get_s3_client().get_object(Bucket=bucket, Key=object_key)
+        object_key = pointer['Body'].read().decode('utf-8').strip()
+    return object_key
 
-        logger.info(f"[get_presigned_url_by_session_id] Found {len(contents)} files for session_id: {session_id}")
 
-        # Find the latest file by timestamp in the filename
-        latest_obj = max(contents, key=lambda x: int(x['Key'].split('/')[-1].split('.')[0]))
-        object_key = latest_obj['Key']
+def get_presigned_url_by_session_id(
+        session_id: str,
+        expiration_seconds: int = 300,
+        bucket_name: Optional[str] = None,
+        s3_fallback: bool = True
+) -> Optional[str]:
+    """
+    Returns a presigned URL for the audio of session_id, or None if it is not ready yet.
+    The object key comes from the local audio index; on a miss it is looked up
+    on S3 and written back to the index, so later calls make no S3 request.
 
-        logger.info(f"[get_presigned_url_by_session_id] Latest object key for session_id {session_id}: {object_key}")
+    Args:
+        session_id (str): Session ID to look up.
+        expiration_seconds (int): How long the pre-signed URL is valid (default: 300 seconds).
+        bucket_name (Optional[str]): Optionally override the default bucket.
+        s3_fallback (bool): Look up index misses on S3 (default: True).
 
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket, 'Key': object_key},
-            ExpiresIn=expiration_seconds
-        )
+    Returns:
+        Optional[str]: A pre-signed URL to access the file, or None if not found.
+    """
+    try:
+        object_key = get_audio_index().get(session_id)
+        if object_key is None:
+            object_key = find_session_audio_key(session_id, bucket_name) if s3_fallback else None
+            if object_key is None:
+                logger.info(f"[get_presigned_url_by_session_id] No audio file found for session_id: {session_id}")
+                return None
+            get_audio_index().set(session_id, object_key)
 
-        logger.info(
-            f"[get_presigned_url_by_session_id] Successfully generated presigned URL for session_id: {session_id}")
-        return presigned_url
+        return get_presigned_url(object_key, expiration_seconds, bucket_name)
 
     except Exception as e:
         logger.error(
             f"[get_presigned_url_by_session_id] Error while getting presigned url for session_id {session_id}: {e}",
             exc_info=True)
         return None
-
@@ -0,0 +1,68 @@
+import hashlib
+import os
+from typing import BinaryIO
+
+from starlette.datastructures import UploadFile
+
+# Environment config
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+
+
+class UploadTooLargeError(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes / (1024 * 1024):.3g}MB limit")
+        self.max_bytes = max_bytes
+
+
+class UploadedImage:
+    """
+    A size-checked upload with its sha256.
+
+    `stream` is the file the form parser already spooled the upload to,
+    rewound to the start; it is handed to the decoder as is, so the bytes
+    are never copied into another buffer.
+    """
+
+    def __init__(self, stream: BinaryIO, size: int, sha256: str):
+        self.stream = stream
+        self.size = size
+        self.sha256 = sha256
+
+
+async def read_upload(
+    upload: UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_BYTES,
+) -> UploadedImage:
+    """
+    Read an uploaded file in chunks to hash it and check its size, stopping
+    as soon as it exceeds max_bytes. Only one chunk is held at a time.
+
+    Args:
+        upload (UploadFile): The multipart file.
+        max_bytes (int): Largest accepted upload.
+        chunk_size (int): Bytes read per chunk.
+
+    Returns:
+        UploadedImage: The rewound upload file and its sha256 hex digest.
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than max_bytes.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        digest.update(chunk)
+
+    await upload.seek(0)
+    return UploadedImage(upload.file, size, digest.hexdigest())